@@ -0,0 +1,259 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import core
+import evaluation_utils
+import search_utils
+from core import Board, Transposition_table
+
+# The positions of the perft suite, they cover the opening, the middle game, castling, promotions and en-passant.
+positions = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+
+def legal_moves(board: Board) -> list:
+    """ This method returns the legal moves of the player to move through get_all_legal_moves.
+
+    :param board: The position
+    :return: A list of the moves
+    """
+    moves = []
+    pieces = board.get_pieces_dict(board.is_white)
+    for piece in range(6):
+        for cell in pieces[piece]:
+            moves += core.core_utils.get_all_legal_moves(board, cell, piece, board.is_white)
+    return moves
+
+
+def measure(run: Callable[[], int], repeat: int) -> Dict[str, float]:
+    """ This method times a benchmark, the fastest of the repetitions is reported.
+
+    :param run: The benchmark, it returns the amount of operations it performed
+    :param repeat: The amount of repetitions
+    :return: The amount of operations, the time and the operations per second
+    """
+    best = None
+    operations = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operations = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"operations": operations, "seconds": best, "per_second": operations / max(best, 1e-9)}
+
+
+def bench_legal_moves(boards: List[Board], rounds: int) -> int:
+    count = 0
+    for _ in range(rounds):
+        for board in boards:
+            count += len(legal_moves(board))
+    return count
+
+
+def bench_generate_moves(boards: List[Board], rounds: int) -> int:
+    count = 0
+    buffer = core.Move_buffer()
+    for _ in range(rounds):
+        for board in boards:
+            count += core.core_utils.generate_moves(board, buffer)
+    return count
+
+
+def bench_make_undo(boards: List[Board], rounds: int) -> int:
+    count = 0
+    moves = [legal_moves(board) for board in boards]
+    for _ in range(rounds):
+        for board, board_moves in zip(boards, moves):
+            for move in board_moves:
+                core.core_utils.make_move(board, move)
+                core.core_utils.undo_move(board, move)
+            count += len(board_moves)
+    return count
+
+
+def bench_make_undo_packed(boards: List[Board], rounds: int) -> int:
+    count = 0
+    buffer = core.Move_buffer()
+    moves = []
+    for board in boards:
+        core.core_utils.generate_moves(board, buffer)
+        moves.append(buffer.get_moves())
+    for _ in range(rounds):
+        for board, board_moves in zip(boards, moves):
+            for move in board_moves:
+                core.core_utils.make_packed_move(board, move)
+                core.core_utils.undo_packed_move(board, move)
+            count += len(board_moves)
+    return count
+
+
+def bench_evaluate(boards: List[Board], rounds: int) -> int:
+    for _ in range(rounds):
+        for board in boards:
+            evaluation_utils.uncached_evaluate(board)
+    return rounds * len(boards)
+
+
+def bench_evaluate_cached(boards: List[Board], rounds: int) -> int:
+    # The positions are stored by the first round, so the others only measure the probes of the cache.
+    evaluation_utils.evaluation_table.clear()
+    for _ in range(rounds):
+        for board in boards:
+            evaluation_utils.evaluate(board)
+    return rounds * len(boards)
+
+
+def bench_batch_evaluate(fens: List[str], rounds: int) -> int:
+    for _ in range(rounds):
+        evaluation_utils.evaluate_fens(fens, threads=1)
+    return rounds * len(fens)
+
+
+def bench_move_prediction(boards: List[Board], rounds: int) -> int:
+    count = 0
+    buffer = core.Move_buffer()
+    moves = []
+    for board in boards:
+        core.core_utils.generate_moves(board, buffer)
+        moves.append(buffer.get_moves())
+    for _ in range(rounds):
+        for board, board_moves in zip(boards, moves):
+            for move in board_moves:
+                evaluation_utils.move_prediction(board, move)
+            count += len(board_moves)
+    return count
+
+
+def bench_transposition_table(keys: List[int], rounds: int) -> int:
+    table = Transposition_table(16)
+    for _ in range(rounds):
+        for key in keys:
+            table.store_entry(key, 1.0, 4, 0, 0, True)
+        for key in keys:
+            table.get_entry(key)
+    return rounds * len(keys) * 2
+
+
+def bench_perft(boards: List[Board], depth: int) -> int:
+    return sum(search_utils.count_nodes(board, depth) for board in boards)
+
+
+def bench_search(boards: List[Board], depth: int) -> int:
+    for board in boards:
+        search_utils.search_table.clear()
+        search_utils.search_position(board, depth, float("-inf"), float("inf"))
+    return len(boards)
+
+
+def run_benchmarks(repeat: int = 3, scale: int = 1, only: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """ This method runs the benchmarks over the fixed position set.
+
+    :param repeat: The amount of repetitions of every benchmark, the fastest is reported
+    :param scale: A multiplier of the work every benchmark does
+    :param only: The names of the benchmarks to run, all of them if None
+    :return: A dictionary from the name of every benchmark to its measurement
+    """
+    boards = [Board(fen) for fen in positions]
+    generator = random.Random(0)
+    keys = [generator.getrandbits(64) for _ in range(10000)]
+    benchmarks = {
+        "legal_moves": lambda: bench_legal_moves(boards, 100 * scale),
+        "generate_moves": lambda: bench_generate_moves(boards, 1000 * scale),
+        "make_undo": lambda: bench_make_undo(boards, 100 * scale),
+        "make_undo_packed": lambda: bench_make_undo_packed(boards, 100 * scale),
+        "evaluate": lambda: bench_evaluate(boards, 300 * scale),
+        "evaluate_cached": lambda: bench_evaluate_cached(boards, 300 * scale),
+        "batch_evaluate": lambda: bench_batch_evaluate(positions * 1000, 10 * scale),
+        "move_prediction": lambda: bench_move_prediction(boards, 100 * scale),
+        "transposition_table": lambda: bench_transposition_table(keys, 10 * scale),
+        "perft": lambda: bench_perft(boards, 2 + scale),
+        "search": lambda: bench_search(boards, 1 + scale),
+    }
+
+    results = {}
+    for name, run in benchmarks.items():
+        if only is None or name in only:
+            results[name] = measure(run, repeat)
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """
+    :return: The commit hash of the working tree, None if it isn't known
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """ This method compares the throughput of the benchmarks to a previous run.
+
+    :param results: The benchmarks of this run
+    :param baseline: The benchmarks of the previous run
+    :param tolerance: The fraction of the baseline throughput a benchmark may lose before it counts as a regression
+    :return: The names of the benchmarks which regressed
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["per_second"] / max(baseline[name]["per_second"], 1e-9)
+        print(f"{name}: {ratio:.2f}x", file=sys.stderr)
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    """ The command line entry point, it prints the results as JSON.
+
+    :param argv: The command line arguments, the ones of the process if None
+    :return: The exit code, 1 if a benchmark regressed compared to the baseline
+    """
+    parser = argparse.ArgumentParser(description="Measure the throughput of the core operations of the engine")
+    parser.add_argument("--repeat", type=int, default=3, help="The repetitions of every benchmark, the fastest is kept")
+    parser.add_argument("--scale", type=int, default=1, help="A multiplier of the work every benchmark does")
+    parser.add_argument("--only", nargs="*", default=None, help="The names of the benchmarks to run")
+    parser.add_argument("--output", default=None, help="A file to write the JSON results to")
+    parser.add_argument("--compare", default=None, help="The JSON results of a previous run to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="The allowed throughput loss in the comparison")
+    args = parser.parse_args(argv)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": run_benchmarks(args.repeat, args.scale, args.only),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text)
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(report["benchmarks"], json.load(baseline)["benchmarks"], args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import json
+
+import benchmark
+
+
+def test_benchmark_report(tmp_path):
+    path = str(tmp_path / "report.json")
+    names = ["generate_moves", "evaluate", "transposition_table"]
+    assert benchmark.main(["--repeat", "1", "--only", *names, "--output", path]) == 0
+    with open(path) as report:
+        results = json.load(report)["benchmarks"]
+    assert sorted(results) == sorted(names)
+    assert all(result["operations"] > 0 and result["per_second"] > 0 for result in results.values())
+
+    # A run compared to much faster results is reported as a regression.
+    for result in results.values():
+        result["per_second"] *= 100
+    with open(path, "w") as report:
+        json.dump({"benchmarks": results}, report)
+    assert benchmark.main(["--repeat", "1", "--only", *names, "--compare", path]) == 1
@@ -0,0 +1,285 @@
+import random
+
+import core
+import search_utils
+from core import Board
+
+
+def legal_moves(board):
+    moves = []
+    pieces = board.get_pieces_dict(board.is_white)
+    for piece in range(6):
+        for cell in pieces[piece]:
+            moves += core.core_utils.get_all_legal_moves(board, cell, piece, board.is_white)
+    return moves
+
+
+def test_zobrist_key_is_deterministic():
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    assert Board(fen).zobrist_key == Board(fen).zobrist_key
+    assert Board(fen).zobrist_key != Board(fen.replace(" w ", " b ")).zobrist_key
+    assert Board(fen).zobrist_key != Board(fen.replace("KQkq", "Qkq")).zobrist_key
+    assert Board().zobrist_key != Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1").zobrist_key
+
+
+def test_zobrist_key_incremental_update():
+    random.seed(3)
+    for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1"]:
+        board = Board(fen)
+        played = []
+        for _ in range(12):
+            moves = legal_moves(board)
+            if not moves:
+                break
+            move = random.choice(moves)
+            core.core_utils.make_move(board, move)
+            played.append((move, board.zobrist_key))
+            assert board.zobrist_key == Board(board.export_to_fen()).zobrist_key
+
+        for move, key in reversed(played):
+            assert board.zobrist_key == key
+            core.core_utils.undo_move(board, move)
+        assert board.zobrist_key == Board(fen).zobrist_key
+        assert board.export_to_fen() == Board(fen).export_to_fen()
+
+
+def test_repetition_history():
+    board = Board()
+    moves = [core.Move(6, 21), core.Move(62, 45), core.Move(21, 6), core.Move(45, 62)]
+    for _ in range(2):
+        for move in moves:
+            core.core_utils.make_move(board, move)
+
+    # The initial position occurred three times.
+    assert board.repetition_table.get_entry(board.zobrist_key, board.count) == 3
+    core.core_utils.undo_move(board, moves[-1])
+    assert board.repetition_table.get_entry(board.zobrist_key, board.count) == 2
+
+    # A pawn move makes the earlier positions unreachable.
+    core.core_utils.make_move(board, moves[-1])
+    core.core_utils.make_move(board, core.Move(12, 28))
+    assert board.repetition_table.get_entry(board.zobrist_key, board.count) == 1
+    assert board.repetition_table.get_entry(Board().zobrist_key) == 3
+    assert board.repetition_table.get_entry(Board().zobrist_key, board.count) == 0
+
+    # The history can be rebuilt from its keys, as the helpers of the parallel search do.
+    keys = board.repetition_table.get_keys()
+    assert len(keys) == len(board.repetition_table) and keys[-1] == board.zobrist_key
+    copy = core.Repetition_table(len(keys))
+    for key in keys:
+        copy.push(key)
+    assert copy.get_entry(Board().zobrist_key) == 3
+
+
+def test_lazy_attack_maps_match_fresh_board():
+    random.seed(7)
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    played = []
+    for _ in range(20):
+        moves = legal_moves(board)
+        if not moves:
+            break
+        move = random.choice(moves)
+        core.core_utils.make_move(board, move)
+        played.append(move)
+        fresh = Board(board.export_to_fen())
+        assert board.attackers_maps == fresh.attackers_maps
+        assert board.attackers == fresh.attackers
+
+    for move in reversed(played[-5:]):
+        core.core_utils.undo_move(board, move)
+    assert board.attackers == Board(board.export_to_fen()).attackers
+
+
+def test_board_copy_is_independent():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    copy = board.copy()
+    assert copy.export_to_fen() == board.export_to_fen()
+    assert copy.zobrist_key == board.zobrist_key
+    assert [len(legal_moves(b)) for b in (board, copy)] == [48, 48]
+
+    move = legal_moves(copy)[0]
+    core.core_utils.make_move(copy, move)
+    assert copy.export_to_fen() != board.export_to_fen()
+    assert len(legal_moves(board)) == 48
+    core.core_utils.undo_move(copy, move)
+    assert copy.export_to_fen() == board.export_to_fen()
+
+
+def test_board_pool_reuses_boards():
+    pool = core.Board_pool(max_size=1)
+    board = pool.acquire()
+    assert board.export_to_fen().split()[:3] == Board().export_to_fen().split()[:3]
+
+    pool.release(board)
+    assert len(pool) == 1
+    source = Board("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1")
+    reused = pool.acquire(source)
+    assert reused is board and len(pool) == 0
+    assert reused.export_to_fen() == source.export_to_fen()
+    assert len(legal_moves(reused)) == 14
+
+
+def test_generate_moves_modes():
+    buffer = core.Move_buffer()
+    for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+                "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1"]:
+        board = Board(fen)
+        expected = {(m.cell, m.target, m.promotion, m.castle) for m in legal_moves(board)}
+
+        assert core.core_utils.generate_moves(board, buffer) == len(expected)
+        moves = [core.decode_move(code) for code in buffer]
+        assert {(m.cell, m.target, m.promotion, m.castle) for m in moves} == expected
+
+        captures = core.core_utils.generate_moves(board, buffer, core.Generation_mode.CAPTURES)
+        moves = [core.decode_move(code) for code in buffer]
+        assert all(not board.is_cell_empty(m.target) or board.get_cell_type(m.cell) == core.PieceType.PAWN
+                   for m in moves)
+        quiets = core.core_utils.generate_moves(board, buffer, core.Generation_mode.QUIETS)
+        assert all(board.is_cell_empty(core.decode_move(code).target) for code in buffer)
+        assert captures + quiets == len(expected)
+
+
+def test_packed_moves_use_the_state_stack():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    fen = board.export_to_fen()
+    buffer = core.Move_buffer()
+    core.core_utils.generate_moves(board, buffer)
+    for code in buffer.get_moves():
+        assert core.decode_move(code).encode() == code
+        core.core_utils.make_packed_move(board, code)
+        assert board.state_count == 1
+        core.core_utils.undo_packed_move(board, code)
+        assert board.state_count == 0
+        assert board.export_to_fen() == fen
+
+
+def test_long_game_keeps_the_latest_states():
+    board = Board()
+    moves = [core.Move(6, 21).encode(), core.Move(62, 45).encode(), core.Move(21, 6).encode(),
+             core.Move(45, 62).encode()]
+    # More reversible plies than the state stack holds.
+    for _ in range(300):
+        for move in moves:
+            core.core_utils.make_packed_move(board, move)
+    assert 0 < board.state_count <= 1024
+    for move in reversed(moves):
+        core.core_utils.undo_packed_move(board, move)
+    assert board.export_to_fen().split()[:3] == Board().export_to_fen().split()[:3]
+
+    fen = board.export_to_fen()
+    move = search_utils.search_move(board, min_depth=1, limits=search_utils.Search_limits(depth=3))
+    assert move.cell in (1, 6, 8, 9, 10, 11, 12, 13, 14, 15) and board.export_to_fen() == fen
+
+
+def test_castling_rights_mask():
+    board = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    assert board.castling_rights == 15 and board.castling_options == "KQkq"
+
+    # Capturing a rook removes the castling right of its side.
+    move = core.Move(0, 56)
+    core.core_utils.make_move(board, move)
+    assert board.castling_options == "Kk"
+    assert board.zobrist_key == Board(board.export_to_fen()).zobrist_key
+    core.core_utils.undo_move(board, move)
+    assert board.castling_options == "KQkq"
+
+    board.castling_options = "k"
+    assert board.castling_rights == 4
+    assert board.zobrist_key == Board("r3k2r/8/8/8/8/8/8/R3K2R w k - 0 1").zobrist_key
+
+
+def test_piece_lists_follow_the_bitmaps():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    buffer = core.Move_buffer()
+    core.core_utils.generate_moves(board, buffer)
+    for code in buffer.get_moves():
+        core.core_utils.make_packed_move(board, code)
+        fresh = Board(board.export_to_fen())
+        for color in (True, False):
+            assert [sorted(cells) for cells in board.get_pieces_dict(color)] == fresh.get_pieces_dict(color)
+            assert board.get_king_cell(color) == fresh.get_pieces_dict(color)[core.PieceType.KING][0]
+        core.core_utils.undo_packed_move(board, code)
+
+
+def ray_attacks(cell, occupancy, directions):
+    result = 0
+    for row_step, col_step in directions:
+        row, col = cell // 8 + row_step, cell % 8 + col_step
+        while 0 <= row < 8 and 0 <= col < 8:
+            result |= 1 << (row * 8 + col)
+            if occupancy & (1 << (row * 8 + col)):
+                break
+            row, col = row + row_step, col + col_step
+    return result
+
+
+def test_magic_slider_attacks(tmp_path):
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    rook = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    bishop = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+    black_board = sum(1 << cell for cells in board.get_pieces_dict(False) for cell in cells)
+    for cell in range(64):
+        rook_attacks = ray_attacks(cell, board.board, rook)
+        bishop_attacks = ray_attacks(cell, board.board, bishop)
+        assert board.get_vertical_cell_moves(cell, core.PieceType.ROOK, True, True) == rook_attacks
+        assert board.get_vertical_cell_moves(cell, core.PieceType.BISHOP, True, True) == bishop_attacks
+        assert board.get_vertical_cell_moves(cell, core.PieceType.QUEEN, False, False) == \
+            (rook_attacks | bishop_attacks) & ~black_board
+
+    # The cache written by the tables is read back, while a broken file is rejected.
+    path = str(tmp_path / "magics.bin")
+    core.magic_utils.save_magics(path)
+    assert core.magic_utils.load_magics(path)
+    with open(path, "wb") as cache:
+        cache.write(b"broken")
+    assert not core.magic_utils.load_magics(path)
+
+
+def test_incremental_pesto_scores():
+    import evaluation_utils
+
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    buffer = core.Move_buffer()
+    core.core_utils.generate_moves(board, buffer)
+    for code in buffer.get_moves():
+        core.core_utils.make_packed_move(board, code)
+        fresh = Board(board.export_to_fen())
+        assert board.get_pesto_scores() == fresh.get_pesto_scores()
+        assert board.pesto_evaluation() == fresh.pesto_evaluation()
+        core.core_utils.undo_packed_move(board, code)
+    assert board.get_pesto_scores() == Board(board.export_to_fen()).get_pesto_scores()
+
+    # Boards pick up new tables on their next evaluation.
+    scores = board.get_pesto_scores()
+    doubled = [[value * 2 for value in row] for row in evaluation_utils.mg_table]
+    core.board.set_pesto_tables(doubled, evaluation_utils.eg_table, evaluation_utils.phase_indicator)
+    try:
+        assert board.get_pesto_scores()[0] == scores[0] * 2
+    finally:
+        evaluation_utils.set_pesto_tables(evaluation_utils.mg_table, evaluation_utils.eg_table,
+                                          evaluation_utils.phase_indicator)
+    assert board.get_pesto_scores() == scores
+
+
+def test_profile_report():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    core.profile_reset()
+    move = legal_moves(board)[0]
+    core.core_utils.make_move(board, move)
+    core.core_utils.undo_move(board, move)
+    report = core.profile_report()
+    # The normal build has no counters.
+    if not core.profiler.enabled:
+        assert report == {}
+        return
+
+    assert report["make_move"]["calls"] == report["make_packed_move"]["calls"] == 1
+    assert report["undo_move"]["calls"] == report["undo_packed_move"]["calls"] == 1
+    assert report["update_round"]["calls"] == 2
+    assert report["get_all_legal_moves"]["calls"] > 0 and report["condition"]["calls"] > 0
+    assert report["make_move"]["seconds"] >= report["make_packed_move"]["seconds"] > 0
+    core.profile_reset()
+    assert all(section["calls"] == 0 for section in core.profile_report().values())
@@ -1,4 +1,5 @@
 import time
+from typing import Callable, Optional
 
 import search_utils
 from opening import Opener
@@ -11,9 +12,16 @@ class Bot:
     This class represent the chess bot
     """
 
-    def __init__(self):
+    def __init__(self, workers: int = 1, callback: Optional[Callable[[search_utils.Search_stats], None]] = None):
+        """ Initialize the bot
+
+        :param workers: The amount of processes used for the search, more than one enables the parallel search
+        :param callback: Called with the statistics of every iteration of the searches, e.g. print to follow them
+        """
         self.opener = Opener()
         self.opening = True
+        self.workers = workers
+        self.callback = callback
 
     def think(self, board: Board) -> Move:
         """ This method is used to get the move the bot thinks is best in the position
@@ -35,7 +43,10 @@ class Bot:
                 print(time.time() - start)
 
                 return move
-        move = search_utils.search_move(board)
+        if self.workers > 1:
+            move = search_utils.search_move_parallel(board, workers=self.workers, callback=self.callback)
+        else:
+            move = search_utils.search_move(board, callback=self.callback)
         print(time.time() - start)
         return move
 
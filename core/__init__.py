@@ -1,9 +1,16 @@
+from . import profiler
+from .profiler import profile_report, profile_reset
 from .mask_utils import Masks
 from .binary_ops_utils import translate_cell_to_row_col, translate_row_col_to_cell, count_ones
 from .repetition_table import Repetition_table
-from .board import Board
+from . import magic_utils
+from .board import Board, Board_pool
 from . import core_utils
 from .piece import PieceType
-from .core_utils import Move
+from .core_utils import Move, Move_buffer, Generation_mode, decode_move
+from . import position
+from .move_ordering import Move_ordering
+from . import texel_utils
 from .chess_exceptions import NonLegal, KingSacrifice, KingUnderCheck, KingNonLegal
 from .transposition_table import Entry, Transposition_table
+from .evaluation_table import Evaluation_table
@@ -3,10 +3,49 @@ from typing import Tuple, List
 from mask_utils cimport Masks
 from cython cimport int, tuple, long
 
-cdef unsigned long long base
-cdef int[256] one_counter
+# The bit scans and counts are used for every piece and move the board iterates over,
+# so they are inlined into the modules that use them and compile to single instructions where the compiler allows.
+cdef extern from *:
+    """
+    #if defined(__GNUC__) || defined(__clang__)
+    static inline unsigned long lsb_index(unsigned long long val) { return __builtin_ctzll(val); }
+    static inline int popcount_bits(unsigned long long val) { return __builtin_popcountll(val); }
+    #else
+    static const unsigned char lsb_table[64] = {
+        0, 47, 1, 56, 48, 27, 2, 60, 57, 49, 41, 37, 28, 16, 3, 61, 54, 58, 35, 52, 50, 42, 21, 44, 38, 32, 29, 23,
+        17, 11, 4, 62, 46, 55, 26, 59, 40, 36, 15, 53, 34, 51, 20, 43, 31, 22, 10, 45, 25, 39, 14, 33, 19, 30, 9, 24,
+        13, 18, 8, 12, 7, 6, 5, 63};
+    static inline unsigned long lsb_index(unsigned long long val) {
+        return lsb_table[((val ^ (val - 1)) * 0x03f79d71b4cb0a89ULL) >> 58];
+    }
+    static inline int popcount_bits(unsigned long long val) {
+        val = val - ((val >> 1) & 0x5555555555555555ULL);
+        val = (val & 0x3333333333333333ULL) + ((val >> 2) & 0x3333333333333333ULL);
+        val = (val + (val >> 4)) & 0x0f0f0f0f0f0f0f0fULL;
+        return (int)((val * 0x0101010101010101ULL) >> 56);
+    }
+    #endif
+    """
+    unsigned long lsb_index(unsigned long long val) nogil
+    int popcount_bits(unsigned long long val) nogil
+
+cdef inline unsigned long bit_scan_forward(unsigned long long val) noexcept nogil:
+    """ This function returns the LSB for a certain non zero 64 bit int
+
+    :param val: the number
+    :return: the index of the lsb
+    """
+    return lsb_index(val)
 
-cdef void init_one_counter()
+cdef inline int pop_count(unsigned long long val) noexcept nogil:
+    """ This function returns the amount of bits which are on in a 64 bit int
+
+    :param val: the number
+    :return: the amount of set bits
+    """
+    return popcount_bits(val)
+
+cdef unsigned long long base
 cpdef int count_ones(unsigned long long word)
 cdef unsigned long long switch_bit(unsigned long long source, unsigned long long row, unsigned long long col, bint on)
 cdef unsigned long long switch_cell_bit(unsigned long long source, unsigned long cell, bint on)
@@ -2,6 +2,44 @@ from mask_utils cimport Masks
 from piece cimport PieceType
 from repetition_table cimport Repetition_table
 
+# The size of the state stack. A legal game can be several thousand plies long, since captures and pawn moves reset the
+# fifty moves rule, so a full stack drops its oldest half and only the latest moves can be undone.
+cdef enum:
+    MAX_STATES = 1024
+
+# The castling rights bits, in the order of KQkq
+cdef enum:
+    WHITE_KING_SIDE = 1
+    WHITE_QUEEN_SIDE = 2
+    BLACK_KING_SIDE = 4
+    BLACK_QUEEN_SIDE = 8
+
+cdef struct Board_state:
+    # The state of the board before a move, used to undo it
+    unsigned long long zobrist_key
+    unsigned long en_passant_ready
+    int count
+    unsigned char castling_rights
+    # The PieceType of the captured piece, EMPTY if nothing was captured
+    unsigned char captured
+    unsigned char captured_cell
+
+cdef struct Pesto_tables:
+    # The material and piece-square values, indexed by piece * 2 for white and piece * 2 + 1 for black
+    int[12][64] mg_values
+    int[12][64] eg_values
+    # The game phase weight of every piece type
+    int[6] phase_weights
+
+# The tables are set by evaluation_utils, every change of them increases the generation.
+cdef Pesto_tables* get_pesto_tables() noexcept nogil
+
+# The zobrist keys and castling masks are module tables of board, these give C level access to them.
+cdef unsigned long long zobrist_piece_key(unsigned long cell, PieceType piece, bint is_white) noexcept nogil
+cdef unsigned long long zobrist_state_key(unsigned char castling_rights, unsigned long en_passant_ready,
+                                          bint is_white) noexcept nogil
+cdef unsigned char castling_mask(unsigned long cell) noexcept nogil
+
 cdef class Board:
     """
 
@@ -18,7 +56,7 @@ cdef class Board:
     cdef list directions
 
     # instance attributes
-    cdef public unicode castling_options
+    cdef public unsigned char castling_rights
     cdef public bint is_white
     cdef public unsigned long en_passant_ready
     cdef public int count
@@ -26,10 +64,13 @@ cdef class Board:
     cdef unsigned long long white_board
     cdef unsigned long long black_board
     cdef unsigned long long sliding
-    cdef unsigned long long sliding_attacks
-    cdef public unsigned long long[2] attackers
+    # The attack maps are updated lazily, see refresh_attacks
+    cdef unsigned long long[2] color_attacks
     cdef public bint pin_in_position
-    cdef public unsigned long long[6][2] attackers_maps
+    cdef unsigned long long[6][2] attack_maps
+    cdef unsigned long long[64] slider_attacks
+    cdef unsigned long long changed_cells
+    cdef unsigned long long check_xray
     cdef public unsigned long long pin_map
     cdef public unsigned long long check_map
     cdef public bint position_in_check
@@ -37,18 +78,40 @@ cdef class Board:
     cdef unsigned long long[6] piece_maps
     cdef public list threats
     cdef public unsigned long long zobrist_key
-    cdef public unsigned long long[64][12] zobrist_table
     cdef public Repetition_table repetition_table
-    cdef list[6] black_pieces
-    cdef list[6] white_pieces
+    # The piece lists built by get_pieces_dict, None once a piece of the color changed
+    cdef list white_pieces
+    cdef list black_pieces
+    cdef Board_state[MAX_STATES] states
+    cdef public int state_count
+    # The PeSTO sums from the side of white and the game phase, kept up to date by set_cell_piece and remove_cell_piece
+    cdef int mg_score
+    cdef int eg_score
+    cdef int phase
+    cdef unsigned int pesto_generation
 
     # class methods
+    cpdef Board copy(self)
+    cpdef void load(self, Board other)
     cpdef unsigned long long get_board(self)
     cpdef bint is_cell_empty(self, unsigned long cell)
     cpdef bint is_cell_colored(self, unsigned long cell, bint is_white)
     cpdef void set_cell_piece(self, unsigned long cell, PieceType piece, bint is_white)
     cpdef void remove_cell_piece(self, unsigned long cell, PieceType piece, bint is_white)
+    cpdef void set_castling_options(self, unicode castling_options)
+    cdef void update_castling_rights(self, unsigned long cell)
+    cpdef void set_en_passant(self, unsigned long cell)
+    cdef void push_state(self, PieceType captured, unsigned long captured_cell) except *
+    cdef Board_state pop_state(self) except *
+    cdef void restore_state(self, Board_state state)
     cpdef list get_pieces_dict(self, bint is_white)
+    cdef unsigned long long get_piece_map(self, PieceType piece, bint is_white)
+    cpdef unsigned long get_king_cell(self, bint is_white)
+    cpdef void refresh_evaluation(self)
+    cdef void update_evaluation(self, unsigned long cell, PieceType piece, bint is_white, int sign)
+    cdef void ensure_evaluation(self)
+    cpdef tuple get_pesto_scores(self)
+    cpdef double pesto_evaluation(self)
     cpdef bint is_insufficient(self)
     cpdef bint is_type_of(self, unsigned long cell, PieceType piece)
     cpdef PieceType get_cell_type(self, unsigned long cell)
@@ -62,8 +125,22 @@ cdef class Board:
     cpdef unsigned long long get_moves_by_cell(self, unsigned long cell, bint is_white, bint for_attacks=*)
     cpdef unsigned long long get_captures_by_cell(self, unsigned long cell, bint is_white)
     cpdef void __update_attacker__(self, bint is_white)
+    cdef void refresh_attacks(self)
     cpdef unsigned long long get_attacks(self, bint is_white)
     cpdef unsigned long long get_pawn_attacks(self, bint is_white)
     cpdef void __update_pins_and_checks__(self, bint is_white)
     cpdef bint is_pinned(self, unsigned long cell)
-    cpdef void update_round(self, unsigned long target_cell, PieceType piece, bint enables_en_passant=*)
\ No newline at end of file
+    cpdef void update_round(self, unsigned long target_cell, PieceType piece, bint enables_en_passant=*)
+
+
+cdef class Board_pool:
+    """
+
+    This class keeps released boards so batch workloads can reuse them instead of building new ones.
+
+    """
+    cdef list boards
+    cdef public int max_size
+
+    cpdef Board acquire(self, Board source=*)
+    cpdef void release(self, Board board)
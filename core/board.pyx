@@ -1,13 +1,15 @@
 # cython: language_level=3
 from typing import Dict, List, Optional
 import builtins
-import random
 
 cimport binary_ops_utils
+from magic_utils cimport get_rook_attacks, get_bishop_attacks, get_queen_attacks
 from repetition_table cimport Repetition_table
 from cython cimport int, long
+from libc.string cimport memcpy, memmove
 from .mask_utils import Masks
 from piece cimport PieceType
+from profiler cimport PROFILE_ENABLED, Section, profile_clock, profile_record
 
 cdef str default_fen
 default_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
@@ -15,6 +17,255 @@ default_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
 cdef unsigned long long base
 base = 1
 
+cdef unsigned long long not_file_a = 0xFEFEFEFEFEFEFEFEULL
+cdef unsigned long long not_file_h = 0x7F7F7F7F7F7F7F7FULL
+
+# The zobrist keys are shared by all the boards and generated from a fixed seed,
+# so a position has the same hash in every board, process and run.
+cdef unsigned long long[64][12] zobrist_table
+cdef unsigned long long zobrist_side
+cdef unsigned long long[16] zobrist_castling
+cdef unsigned long long[8] zobrist_en_passant
+
+
+cdef unsigned long long next_random(unsigned long long* state):
+    """ This is the splitmix64 generator which is used to generate the zobrist keys.
+
+    :param state: The generator state, it is advanced by the call
+    :return: The next random 64 bit number
+    """
+    cdef unsigned long long z
+
+    state[0] += 0x9E3779B97F4A7C15ULL
+    z = state[0]
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+    return z ^ (z >> 31)
+
+
+cdef void init_zobrist_keys():
+    """
+    This function fills the zobrist keys for pieces, side to move, castling options and en-passant files.
+    """
+    global zobrist_side
+    cdef unsigned long long state
+    cdef unsigned long long[4] castling_keys
+    cdef int cell, piece, i, j
+
+    state = 0x2545F4914F6CDD1DULL
+    for cell in range(64):
+        for piece in range(12):
+            zobrist_table[cell][piece] = next_random(&state)
+    zobrist_side = next_random(&state)
+    for i in range(4):
+        castling_keys[i] = next_random(&state)
+    # Every castling option has a key, so a set of options is the xor of the keys of its options.
+    for i in range(16):
+        zobrist_castling[i] = 0
+        for j in range(4):
+            if i & (1 << j):
+                zobrist_castling[i] ^= castling_keys[j]
+    for i in range(8):
+        zobrist_en_passant[i] = next_random(&state)
+
+
+cdef Pesto_tables pesto_tables
+cdef unsigned int pesto_generation = 0
+
+
+cdef Pesto_tables* get_pesto_tables() noexcept nogil:
+    """ Returns the PeSTO tables which the boards evaluate with.
+
+    :return: A pointer to the tables
+    """
+    return &pesto_tables
+
+
+def set_pesto_tables(mg_table, eg_table, phase_indicator) -> None:
+    """ Set the PeSTO tables which the boards evaluate with, the sums of existing boards are recomputed on their next use.
+
+    :param mg_table: The middle game value of every piece on every cell, by piece * 2 for white and piece * 2 + 1 for black
+    :param eg_table: The endgame value of every piece on every cell, indexed as mg_table
+    :param phase_indicator: The game phase weight of every piece type
+    """
+    global pesto_generation
+    cdef int index, cell, piece
+
+    for index in range(12):
+        for cell in range(64):
+            pesto_tables.mg_values[index][cell] = mg_table[index][cell]
+            pesto_tables.eg_values[index][cell] = eg_table[index][cell]
+    for piece in range(6):
+        pesto_tables.phase_weights[piece] = phase_indicator[piece]
+    pesto_generation += 1
+
+
+cdef list castling_strings = [u''.join([option for i, option in enumerate(u'KQkq') if index & (1 << i)])
+                              for index in range(16)]
+cdef dict castling_indexes = {options: index for index, options in enumerate(castling_strings)}
+
+
+# The castling rights which remain after a move from or to a cell, the rights are lost when the king or rook moves
+# and when the rook is captured.
+cdef unsigned char[64] castling_masks
+
+
+cdef void init_castling_masks():
+    """
+    This function fills the castling rights masks of the cells.
+    """
+    cdef int cell
+
+    for cell in range(64):
+        castling_masks[cell] = 15
+    castling_masks[0] = <unsigned char>~WHITE_QUEEN_SIDE & 15
+    castling_masks[4] = <unsigned char>~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE) & 15
+    castling_masks[7] = <unsigned char>~WHITE_KING_SIDE & 15
+    castling_masks[56] = <unsigned char>~BLACK_QUEEN_SIDE & 15
+    castling_masks[60] = <unsigned char>~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE) & 15
+    castling_masks[63] = <unsigned char>~BLACK_KING_SIDE & 15
+
+
+init_castling_masks()
+
+
+cdef unsigned long long zobrist_piece_key(unsigned long cell, PieceType piece, bint is_white) noexcept nogil:
+    """ Returns the zobrist key of a piece on a cell.
+
+    :param cell: The cell index
+    :param piece: The piece type
+    :param is_white: The color of the piece
+    :return: The key which is xored into the hash when the piece is set or removed
+    """
+    return zobrist_table[cell][<int>piece if is_white else <int>piece + 6]
+
+
+cdef unsigned long long zobrist_state_key(unsigned char castling_rights, unsigned long en_passant_ready,
+                                          bint is_white) noexcept nogil:
+    """ Returns the part of the zobrist key which doesn't depend on the pieces.
+
+    :param castling_rights: The castling rights mask
+    :param en_passant_ready: The cell of the pawn which can be captured en-passant, 0 if there is none
+    :param is_white: Whether it is the turn of the white player
+    :return: The xor of the castling, en-passant and side to move keys
+    """
+    cdef unsigned long long key
+
+    key = zobrist_castling[castling_rights]
+    if en_passant_ready != 0:
+        key ^= zobrist_en_passant[en_passant_ready & 7]
+    if not is_white:
+        key ^= zobrist_side
+    return key
+
+
+cdef unsigned char castling_mask(unsigned long cell) noexcept nogil:
+    """ Returns the castling rights which remain after a move from or to a cell.
+
+    :param cell: The cell index
+    :return: The mask of the remaining castling rights
+    """
+    return castling_masks[cell]
+
+
+cdef int castling_index(unicode castling_options):
+    """ Returns the castling rights mask of castling options.
+
+    :param castling_options: The castling options as in fen notation
+    :return: The corresponding mask, a bit for each option
+    """
+    cdef int index
+
+    # The options are almost always in the usual order, so they are looked up before being parsed.
+    if castling_options in castling_indexes:
+        return castling_indexes[castling_options]
+
+    index = 0
+    for i, option in enumerate(u'KQkq'):
+        if option in castling_options:
+            index |= 1 << i
+    return index
+
+
+cdef list create_pawn_moves():
+    """ This function creates an array of all the possible capture moves for a pawn based on cell index.
+
+    :return: A list with the array of the white pawns and the array of the black pawns
+    """
+
+    white_moves = []
+    black_moves = []
+    for i in range(8):
+        for j in range(8):
+            white_val = 0
+            black_val = 0
+            # Here we filter the moves that are outside of the board.
+            white_options = filter(lambda t: binary_ops_utils.translate_row_col_to_cell(t[0] + 1, t[1] + 1) != -1,
+                                   [(i + 1, j + 1), (i + 1, j - 1)])
+            black_options = filter(lambda t: binary_ops_utils.translate_row_col_to_cell(t[0] + 1, t[1] + 1) != -1,
+                                   [(i - 1, j + 1), (i - 1, j - 1)])
+            for option in white_options:
+                white_val = binary_ops_utils.switch_cell_bit(white_val, option[0] * 8 + option[1], True)
+            for option in black_options:
+                black_val = binary_ops_utils.switch_cell_bit(black_val, option[0] * 8 + option[1], True)
+            white_moves.append(white_val)
+            black_moves.append(black_val)
+
+    return [white_moves, black_moves]
+
+
+cdef list create_step_moves(list steps):
+    """ This function creates an array of all the possible moves for a piece with fixed steps (knight or king).
+
+    :param steps: The row and column offsets of the piece's moves
+    :return: The bitmap of the moves for every cell index
+    """
+
+    result = []
+    for i in range(8):
+        for j in range(8):
+            val = 0
+            options = []
+            for move in steps:
+                # filter illegal moves.
+                if binary_ops_utils.translate_row_col_to_cell(move[0] + i + 1, move[1] + j + 1) != -1:
+                    options.append((move[0] + i, move[1] + j))
+
+            for option in options:
+                val = binary_ops_utils.switch_cell_bit(val, option[0] * 8 + option[1], True)
+            result.append(val)
+    return result
+
+
+cdef list create_distances():
+    """ This function creates an array of the distances to the edge of the board in every direction based on cell index.
+
+    :return: A tuple of distances for every cell index, in the order of the board's directions
+    """
+
+    result = []
+    for i in range(8):
+        for j in range(8):
+            north = 7 - i
+            south = i
+            west = j
+            east = 7 - j
+            result.append((east, west, north, south, min(north, west), min(south, east), min(north, east), min(south, west)))
+    return result
+
+
+init_zobrist_keys()
+
+# The lookup tables never change, so all the boards share them.
+cdef dict shared_pieces_dict = {'q': <int>PieceType.QUEEN, 'r': <int>PieceType.ROOK, 'b': <int>PieceType.BISHOP,
+                                'n': <int>PieceType.KNIGHT, 'k': <int>PieceType.KING, 'p': <int>PieceType.PAWN}
+cdef list shared_pawn_moves = create_pawn_moves()
+cdef list shared_knight_moves = create_step_moves([(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (-1, 2), (1, -2), (-1, -2)])
+cdef list shared_king_moves = create_step_moves([(0, 1), (0, -1), (1, 1), (-1, -1), (1, -1), (-1, 1), (1, 0), (-1, 0)])
+cdef list shared_vertical_distances = create_distances()
+cdef Masks shared_masker = Masks()
+cdef list shared_directions = [1, -1, 8, -8, 7, -7, 9, -9]
+
 cdef class Board:
     """
 
@@ -22,20 +273,18 @@ cdef class Board:
 
     """
 
-    def __cinit__(self, fen_string=default_fen):
-        """ This method initiate the board to state by a fen notation.
-
-        :param fen_string: The notation that represent the current board, the default is initial board.
+    def __cinit__(self, *args, **kwargs):
         """
-        self.pieces_dict = {'q': PieceType.QUEEN, 'r': PieceType.ROOK, 'b': PieceType.BISHOP, 'n': PieceType.KNIGHT,
-                   'k': PieceType.KING, 'p': PieceType.PAWN}
-        self.pawn_moves = []
-        self.knight_moves = []
-        self.king_moves = []
-        self.vertical_distances = []
-        self.masker = Masks()
-        self.directions = [1, -1, 8, -8, 7, -7, 9, -9]
-        self.castling_options = ''
+        This method initiate an empty board which shares the lookup tables of all the boards.
+        """
+        self.pieces_dict = shared_pieces_dict
+        self.pawn_moves = shared_pawn_moves
+        self.knight_moves = shared_knight_moves
+        self.king_moves = shared_king_moves
+        self.vertical_distances = shared_vertical_distances
+        self.masker = shared_masker
+        self.directions = shared_directions
+        self.castling_rights = 0
         self.is_white = True
         self.en_passant_ready = 0
         self.count = 0
@@ -43,44 +292,123 @@ cdef class Board:
         self.white_board = 0
         self.black_board = 0
         self.sliding = 0
-        self.sliding_attacks = 0
-        self.attackers = [0, 0]
+        self.color_attacks = [0, 0]
         self.pin_in_position = False
-        self.attackers_maps = [[0, 0],  [0, 0], [0, 0], [0, 0], [0, 0],  [0, 0]]
+        self.attack_maps = [[0, 0],  [0, 0], [0, 0], [0, 0], [0, 0],  [0, 0]]
+        # Every cell is considered changed so the first use computes all of the attack maps.
+        self.changed_cells = ~(<unsigned long long>0)
+        self.check_xray = 0
         self.pin_map = 0
         self.check_map = 0
         self.position_in_check = False
         self.position_in_double_check = False
         self.piece_maps = [0, 0, 0, 0, 0, 0]
         self.threats = []
-        self.black_pieces = [[], [], [], [], [], []]
-        self.white_pieces = [[], [], [], [], [], []]
+        self.white_pieces = None
+        self.black_pieces = None
         self.zobrist_key = 0
-        min = 0
-        max = builtins.pow(2, 64)
-        for cell in range(64):
-            for piece in range(12):
-                self.zobrist_table[cell][piece] = random.randint(min, max) 
-        self.repetition_table = Repetition_table(0x1000000)
-        self.__update_distances__()
-        self.__update_pawn_moves__()
-        self.__update_knight_moves__()
-        self.__update_king_moves__()
+        self.repetition_table = Repetition_table()
+        self.state_count = 0
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        # The sums are computed on first use.
+        self.pesto_generation = pesto_generation - 1
+
+    def __init__(self, fen_string=default_fen):
+        """ This method initiate the board to state by a fen notation.
+
+        :param fen_string: The notation that represent the current board, the default is initial board.
+        """
         self.import_from_fen(fen_string)
+        self.repetition_table.push(self.zobrist_key)
         self.sliding = self.piece_maps[<int>PieceType.QUEEN] | self.piece_maps[<int>PieceType.BISHOP] | self.piece_maps[
             <int>PieceType.ROOK]
-        self.__update_attacker__(True)
-        self.__update_attacker__(False)
         self.__update_pins_and_checks__(self.is_white)
 
+    property castling_options:
+        """
+        The castling options as in fen notation, the board itself keeps them as the castling_rights mask.
+        """
+        def __get__(self):
+            return castling_strings[self.castling_rights]
+
+        def __set__(self, unicode castling_options):
+            self.set_castling_options(castling_options)
+
+    property attackers_maps:
+        """
+        The attack bitmaps of every piece type, indexed by piece type and then 0 for white and 1 for black.
+        """
+        def __get__(self):
+            self.refresh_attacks()
+            return self.attack_maps
+
+    property attackers:
+        """
+        The attack bitmaps of each color, 0 for the attacks of white and 1 for the attacks of black.
+        """
+        def __get__(self):
+            return [self.get_attacks(False), self.get_attacks(True)]
+
+    cpdef Board copy(self):
+        """ Returns a copy of the board, only the position state is copied and the lookup tables are shared.
+
+        :return: A new board in the same state
+        """
+        cdef Board board
+
+        board = Board.__new__(Board)
+        board.load(self)
+        return board
+
+    cpdef void load(self, Board other):
+        """ This method sets the board to the state of another board, used to reuse board objects.
+
+        :param other: The board to copy the state from
+        """
+        cdef int i
+
+        self.castling_rights = other.castling_rights
+        self.is_white = other.is_white
+        self.en_passant_ready = other.en_passant_ready
+        self.count = other.count
+        self.board = other.board
+        self.white_board = other.white_board
+        self.black_board = other.black_board
+        self.sliding = other.sliding
+        self.color_attacks = other.color_attacks
+        self.pin_in_position = other.pin_in_position
+        self.attack_maps = other.attack_maps
+        self.slider_attacks = other.slider_attacks
+        self.changed_cells = other.changed_cells
+        self.check_xray = other.check_xray
+        self.pin_map = other.pin_map
+        self.check_map = other.check_map
+        self.position_in_check = other.position_in_check
+        self.position_in_double_check = other.position_in_double_check
+        self.piece_maps = other.piece_maps
+        self.threats = list(other.threats)
+        self.white_pieces = None
+        self.black_pieces = None
+        self.zobrist_key = other.zobrist_key
+        self.repetition_table.load(other.repetition_table)
+        self.state_count = other.state_count
+        memcpy(self.states, other.states, other.state_count * sizeof(Board_state))
+        self.mg_score = other.mg_score
+        self.eg_score = other.eg_score
+        self.phase = other.phase
+        self.pesto_generation = other.pesto_generation
+
     def import_from_fen(self, fen_string):
         """ This method receives a fen_string and initialize the relevant values of the board with it.
 
         :param fen_string: The notation that represent the state of the game with piece locations and castling options.
         """
 
-        self.black_pieces = [[], [], [], [], [], []]
-        self.white_pieces = [[], [], [], [], [], []]
+        self.white_pieces = None
+        self.black_pieces = None
+        self.pesto_generation = pesto_generation - 1
         parts = fen_string.split()
 
         # In this part there is a description of the pieces in each row from the eighth rank to the first.
@@ -91,13 +419,17 @@ cdef class Board:
         self.is_white = True if parts[1].lower() == 'w' else False
 
         # The third part holds which castling moves are still legal.
-        self.castling_options = parts[2]
+        self.castling_rights = castling_index(parts[2])
 
         # The fourth part holds a pawn cell that can be en-passant against.
         diff = -1 if self.is_white else 1
         self.en_passant_ready = 0 if parts[3] == "-" else binary_ops_utils.translate_row_col_to_cell(
             builtins.int(parts[3][1]) + diff, ord(parts[3][0].lower()) - ord('a') + 1)
 
+        # The fifth part holds the amount of moves since the last capture or pawn move,
+        # the count includes the current position.
+        self.count = builtins.int(parts[4]) + 1 if len(parts) > 4 else 1
+
         # Read the row and update the board state.
         for i in range(8):
             j = 0
@@ -110,18 +442,52 @@ cdef class Board:
                     self.piece_maps[piece_type] = binary_ops_utils.switch_bit(self.piece_maps[piece_type], i, j, True)
 
                     if letter.islower():
-                        self.black_pieces[piece_type].append(i * 8 + j)
                         self.board = binary_ops_utils.switch_bit(self.board, i, j, True)
                         self.black_board = binary_ops_utils.switch_bit(self.black_board, i, j, True)
-                        self.zobrist_key ^= self.zobrist_table[i * 8 + j][piece_type + 6]
+                        self.zobrist_key ^= zobrist_table[i * 8 + j][piece_type + 6]
                     else:
-                        self.white_pieces[piece_type].append(i * 8 + j)
                         self.board = binary_ops_utils.switch_bit(self.board, i, j, True)
                         self.white_board = binary_ops_utils.switch_bit(self.white_board, i, j, True)
-                        self.zobrist_key ^= self.zobrist_table[i * 8 + j][piece_type]
+                        self.zobrist_key ^= zobrist_table[i * 8 + j][piece_type]
 
                     j += 1
 
+        if not self.is_white:
+            self.zobrist_key ^= zobrist_side
+        self.zobrist_key ^= zobrist_castling[self.castling_rights]
+        if self.en_passant_ready != 0:
+            self.zobrist_key ^= zobrist_en_passant[self.en_passant_ready & 7]
+
+    def export_to_fen(self):
+        """ This method returns the fen notation of the current position.
+
+        :return: The fen string, the fullmove number isn't tracked and is always 1.
+        """
+        letters = {piece: letter for letter, piece in self.pieces_dict.items()}
+        rows = []
+        for i in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for j in range(8):
+                cell = i * 8 + j
+                if self.is_cell_empty(cell):
+                    empty += 1
+                    continue
+                if empty != 0:
+                    row += str(empty)
+                    empty = 0
+                letter = letters[self.get_cell_type(cell)]
+                row += letter.upper() if self.is_cell_colored(cell, True) else letter
+            rows.append(row + (str(empty) if empty != 0 else ''))
+
+        en_passant = '-'
+        if self.en_passant_ready != 0:
+            cell = self.en_passant_ready + (8 if self.is_white else -8)
+            en_passant = chr(ord('a') + cell % 8) + str(cell // 8 + 1)
+
+        return ' '.join(['/'.join(rows), 'w' if self.is_white else 'b', castling_strings[self.castling_rights] or '-', en_passant,
+                         str(max(self.count - 1, 0)), '1'])
+
     cpdef unsigned long long get_board(self):
         """
         :return: The board bitmap, each index is 0 if the relevant cell is empty else 1
@@ -160,14 +526,16 @@ cdef class Board:
 
         self.board = binary_ops_utils.switch_cell_bit(self.board, cell, True)
         self.piece_maps[<int>piece] = binary_ops_utils.switch_cell_bit(self.piece_maps[<int>piece], cell, True)
+        self.changed_cells |= base << cell
+        self.update_evaluation(cell, piece, is_white, 1)
         if is_white:
-            self.white_pieces[<int>piece].append(cell)
+            self.white_pieces = None
             self.white_board = binary_ops_utils.switch_cell_bit(self.white_board, cell, True)
-            self.zobrist_key ^= self.zobrist_table[cell][<int>piece]
+            self.zobrist_key ^= zobrist_table[cell][<int>piece]
         else:
-            self.black_pieces[<int>piece].append(cell)
+            self.black_pieces = None
             self.black_board = binary_ops_utils.switch_cell_bit(self.black_board, cell, True)
-            self.zobrist_key ^= self.zobrist_table[cell][<int>piece + 6]
+            self.zobrist_key ^= zobrist_table[cell][<int>piece + 6]
 
     cpdef void remove_cell_piece(self, unsigned long cell, PieceType piece, bint is_white):
         """ This method remove a piece from a certain cell and update the required object fields
@@ -179,36 +547,232 @@ cdef class Board:
 
         self.board = binary_ops_utils.switch_cell_bit(self.board, cell, False)
         self.piece_maps[<int>piece] = binary_ops_utils.switch_cell_bit(self.piece_maps[<int>piece], cell, False)
+        self.changed_cells |= base << cell
+        self.update_evaluation(cell, piece, is_white, -1)
         if is_white:
-            self.white_pieces[<int>piece] = [c for c in self.white_pieces[<int>piece] if c != cell]
+            self.white_pieces = None
             self.white_board = binary_ops_utils.switch_cell_bit(self.white_board, cell, False)
-            self.zobrist_key ^= self.zobrist_table[cell][<int>piece]
+            self.zobrist_key ^= zobrist_table[cell][<int>piece]
         else:
-            self.black_pieces[<int>piece] = [c for c in self.black_pieces[<int>piece] if c != cell]
+            self.black_pieces = None
             self.black_board = binary_ops_utils.switch_cell_bit(self.black_board, cell, False)
-            self.zobrist_key ^= self.zobrist_table[cell][<int>piece + 6]
+            self.zobrist_key ^= zobrist_table[cell][<int>piece + 6]
+
+    cpdef void set_castling_options(self, unicode castling_options):
+        """ This method replaces the castling options and updates the zobrist key accordingly.
+
+        :param castling_options: The new castling options as in fen notation
+        """
+
+        self.zobrist_key ^= zobrist_castling[self.castling_rights]
+        self.castling_rights = castling_index(castling_options)
+        self.zobrist_key ^= zobrist_castling[self.castling_rights]
+
+    cdef void update_castling_rights(self, unsigned long cell):
+        """ This method removes the castling rights which are lost by a move from or to a cell.
+
+        :param cell: The origin or the target cell of the move
+        """
+        if self.castling_rights & castling_masks[cell] == self.castling_rights:
+            return
+
+        self.zobrist_key ^= zobrist_castling[self.castling_rights]
+        self.castling_rights &= castling_masks[cell]
+        self.zobrist_key ^= zobrist_castling[self.castling_rights]
+
+    cpdef void set_en_passant(self, unsigned long cell):
+        """ This method sets the pawn which can be captured en-passant and updates the zobrist key accordingly.
+
+        :param cell: The cell of the pawn, 0 if there is no such pawn
+        """
+
+        if self.en_passant_ready != 0:
+            self.zobrist_key ^= zobrist_en_passant[self.en_passant_ready & 7]
+        if cell != 0:
+            self.zobrist_key ^= zobrist_en_passant[cell & 7]
+        self.en_passant_ready = cell
+
+    cdef void push_state(self, PieceType captured, unsigned long captured_cell) except *:
+        """ This method saves the state of the board before a move on the state stack.
+
+        :param captured: The type of the piece the move captures, EMPTY if none
+        :param captured_cell: The cell of the captured piece
+        """
+        cdef Board_state* state
+
+        # The oldest half of a full stack is dropped, a search only undoes the moves it made itself.
+        if self.state_count == MAX_STATES:
+            memmove(self.states, &self.states[MAX_STATES // 2], (MAX_STATES - MAX_STATES // 2) * sizeof(Board_state))
+            self.state_count -= MAX_STATES // 2
+
+        state = &self.states[self.state_count]
+        state.zobrist_key = self.zobrist_key
+        state.en_passant_ready = self.en_passant_ready
+        state.count = self.count
+        state.castling_rights = self.castling_rights
+        state.captured = <unsigned char>captured
+        state.captured_cell = captured_cell
+        self.state_count += 1
+
+    cdef Board_state pop_state(self) except *:
+        """ This method removes the state of the last move from the state stack.
+
+        :return: The state of the board before the last move
+        """
+        if self.state_count == 0:
+            raise IndexError("There is no move to undo")
+
+        self.state_count -= 1
+        return self.states[self.state_count]
+
+    cdef void restore_state(self, Board_state state):
+        """ This method restores the castling options, en-passant, count and zobrist key of a saved state.
+
+        :param state: The saved state
+        """
+        self.castling_rights = state.castling_rights
+        self.en_passant_ready = state.en_passant_ready
+        self.count = state.count
+        self.zobrist_key = state.zobrist_key
 
     cpdef list get_pieces_dict(self, bint is_white):
         """ This function returns the dictionary of the cells in which certain piece type is found.
+        The board keeps the pieces only in its bitmaps, so the lists are built on request and kept until a piece moves.
 
         :param is_white: If we want the dict for the white pieces or not
         :return: The required dictionary
         """
+        cdef list pieces
+        cdef unsigned long long piece_map
+        cdef int piece
+
+        pieces = self.white_pieces if is_white else self.black_pieces
+        if pieces is not None:
+            return pieces
+
+        pieces = []
+        for piece in range(6):
+            piece_map = self.get_piece_map(<PieceType>piece, is_white)
+            cells = []
+            while piece_map != 0:
+                cells.append(binary_ops_utils.bit_scan_forward(piece_map))
+                piece_map &= piece_map - 1
+            pieces.append(cells)
+
+        if is_white:
+            self.white_pieces = pieces
+        else:
+            self.black_pieces = pieces
+        return pieces
 
-        return self.white_pieces if is_white else self.black_pieces
+    cdef unsigned long long get_piece_map(self, PieceType piece, bint is_white):
+        """ This function returns the bitmap of the pieces of a certain type and color.
+
+        :param piece: The piece type
+        :param is_white: The color of the pieces
+        :return: The bitmap of the cells of the pieces
+        """
+        return self.piece_maps[<int>piece] & (self.white_board if is_white else self.black_board)
+
+    cpdef unsigned long get_king_cell(self, bint is_white):
+        """ This function returns the cell of the king of a certain color.
+
+        :param is_white: The color of the king
+        :return: The cell index of the king
+        """
+        return binary_ops_utils.bit_scan_forward(self.get_piece_map(PieceType.KING, is_white))
+
+    cpdef void refresh_evaluation(self):
+        """
+        This method recomputes the PeSTO sums and the game phase from the pieces on the board.
+        """
+        cdef unsigned long long piece_map
+        cdef unsigned long cell
+        cdef int piece
+
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        for piece in range(6):
+            piece_map = self.piece_maps[piece] & self.white_board
+            while piece_map != 0:
+                cell = binary_ops_utils.bit_scan_forward(piece_map)
+                piece_map &= piece_map - 1
+                self.mg_score += pesto_tables.mg_values[piece * 2][cell]
+                self.eg_score += pesto_tables.eg_values[piece * 2][cell]
+                self.phase += pesto_tables.phase_weights[piece]
+
+            piece_map = self.piece_maps[piece] & self.black_board
+            while piece_map != 0:
+                cell = binary_ops_utils.bit_scan_forward(piece_map)
+                piece_map &= piece_map - 1
+                self.mg_score -= pesto_tables.mg_values[piece * 2 + 1][cell]
+                self.eg_score -= pesto_tables.eg_values[piece * 2 + 1][cell]
+                self.phase += pesto_tables.phase_weights[piece]
+        self.pesto_generation = pesto_generation
+
+    cdef void update_evaluation(self, unsigned long cell, PieceType piece, bint is_white, int sign):
+        """ This method updates the PeSTO sums and the game phase when a piece is set or removed.
+
+        :param cell: The cell of the piece
+        :param piece: The piece type
+        :param is_white: The color of the piece
+        :param sign: 1 if the piece is set and -1 if it is removed
+        """
+        cdef int index
+
+        self.phase += sign * pesto_tables.phase_weights[<int>piece]
+        index = <int>piece * 2
+        if not is_white:
+            index += 1
+            sign = -sign
+        self.mg_score += sign * pesto_tables.mg_values[index][cell]
+        self.eg_score += sign * pesto_tables.eg_values[index][cell]
+
+    cdef void ensure_evaluation(self):
+        """
+        This method recomputes the PeSTO sums if the tables changed since they were computed.
+        """
+        if self.pesto_generation != pesto_generation:
+            self.refresh_evaluation()
+
+    cpdef tuple get_pesto_scores(self):
+        """ Returns the PeSTO sums of the position in O(1).
+
+        :return: The middle game and endgame scores from the side of the player to move, and the game phase capped at 24
+        """
+        self.ensure_evaluation()
+        if self.is_white:
+            return self.mg_score, self.eg_score, min(self.phase, 24)
+        return -self.mg_score, -self.eg_score, min(self.phase, 24)
+
+    cpdef double pesto_evaluation(self):
+        """ Returns the tapered PeSTO evaluation of the position in O(1).
+
+        :return: The evaluation from the side of the player to move
+        """
+        cdef int mg_score, eg_score, phase
+
+        self.ensure_evaluation()
+        mg_score = self.mg_score if self.is_white else -self.mg_score
+        eg_score = self.eg_score if self.is_white else -self.eg_score
+        phase = min(self.phase, 24)
+        return (mg_score * phase + eg_score * (24 - phase)) / 24.0
 
     cpdef bint is_insufficient(self):
         """ This function returns if the board pieces are insufficient
 
         :return: True if the board state is insufficient for a mate, False otherwise.
         """
+        cdef unsigned long long heavy, minor
+
+        if self.piece_maps[<int>PieceType.PAWN] != 0:
+            return False
 
-        if self.white_pieces[<int>PieceType.PAWN] == [] and self.black_pieces[<int>PieceType.PAWN] == []:
-            if len(self.white_pieces[<int>PieceType.ROOK] + self.white_pieces[<int>PieceType.QUEEN]) == 0 and len(
-                    self.white_pieces[<int>PieceType.BISHOP] + self.white_pieces[<int>PieceType.KNIGHT]) <= 1:
-                return len(self.black_pieces[<int>PieceType.ROOK] + self.black_pieces[<int>PieceType.QUEEN]) == 0 and len(
-                    self.black_pieces[<int>PieceType.BISHOP] + self.black_pieces[<int>PieceType.KNIGHT]) <= 1
-        return False
+        heavy = self.piece_maps[<int>PieceType.ROOK] | self.piece_maps[<int>PieceType.QUEEN]
+        minor = self.piece_maps[<int>PieceType.BISHOP] | self.piece_maps[<int>PieceType.KNIGHT]
+        return heavy == 0 and binary_ops_utils.count_ones(minor & self.white_board) <= 1 and \
+            binary_ops_utils.count_ones(minor & self.black_board) <= 1
 
     cpdef bint is_type_of(self, unsigned long cell, PieceType piece):
         """ This function return if the PieceType of the a certain cell in the board is the piece it received.
@@ -246,40 +810,13 @@ cdef class Board:
             else:
                 return PieceType.KNIGHT
 
-    def __update_pawn_moves__(self) -> None:
-        """
-        This function creates an array of all the possible capture moves for a pawn based on cell index.
-        This function is made for internal use.
-        """
-
-        white_moves = []
-        black_moves = []
-        for i in range(8):
-            for j in range(8):
-                white_val = 0
-                black_val = 0
-                # Here we filter the moves that are outside of the board.
-                white_options = filter(lambda t: binary_ops_utils.translate_row_col_to_cell(t[0] + 1, t[1] + 1) != -1,
-                                       [(i + 1, j + 1), (i + 1, j - 1)])
-                black_options = filter(lambda t: binary_ops_utils.translate_row_col_to_cell(t[0] + 1, t[1] + 1) != -1,
-                                       [(i - 1, j + 1), (i - 1, j - 1)])
-                for option in white_options:
-                    white_val = binary_ops_utils.switch_cell_bit(white_val, option[0] * 8 + option[1], True)
-                for option in black_options:
-                    black_val = binary_ops_utils.switch_cell_bit(black_val, option[0] * 8 + option[1], True)
-                white_moves.append(white_val)
-                black_moves.append(black_val)
-
-        self.pawn_moves.append(white_moves)
-        self.pawn_moves.append(black_moves)
-
     cpdef bint __is_safe_en_passant__(self, unsigned long pawn_cell, unsigned long enemy_cell, bint is_white):
         cdef long king_cell, king_col, king_row, pawn_col, pawn_row, checked_cell
         cdef long start_col, end_col, start_cell, end_cell
         cdef int direction
         cdef bint threat, block, is_threat
 
-        king_cell = self.get_pieces_dict(is_white)[<int>PieceType.KING][0]
+        king_cell = self.get_king_cell(is_white)
         king_row, king_col = binary_ops_utils.translate_cell_to_row_col(king_cell)
         pawn_row, pawn_col = binary_ops_utils.translate_cell_to_row_col(pawn_cell)
         if king_col == pawn_col:
@@ -390,47 +927,6 @@ cdef class Board:
 
         return moves | captures
 
-    def __update_knight_moves__(self):
-        """
-        This function creates an array of all the possible moves for a knight based on cell index.
-        This function is made for internal use
-        """
-
-        moves = [(2, 1), (2, -1), (-2, 1), (-2, -1),
-                 (1, 2), (-1, 2), (1, -2), (-1, -2)]
-        for i in range(8):
-            for j in range(8):
-                val = 0
-                options = []
-                for move in moves:
-                    # filter illegal moves.
-                    if binary_ops_utils.translate_row_col_to_cell(move[0] + i + 1, move[1] + j + 1) != -1:
-                        options.append((move[0] + i, move[1] + j))
-
-                for option in options:
-                    val = binary_ops_utils.switch_cell_bit(val, option[0] * 8 + option[1], True)
-                self.knight_moves.append(val)
-
-    def __update_king_moves__(self) -> None:
-        """
-        This function creates an array of all the possible moves for a king based on cell index.
-        This function is made for internal use
-        """
-        moves = [(0, 1), (0, -1), (1, 1), (-1, -1),
-                 (1, -1), (-1, 1), (1, 0), (-1, 0)]
-        for i in range(8):
-            for j in range(8):
-                val = 0
-                options = []
-                for move in moves:
-                    # filter illegal moves.
-                    if binary_ops_utils.translate_row_col_to_cell(move[0] + i + 1, move[1] + j + 1) != -1:
-                        options.append((move[0] + i, move[1] + j))
-
-                for option in options:
-                    val = binary_ops_utils.switch_cell_bit(val, option[0] * 8 + option[1], True)
-                self.king_moves.append(val)
-
     cpdef unsigned long long get_king_cell_moves(self, unsigned long cell, bint is_white):
         """ Returns pseudo-legal move for a king at a certain cell.
 
@@ -455,20 +951,6 @@ cdef class Board:
         board = self.white_board if is_white else self.black_board
         return self.knight_moves[cell] & (~board)
 
-    def __update_distances__(self) -> None:
-        """
-        This function creates an array of all the possible moves for a vertical line based on cell index.
-        This function is made for internal use
-        """
-        for i in range(8):
-            for j in range(8):
-                north = 7 - i
-                south = i
-                west = j
-                east = 7 - j
-                self.vertical_distances.append((east, west, north, south,
-                                                min(north, west), min(south, east), min(north, east), min(south, west)))
-
     cpdef unsigned long long get_vertical_cell_moves(self, unsigned long cell, PieceType piece, bint is_white, bint for_attacks=False):
         """ This function returns all pseudo-legal vertical move by cell, piece type and color
 
@@ -478,17 +960,16 @@ cdef class Board:
         :param for_attacks: Flag that is used when checking if a piece is supported by another piece.
         :return: Bitmap of pseudo-legal moves
         """
-        cdef unsigned long long result 
+        cdef unsigned long long result
 
         result = 0
         if piece == PieceType.ROOK:
-            result = binary_ops_utils.get_rook_moves(self.board, cell, self.masker)
+            result = get_rook_attacks(cell, self.board)
         elif piece == PieceType.BISHOP:
-            result = binary_ops_utils.get_bishop_moves(self.board, cell, self.masker)
+            result = get_bishop_attacks(cell, self.board)
         elif piece == PieceType.QUEEN:
-            result = binary_ops_utils.get_queen_moves(self.board, cell, self.masker)
-        board = self.white_board if is_white else self.black_board
-        return (result ^ (base << cell)) if for_attacks else result & (~board)
+            result = get_queen_attacks(cell, self.board)
+        return result if for_attacks else result & ~(self.white_board if is_white else self.black_board)
 
     cpdef unsigned long long get_moves_by_piece(self, unsigned long cell, bint is_white, PieceType piece, bint for_attacks=False):
         """ Returns all pseudo-legal moves from a cell for a certain piece type and color.
@@ -541,7 +1022,8 @@ cdef class Board:
 
         board = self.black_board if is_white else self.white_board
         piece = self.get_cell_type(cell)
-        attacks = self.attackers_maps[<int>piece][0] if is_white else self.attackers_maps[<int>piece][1]
+        self.refresh_attacks()
+        attacks = self.attack_maps[<int>piece][0] if is_white else self.attack_maps[<int>piece][1]
         if attacks & board == 0:
             return 0
 
@@ -550,38 +1032,67 @@ cdef class Board:
 
     cpdef void __update_attacker__(self, bint is_white):
         """ This is a method to update the attacker's bitmaps and is for internal use only.
+        Only the sliding pieces that stand on a changed cell or attack one are recomputed,
+        the attacks of the other pieces are cheap lookups.
 
         :param is_white: The color which we update
-        :param piece: Optional param, used for optimization where we update impacted maps, currently not in use.
         """
-        cdef list[6] piece_dict
         cdef int index
-        cdef unsigned long long temp
+        cdef unsigned long long temp, pawns, piece_map
+        cdef unsigned long cell
         cdef PieceType piece
+        cdef unsigned long long started
 
-        piece_dict = self.get_pieces_dict(is_white)
+        started = profile_clock()
         index = 0 if is_white else 1
-        self.attackers[index] = 0
 
-        # Update all maps.
-        for piece in self.pieces_dict.values():
-            temp = 0            
-            for cell in piece_dict[<int>piece]:
+        # The pawns attacks are computed for all of them at once by shifting.
+        pawns = self.piece_maps[<int>PieceType.PAWN] & (self.white_board if is_white else self.black_board)
+        if is_white:
+            temp = ((pawns << 9) & not_file_a) | ((pawns << 7) & not_file_h)
+        else:
+            temp = ((pawns >> 7) & not_file_a) | ((pawns >> 9) & not_file_h)
+        self.attack_maps[<int>PieceType.PAWN][index] = temp
+
+        for piece in (PieceType.KNIGHT, PieceType.KING):
+            temp = 0
+            piece_map = self.get_piece_map(piece, is_white)
+            while piece_map != 0:
+                cell = binary_ops_utils.bit_scan_forward(piece_map)
+                piece_map &= piece_map - 1
                 temp |= self.get_moves_by_piece(cell, is_white, piece, True)
-            self.attackers_maps[<int>piece][index] = temp
-
+            self.attack_maps[<int>piece][index] = temp
+
+        for piece in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP):
+            temp = 0
+            piece_map = self.get_piece_map(piece, is_white)
+            while piece_map != 0:
+                cell = binary_ops_utils.bit_scan_forward(piece_map)
+                piece_map &= piece_map - 1
+                if ((base << cell) | self.slider_attacks[cell]) & self.changed_cells != 0:
+                    self.slider_attacks[cell] = self.get_vertical_cell_moves(cell, piece, is_white, True)
+                temp |= self.slider_attacks[cell]
+            self.attack_maps[<int>piece][index] = temp
 
         # Update board state
-        temp = 0
-        temp |= self.attackers_maps[<int>PieceType.QUEEN][index]
-        temp |= self.attackers_maps[<int>PieceType.ROOK][index]
-        temp |= self.attackers_maps[<int>PieceType.BISHOP][index]
-        self.sliding_attacks = temp
+        temp = self.attack_maps[<int>PieceType.QUEEN][index] | self.attack_maps[<int>PieceType.ROOK][index]
+        temp |= self.attack_maps[<int>PieceType.BISHOP][index] | self.attack_maps[<int>PieceType.PAWN][index]
+        temp |= self.attack_maps[<int>PieceType.KING][index] | self.attack_maps[<int>PieceType.KNIGHT][index]
+        self.color_attacks[index] = temp
+        if PROFILE_ENABLED:
+            profile_record(Section.UPDATE_ATTACKER, started)
+
+    cdef void refresh_attacks(self):
+        """
+        This method brings the attack maps up to date with the pieces that changed since they were last used.
+        The maps are only needed by some nodes of a search, so they are computed on first use instead of every move.
+        """
+        if self.changed_cells == 0:
+            return
 
-        temp = 0
-        temp = self.attackers_maps[<int>PieceType.PAWN][index] | self.attackers_maps[<int>PieceType.KING][index]
-        temp |= self.attackers_maps[<int>PieceType.KNIGHT][index]
-        self.attackers[index] = self.sliding_attacks | temp
+        self.__update_attacker__(True)
+        self.__update_attacker__(False)
+        self.changed_cells = 0
 
     cpdef unsigned long long get_attacks(self, bint is_white):
         """ Returns the bitmap of the attacks on certain player.
@@ -589,11 +1100,19 @@ cdef class Board:
         :param is_white: Player's color
         :return: The attack bitmap
         """
-        return self.attackers[1] if is_white else self.attackers[0]
+        cdef unsigned long long attacks
+
+        self.refresh_attacks()
+        attacks = self.color_attacks[1] if is_white else self.color_attacks[0]
+        # The cell behind the king on a checking ray is attacked as well.
+        if is_white == self.is_white:
+            attacks |= self.check_xray
+        return attacks
 
 
     cpdef unsigned long long get_pawn_attacks(self, bint is_white):
-        return self.attackers_maps[<int>PieceType.PAWN][1] if is_white else self.attackers_maps[<int>PieceType.PAWN][0]
+        self.refresh_attacks()
+        return self.attack_maps[<int>PieceType.PAWN][1] if is_white else self.attack_maps[<int>PieceType.PAWN][0]
 
 
     cpdef void __update_pins_and_checks__(self, bint is_white):
@@ -601,27 +1120,28 @@ cdef class Board:
 
         :param is_white: The king's color
         """
-        cdef list[6] pieces_dict, enemy_dict
         cdef unsigned long king_cell, destination, tmp, cell
-        cdef int index, start, end, direction_index, offset, num, i, pawn_advancement, king_row, pawn_row
-        cdef unsigned long long mask
+        cdef int index, start, end, direction_index, offset, num, i
+        cdef unsigned long long mask, enemy_board
         cdef bint is_diagonal, friend_ray, can_diagonal, can_vertical, threat
+        cdef unsigned long long started
 
-        pieces_dict = self.get_pieces_dict(is_white)
-        enemy_dict = self.get_pieces_dict(not is_white)
-        king_cell = pieces_dict[<int>PieceType.KING][0]
+        started = profile_clock()
+        enemy_board = self.black_board if is_white else self.white_board
+        king_cell = self.get_king_cell(is_white)
         index = 1 if is_white else 0
         self.pin_map = 0
         self.pin_in_position = False
         self.position_in_check = False
         self.position_in_double_check = False
         self.check_map = 0
+        self.check_xray = 0
         self.threats = []
         start = 0
         end = 8
-        if len(enemy_dict[<int>PieceType.QUEEN]) == 0:
-            start = 0 if len(enemy_dict[<int>PieceType.ROOK]) != 0 else 4
-            end = 8 if len(enemy_dict[<int>PieceType.BISHOP]) != 0 else 4
+        if self.piece_maps[<int>PieceType.QUEEN] & enemy_board == 0:
+            start = 0 if self.piece_maps[<int>PieceType.ROOK] & enemy_board != 0 else 4
+            end = 8 if self.piece_maps[<int>PieceType.BISHOP] & enemy_board != 0 else 4
 
         # Check threats from sliding pieces in each direction.
         for direction_index in range(start, end):
@@ -652,8 +1172,7 @@ cdef class Board:
                             else:
                                 tmp = king_cell - offset
                                 if tmp >= 0:
-                                    index = 1 if is_white else 0
-                                    self.attackers[index] |= (base << tmp)
+                                    self.check_xray |= (base << tmp)
                                 self.check_map |= mask
                                 self.position_in_double_check = self.position_in_check
                                 self.position_in_check = True
@@ -661,29 +1180,18 @@ cdef class Board:
                         break
 
         # Check attacks from enemy knights.
-        for cell in enemy_dict[<int>PieceType.KNIGHT]:
-            if self.knight_moves[cell] & (base << king_cell) != 0:
-                self.check_map = binary_ops_utils.switch_cell_bit(self.check_map, cell, True)
-                self.position_in_double_check = self.position_in_check
-                self.position_in_check = True
-                self.threats.append(cell)
-                return
-
-        king_row = <int>(king_cell / 8)
-        # We check the enemies pawns.
-        pawn_advancement = -1 if is_white else 1
-        if (base << king_cell) & self.attackers_maps[<int>PieceType.PAWN][index] == 0:
-            return
-        for cell in enemy_dict[<int>PieceType.PAWN]:
-            pawn_row = <int>(cell / 8)
-            if pawn_row + pawn_advancement != king_row:
-                continue
-            if self.get_pawn_captures(cell, not is_white) & (base << king_cell) != 0:
-                self.check_map = binary_ops_utils.switch_cell_bit(self.check_map, cell, True)
-                self.position_in_double_check = self.position_in_check
-                self.position_in_check = True
-                self.threats.append(cell)
-                return
+        mask = self.knight_moves[king_cell] & self.piece_maps[<int>PieceType.KNIGHT] & enemy_board
+        if mask == 0:
+            # A pawn checks the king if the king could capture it as a pawn of the king's color.
+            mask = self.get_pawn_captures(king_cell, is_white) & self.piece_maps[<int>PieceType.PAWN] & enemy_board
+        if mask != 0:
+            cell = binary_ops_utils.bit_scan_forward(mask)
+            self.check_map = binary_ops_utils.switch_cell_bit(self.check_map, cell, True)
+            self.position_in_double_check = self.position_in_check
+            self.position_in_check = True
+            self.threats.append(cell)
+        if PROFILE_ENABLED:
+            profile_record(Section.UPDATE_PINS_AND_CHECKS, started)
 
     cpdef bint is_pinned(self, unsigned long cell):
         """ This returns whether a cell is pinned by the opponent.
@@ -704,15 +1212,65 @@ cdef class Board:
         :param piece: The piece that were moved
         :param enables_en_passant: Flag that says whether it allows en-passant on the next move
         """
+        cdef unsigned long long started
 
-        self.en_passant_ready = target_cell if enables_en_passant else 0
+        started = profile_clock()
+        self.set_en_passant(target_cell if enables_en_passant else 0)
         self.sliding = self.piece_maps[<int>PieceType.QUEEN] | self.piece_maps[<int>PieceType.BISHOP] | self.piece_maps[
             <int>PieceType.ROOK]
-        self.__update_attacker__(True)
-        self.__update_attacker__(False)
         self.is_white = not self.is_white
+        self.zobrist_key ^= zobrist_side
         self.__update_pins_and_checks__(self.is_white)
 
         if piece == PieceType.PAWN:
             self.count = 0
         self.count += 1
+        if PROFILE_ENABLED:
+            profile_record(Section.UPDATE_ROUND, started)
+
+
+cdef class Board_pool:
+    """
+
+    This class keeps released boards so batch workloads can reuse them instead of building new ones.
+
+    """
+
+    def __cinit__(self, int max_size=64):
+        """ Initialize an empty pool.
+
+        :param max_size: The maximal amount of released boards the pool keeps
+        """
+        self.boards = []
+        self.max_size = max_size
+
+    def __len__(self):
+        return len(self.boards)
+
+    cpdef Board acquire(self, Board source=None):
+        """ Returns a board from the pool, or a new one if the pool is empty.
+
+        :param source: The board whose state is copied, the initial position if None
+        :return: A board in the state of source
+        """
+        cdef Board board
+
+        if source is None:
+            source = initial_board
+        if not self.boards:
+            return source.copy()
+
+        board = self.boards.pop()
+        board.load(source)
+        return board
+
+    cpdef void release(self, Board board):
+        """ Return a board to the pool, it mustn't be used by the caller afterwards.
+
+        :param board: The board which is no longer needed
+        """
+        if len(self.boards) < self.max_size:
+            self.boards.append(board)
+
+
+cdef Board initial_board = Board()
@@ -1,7 +1,25 @@
 from cython cimport int, long
 
 from piece cimport PieceType
-from board cimport Board
+from board cimport Board, Board_state
+
+# A packed move is origin | target << 6 | promotion << 12 | castle << 15, where promotion is 0 if there is none.
+# 0 is never a legal move so it marks an empty move.
+cdef enum:
+    MOVE_CASTLE = 1 << 15
+
+cdef inline unsigned int pack_move(unsigned long cell, unsigned long target, PieceType promotion, bint castle) noexcept nogil:
+    return cell | (target << 6) | ((<unsigned int>promotion if promotion != PieceType.EMPTY else 0) << 12) | \
+        (MOVE_CASTLE if castle else 0)
+
+cdef inline unsigned long move_origin(unsigned int move) noexcept nogil:
+    return move & 63
+
+cdef inline unsigned long move_target(unsigned int move) noexcept nogil:
+    return (move >> 6) & 63
+
+cdef inline PieceType move_promotion(unsigned int move) noexcept nogil:
+    return <PieceType>((move >> 12) & 7) if (move >> 12) & 7 != 0 else PieceType.EMPTY
 
 cdef class Move:
     """
@@ -10,35 +28,58 @@ cdef class Move:
     # instance attributes
     cdef public unsigned long cell
     cdef public unsigned long target
-    cdef public unsigned long enemy_cell
-    cdef public unsigned long prev_en_passant
     cdef public bint castle
     cdef public bint is_king_side
-    cdef public bint is_en_passant
     cdef public PieceType promotion
-    cdef public PieceType enemy_type
-    cdef public unicode prev_castling
-    cdef public int prev_count
 
     # class methods
     cpdef void set_castle(self, bint is_king_side)
     cpdef void set_promotion(self, PieceType piece)
+    cpdef unsigned int encode(self)
+
+cpdef Move decode_move(unsigned int move)
+
+# The most legal moves a position can have is 218, so a buffer of this size never overflows.
+cdef enum:
+    MAX_MOVES = 256
+
+cpdef enum Generation_mode:
+    ALL_MOVES = 0
+    CAPTURES = 1
+    QUIETS = 2
+
+cdef class Move_buffer:
+    """
+    This class represents a reusable buffer of packed moves which the move generator fills
+    """
+    cdef unsigned int[MAX_MOVES] moves
+    cdef public int count
+
+    cdef void add(self, unsigned int move)
+    cpdef list get_moves(self)
 
 cpdef bint is_pseudo_legal(Board board, Move move)
 cpdef bint is_threatened(Board board, bint is_white, unsigned long cell)
 cpdef list get_all_legal_moves(Board board, unsigned long cell, PieceType piece, bint is_white)
 cpdef list get_all_legal_captures(Board board, unsigned long cell, PieceType piece, bint is_white)
+cpdef int generate_moves(Board board, Move_buffer buffer, Generation_mode mode=*)
 cpdef bint condition(Board board, Move move, PieceType piece, bint is_white)
+cdef bint is_legal(Board board, unsigned long cell, unsigned long target, PieceType piece, bint is_white)
 cpdef list get_threats(Board board)
 cpdef bint is_under_check(Board board)
 cpdef bint is_mate(Board board, bint is_white)
 cpdef bint can_castle(Board board, bint is_white, Move move)
+cdef bint is_castle_allowed(Board board, bint is_white, bint is_king_side)
 cpdef void castle(Board board, bint is_white, Move move, bint valid=*)
 cpdef void promote(Board board, Move move)
 cpdef void make_move(Board board, Move move, bint valid=*)
+cpdef void make_packed_move(Board board, unsigned int move)
 cpdef list get_castle_moves(Board board, bint is_white)
 cpdef list get_promotion_moves(Move move)
 cpdef bint check_stalemate(Board board)
-cpdef void fill_undo_info(Board board, Move move, PieceType enemy_type)
 cpdef void update_castling_option(unsigned long rook_cell, Board board, bint is_white)
-cpdef void undo_move(Board board, Move move)
\ No newline at end of file
+cpdef void undo_move(Board board, Move move)
+cpdef void undo_packed_move(Board board, unsigned int move)
+cpdef void make_null_move(Board board)
+cpdef void undo_null_move(Board board)
+cpdef bint has_non_pawn_material(Board board, bint is_white)
\ No newline at end of file
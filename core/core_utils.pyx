@@ -2,9 +2,10 @@
 from typing import List
 
 cimport binary_ops_utils
-from board cimport Board
+from board cimport Board, Board_state, WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE
 from .chess_exceptions import NonLegal, KingUnderCheck
 from piece cimport PieceType
+from profiler cimport PROFILE_ENABLED, Section, profile_clock, profile_record
 
 cdef unsigned long long base
 base = 1
@@ -15,7 +16,8 @@ cdef unsigned long abs(long num):
     return -num
 cdef class Move:
     """
-    This class represent a move in the game with origin, target, castling and promotion data
+    This class represent a move in the game with origin, target, castling and promotion data.
+    The engine itself works with packed moves, this class is used by the interface and notation code.
     """
 
     def __cinit__(self, cell: int, tar: int):
@@ -29,12 +31,13 @@ cdef class Move:
         self.target = tar
         self.castle = False
         self.is_king_side = False
-        self.is_en_passant = False
         self.promotion = PieceType.EMPTY
-        self.enemy_type = PieceType.EMPTY
-        self.enemy_cell = 0
-        self.prev_en_passant = 0
-        self.prev_castling = u''
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.encode() == (<Move>other).encode()
+
+    def __hash__(self):
+        return self.encode()
 
     cpdef void set_castle(self, bint is_king_side):
         """ This defines the move to be a castling move
@@ -51,6 +54,69 @@ cdef class Move:
         """
         self.promotion = piece
 
+    cpdef unsigned int encode(self):
+        """ Returns the packed form of the move
+
+        :return: The move packed into an int
+        """
+        return pack_move(self.cell, self.target, self.promotion, self.castle)
+
+
+cpdef Move decode_move(unsigned int move):
+    """ Returns the move object of a packed move
+
+    :param move: The packed move
+    :return: The corresponding move, None if the packed move is empty
+    """
+    cdef Move result
+
+    if move == 0:
+        return None
+
+    result = Move(move_origin(move), move_target(move))
+    if move_promotion(move) != PieceType.EMPTY:
+        result.set_promotion(move_promotion(move))
+    if move & MOVE_CASTLE:
+        result.set_castle(move_target(move) & 7 == 6)
+    return result
+
+
+cdef class Move_buffer:
+    """
+    This class represents a reusable buffer of packed moves which the move generator fills,
+    a search keeps one buffer per ply.
+    """
+
+    def __cinit__(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int):
+        if index < 0 or index >= self.count:
+            raise IndexError("Move buffer index out of range")
+        return self.moves[index]
+
+    cdef void add(self, unsigned int move):
+        """ Append a packed move to the buffer.
+
+        :param move: The packed move
+        """
+        self.moves[self.count] = move
+        self.count += 1
+
+    cpdef list get_moves(self):
+        """ Returns the generated moves
+
+        :return: A list of the packed moves currently in the buffer
+        """
+        return [self.moves[i] for i in range(self.count)]
+
+
+# Used to look for any legal move without disturbing the buffers of a search.
+cdef Move_buffer mate_buffer = Move_buffer()
+
 
 cpdef bint is_pseudo_legal(Board board, Move move):
     """ Return whether a move is pseudo legal on a board
@@ -88,8 +154,12 @@ cpdef list get_all_legal_moves(Board board, unsigned long cell, PieceType piece,
     cdef list moves, targets
     cdef Move move
     cdef unsigned long target
+    cdef unsigned long long started
 
+    started = profile_clock()
     if board.is_cell_empty(cell) or board.is_cell_colored(cell, not is_white):
+        if PROFILE_ENABLED:
+            profile_record(Section.GET_ALL_LEGAL_MOVES, started)
         return []
 
     moves = []
@@ -108,6 +178,8 @@ cpdef list get_all_legal_moves(Board board, unsigned long cell, PieceType piece,
     if piece == PieceType.KING:
         moves += get_castle_moves(board, board.is_cell_colored(cell, True))
 
+    if PROFILE_ENABLED:
+        profile_record(Section.GET_ALL_LEGAL_MOVES, started)
     return moves
 
 cpdef list get_all_legal_captures(Board board, unsigned long cell, PieceType piece, bint is_white):
@@ -136,6 +208,75 @@ cpdef list get_all_legal_captures(Board board, unsigned long cell, PieceType pie
 
     return moves
 
+cpdef int generate_moves(Board board, Move_buffer buffer, Generation_mode mode=Generation_mode.ALL_MOVES):
+    """ Generates the legal moves of the player to move into a buffer, replacing its content.
+
+    :param board: The board we use
+    :param buffer: The buffer which is filled with the packed moves
+    :param mode: Whether to generate all of the moves, only the captures or only the quiet moves
+    :return: The amount of moves generated
+    """
+    cdef unsigned long long enemy_board, captures, targets, piece_map
+    cdef unsigned long cell, target, king_cell
+    cdef int promotion_rank, row, i
+    cdef bint is_white
+    cdef PieceType piece
+    cdef PieceType[6] piece_order
+    cdef PieceType[4] promotions
+    cdef unsigned long long started
+
+    started = profile_clock()
+    buffer.count = 0
+    is_white = board.is_white
+    enemy_board = board.black_board if is_white else board.white_board
+    promotion_rank = 7 if is_white else 0
+    piece_order = [PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT, PieceType.KING, PieceType.PAWN]
+    promotions = [PieceType.QUEEN, PieceType.ROOK, PieceType.KNIGHT, PieceType.BISHOP]
+
+    for piece in piece_order:
+        # Only the king can move out of a double check.
+        if board.position_in_double_check and piece != PieceType.KING:
+            continue
+
+        captures = enemy_board
+        if piece == PieceType.PAWN and board.en_passant_ready != 0:
+            captures |= base << (board.en_passant_ready + (8 if is_white else -8))
+
+        piece_map = board.get_piece_map(piece, is_white)
+        while piece_map != 0:
+            cell = binary_ops_utils.bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            targets = board.get_moves_by_piece(cell, is_white, piece)
+            if mode == Generation_mode.CAPTURES:
+                targets &= captures
+            elif mode == Generation_mode.QUIETS:
+                targets &= ~captures
+
+            while targets != 0:
+                target = binary_ops_utils.bit_scan_forward(targets)
+                targets &= targets - 1
+                if not is_legal(board, cell, target, piece, is_white):
+                    continue
+
+                if piece == PieceType.PAWN and <int>(target / 8) == promotion_rank:
+                    for i in range(4):
+                        buffer.add(pack_move(cell, target, promotions[i], False))
+                else:
+                    buffer.add(pack_move(cell, target, PieceType.EMPTY, False))
+
+    if mode != Generation_mode.CAPTURES and not board.position_in_check:
+        row = 1 if is_white else 8
+        king_cell = board.get_king_cell(is_white)
+        for i in range(2):
+            if is_castle_allowed(board, is_white, i == 0):
+                target = binary_ops_utils.translate_row_col_to_cell(row, 7 if i == 0 else 3)
+                buffer.add(pack_move(king_cell, target, PieceType.EMPTY, True))
+
+    if PROFILE_ENABLED:
+        profile_record(Section.GENERATE_MOVES, started)
+    return buffer.count
+
+
 cpdef bint condition(Board board, Move move, PieceType piece, bint is_white):
     """ Returns if a move on the board for a certain piece is legal.
 
@@ -145,7 +286,27 @@ cpdef bint condition(Board board, Move move, PieceType piece, bint is_white):
     :param is_white: Whether it is a move of the white player
     :return: If the move is legal
     """
-    cdef unsigned long cell, king_cell, en_capture
+    cdef unsigned long long started
+    cdef bint legal
+
+    started = profile_clock()
+    legal = is_legal(board, move.cell, move.target, piece, is_white)
+    if PROFILE_ENABLED:
+        profile_record(Section.CONDITION, started)
+    return legal
+
+
+cdef bint is_legal(Board board, unsigned long cell, unsigned long target, PieceType piece, bint is_white):
+    """ Returns if a pseudo legal move on the board for a certain piece is legal.
+
+    :param board: The board we check
+    :param cell: The origin cell index
+    :param target: The target cell index
+    :param piece: The move's origin cell PieceType
+    :param is_white: Whether it is a move of the white player
+    :return: If the move is legal
+    """
+    cdef unsigned long king_cell, en_capture
     cdef int step, direction
 
     if piece == PieceType.EMPTY:
@@ -154,26 +315,25 @@ cpdef bint condition(Board board, Move move, PieceType piece, bint is_white):
     if board.position_in_double_check and piece != PieceType.KING:
         return False
 
-    if piece == PieceType.KING and (board.get_attacks(is_white) & (base << move.target) != 0):
+    if piece == PieceType.KING and (board.get_attacks(is_white) & (base << target) != 0):
         return False
 
-    cell = move.cell
-    king_cell = board.get_pieces_dict(is_white)[<int>PieceType.KING][0]
-    step = binary_ops_utils.get_direction(move.target, king_cell)
+    king_cell = board.get_king_cell(is_white)
+    step = binary_ops_utils.get_direction(target, king_cell)
 
     if board.position_in_check:
         # The king escapes to safety
         if piece == PieceType.KING:
-            return board.get_attacks(is_white) & (base << move.target) == 0
+            return board.get_attacks(is_white) & (base << target) == 0
 
         # The move blocks the attack and isn't pinned
-        if (base << move.target) & board.check_map != 0 and (not board.is_pinned(cell)):
+        if (base << target) & board.check_map != 0 and (not board.is_pinned(cell)):
             return True
 
         # check for en_passant help
         if piece == PieceType.PAWN:
             direction = -8 if is_white else 8
-            en_capture = move.target + direction
+            en_capture = target + direction
             if en_capture == board.en_passant_ready:
                 return (base << en_capture) & board.check_map != 0 and (not board.is_pinned(cell))
         return False
@@ -182,7 +342,7 @@ cpdef bint condition(Board board, Move move, PieceType piece, bint is_white):
         return True
 
     # Check if pinned piece stays on it's ray
-    return abs(binary_ops_utils.get_direction(move.cell, king_cell)) == abs(step)
+    return abs(binary_ops_utils.get_direction(cell, king_cell)) == abs(step)
 
 
 cpdef list get_threats(Board board):
@@ -211,21 +371,8 @@ cpdef bint is_mate(Board board, bint is_white):
     :param is_white: Is the current player the white player
     :return: True if it is a mate for the opponent
     """
-    cdef list[6] pieces_dict
-    cdef unsigned long king_cell, cell
-    cdef PieceType piece
-
-    pieces_dict = board.get_pieces_dict(is_white)
-    king_cell = pieces_dict[<int>PieceType.KING][0]
-    if board.position_in_check:
-        if not get_all_legal_moves(board, king_cell, PieceType.KING, is_white):
-            if board.position_in_double_check:
-                return True
-            for piece in board.pieces_dict.values():
-                for cell in pieces_dict[piece]:
-                    if get_all_legal_moves(board, cell, piece, is_white):
-                        return False
-            return True
+    if board.position_in_check and board.is_white == is_white:
+        return generate_moves(board, mate_buffer) == 0
     return False
 
 
@@ -237,17 +384,34 @@ cpdef bint can_castle(Board board, bint is_white, Move move):
     :param move: The move which is validated
     :return: True if the move is a legal castling move
     """
-    cdef unicode option
+    if move.castle is False:
+        return False
+    return is_castle_allowed(board, is_white, move.is_king_side)
+
+
+cdef bint is_castle_allowed(Board board, bint is_white, bint is_king_side):
+    """ This method validates castling to a certain side on a board
+
+    :param board: The board on which we validate the castling
+    :param is_white: Whether the current player is white
+    :param is_king_side: Whether the castling is to the king side
+    :return: True if the castling is legal
+    """
+    cdef unsigned char right
     cdef long direction, row, path
     cdef bint not_threatened, valid
 
-    if move.castle is False:
-        return False
     if is_under_check(board):
         return False
 
-    option = u'k' if move.is_king_side else u'q'
-    direction = 1 if move.is_king_side else -1
+    if is_white:
+        right = WHITE_KING_SIDE if is_king_side else WHITE_QUEEN_SIDE
+    else:
+        right = BLACK_KING_SIDE if is_king_side else BLACK_QUEEN_SIDE
+    if board.castling_rights & right == 0:
+        return False
+
+    direction = 1 if is_king_side else -1
 
     row = 1 if is_white else 8
     path = binary_ops_utils.translate_row_col_to_cell(row, 5 + direction)
@@ -259,13 +423,10 @@ cpdef bint can_castle(Board board, bint is_white, Move move):
                       binary_ops_utils.translate_row_col_to_cell(row, 5 + 2 * direction))) and not_threatened
     valid = (base << path) & board.get_board() == 0 and not_threatened
 
-    if not move.is_king_side:
+    if not is_king_side:
         valid = valid and (base << binary_ops_utils.translate_row_col_to_cell(row, 2)) & board.get_board() == 0
 
-    if is_white:
-        return valid and (option.upper() in board.castling_options)
-
-    return option in board.castling_options and valid
+    return valid
 
 
 cpdef void castle(Board board, bint is_white, Move move, bint valid=False):
@@ -276,9 +437,6 @@ cpdef void castle(Board board, bint is_white, Move move, bint valid=False):
     :param move: The castling move
     :param valid: Flag that says if the move was validated beforehand
     """
-    cdef long row, col, side
-    cdef unsigned long king_cell, rook_cell
-
     if move.castle is False:
         raise NonLegal()
     if (not valid) and is_under_check(board):
@@ -287,23 +445,7 @@ cpdef void castle(Board board, bint is_white, Move move, bint valid=False):
     if not can_castle(board, is_white, move):
         raise NonLegal()
 
-    row = 1 if is_white else 8
-    col = 8 if move.is_king_side else 1
-    side = -1 if move.is_king_side else 1
-    king_cell = board.get_pieces_dict(is_white)[<int>PieceType.KING][0]
-    rook_cell = binary_ops_utils.translate_row_col_to_cell(row, col)
-
-    board.remove_cell_piece(king_cell, PieceType.KING, is_white)
-    board.remove_cell_piece(rook_cell, PieceType.ROOK, is_white)
-
-    if is_white:
-        board.castling_options = ''.join([c for c in board.castling_options if c.islower()])
-    else:
-        board.castling_options = ''.join([c for c in board.castling_options if c.isupper()])
-    board.set_cell_piece(move.target, PieceType.KING, is_white)
-    board.set_cell_piece(move.target + side, PieceType.ROOK, is_white)
-    board.update_round(move.target, PieceType.KING, False)
-    board.repetition_table.update_entry(board.zobrist_key, True)
+    make_packed_move(board, move.encode())
 
 
 cpdef void promote(Board board, Move move):
@@ -332,62 +474,93 @@ cpdef void make_move(Board board, Move move, bint valid=True):
     :param move: The move being performed
     :param valid: Flag that determine whether the move was validated
     """
-    cdef PieceType piece, target_type
-    cdef bint enable_en_passant
-    cdef long diff, side
-
-    piece = board.get_cell_type(move.cell)
-    target_type = board.get_cell_type(move.target)
-    fill_undo_info(board, move, target_type)
-    enable_en_passant = False
+    cdef PieceType piece
+    cdef unsigned long long started
+
+    started = profile_clock()
     if move.castle:
         castle(board, board.is_white, move)
+        if PROFILE_ENABLED:
+            profile_record(Section.MAKE_MOVE, started)
         return
 
-    if move.promotion != PieceType.EMPTY and piece == PieceType.PAWN:
-        promote(board, move)
-        piece = move.promotion
-
     if not valid:
+        piece = board.get_cell_type(move.cell)
+        if move.promotion != PieceType.EMPTY and piece == PieceType.PAWN:
+            if <int>(move.target / 8) != (7 if board.is_white else 0):
+                raise NonLegal()
         if not condition(board, move, piece, board.is_white):
             raise NonLegal()
 
+    make_packed_move(board, move.encode())
+    if PROFILE_ENABLED:
+        profile_record(Section.MAKE_MOVE, started)
+
+
+cpdef void make_packed_move(Board board, unsigned int move):
+    """ Perform a packed move on the board, the information needed to undo it is pushed to the board's state stack.
+
+    :param board: The board
+    :param move: The packed move, it must be legal in the position
+    """
+    cdef unsigned long cell, target, captured_cell, rook_cell
+    cdef PieceType piece, captured, placed
+    cdef bint is_white, enable_en_passant
+    cdef long side
+    cdef unsigned long long started
+
+    started = profile_clock()
+    cell = move_origin(move)
+    target = move_target(move)
+    is_white = board.is_white
+    piece = board.get_cell_type(cell)
+
+    if move & MOVE_CASTLE:
+        board.push_state(PieceType.EMPTY, 0)
+        side = -1 if (target & 7) == 6 else 1
+        rook_cell = (cell & 56) + (7 if side == -1 else 0)
+        board.remove_cell_piece(cell, PieceType.KING, is_white)
+        board.remove_cell_piece(rook_cell, PieceType.ROOK, is_white)
+        board.update_castling_rights(cell)
+        board.set_cell_piece(target, PieceType.KING, is_white)
+        board.set_cell_piece(target + side, PieceType.ROOK, is_white)
+        board.update_round(target, PieceType.KING, False)
+        board.repetition_table.push(board.zobrist_key)
+        if PROFILE_ENABLED:
+            profile_record(Section.MAKE_PACKED_MOVE, started)
+        return
+
+    captured = board.get_cell_type(target)
+    captured_cell = target
+    # A pawn which moves diagonally to an empty cell captures en passant
+    if piece == PieceType.PAWN and captured == PieceType.EMPTY and (abs(cell - target) % 8 != 0):
+        captured = PieceType.PAWN
+        captured_cell = cell + (1 if (cell % 8) < (target % 8) else -1)
+
+    board.push_state(captured, captured_cell)
+
     # Update the target cell piece if exist
-    if target_type != PieceType.EMPTY:
+    if captured != PieceType.EMPTY:
         board.count = 0
-        board.remove_cell_piece(move.target, target_type, not board.is_white)
-        if target_type == PieceType.ROOK:
-            update_castling_option(move.target, board, not board.is_white)
-        move.enemy_cell = move.target
-
-    if piece == PieceType.PAWN:
-        diff = abs(move.cell - move.target)
-        # If move 2 rows it can be subject to en passant
-        if diff == 16:
-            enable_en_passant = True
-
-        # Check if en Passant
-        if target_type == PieceType.EMPTY and (abs(move.cell - move.target) % 8 != 0):
-            side = 1 if (move.cell % 8) < (move.target % 8) else -1
-            board.remove_cell_piece(move.cell + side, PieceType.PAWN, not board.is_white)
-            move.enemy_cell = move.cell + side
-            move.enemy_type = PieceType.PAWN
-
-    # Update castling information
-    elif piece == PieceType.KING:
-        if board.is_white:
-            board.castling_options = ''.join([c for c in board.castling_options if c.islower()])
-        else:
-            board.castling_options = ''.join([c for c in board.castling_options if c.isupper()])
-
-    elif piece == PieceType.ROOK:
-        update_castling_option(move.cell, board, board.is_white)
+        board.remove_cell_piece(captured_cell, captured, not is_white)
+
+    # If move 2 rows it can be subject to en passant
+    enable_en_passant = piece == PieceType.PAWN and abs(cell - target) == 16
+
+    # Moving the king or a rook, or capturing a rook, loses castling rights
+    board.update_castling_rights(cell)
+    board.update_castling_rights(target)
 
     # Move the origin piece to the target and update the board
-    board.remove_cell_piece(move.cell, piece, board.is_white)
-    board.set_cell_piece(move.target, piece, board.is_white)
-    board.update_round(move.target, piece, enable_en_passant)
-    board.repetition_table.update_entry(board.zobrist_key, True)
+    placed = piece
+    if piece == PieceType.PAWN and move_promotion(move) != PieceType.EMPTY:
+        placed = move_promotion(move)
+    board.remove_cell_piece(cell, piece, is_white)
+    board.set_cell_piece(target, placed, is_white)
+    board.update_round(target, piece, enable_en_passant)
+    board.repetition_table.push(board.zobrist_key)
+    if PROFILE_ENABLED:
+        profile_record(Section.MAKE_PACKED_MOVE, started)
 
 
 cpdef list get_castle_moves(Board board, bint is_white):
@@ -404,7 +577,7 @@ cpdef list get_castle_moves(Board board, bint is_white):
 
     moves = []
     row = 1 if is_white else 8
-    king_cell = board.get_pieces_dict(is_white)[<int>PieceType.KING][0]
+    king_cell = board.get_king_cell(is_white)
     move_1 = Move(king_cell, binary_ops_utils.translate_row_col_to_cell(row, 7))
     move_1.set_castle(True)
     if can_castle(board, is_white, move_1):
@@ -448,19 +621,6 @@ cpdef bint check_stalemate(Board board):
     return board.is_insufficient()
 
 
-cpdef void fill_undo_info(Board board, Move move, PieceType enemy_type):
-    """ This method fills information about the changes the move performed on the board.
-
-    :param board: The game board
-    :param move: the move being performed
-    :param enemy_type: The type of the cell we move into
-    """
-    move.prev_castling = board.castling_options
-    move.prev_en_passant = board.en_passant_ready
-    move.enemy_type = enemy_type
-    move.prev_count = board.count
-
-
 cpdef void update_castling_option(unsigned long rook_cell, Board board, bint is_white):
     """ This method updates the castling options after change in the position of the rooks.
 
@@ -468,21 +628,7 @@ cpdef void update_castling_option(unsigned long rook_cell, Board board, bint is_
     :param board: The gameboard
     :param is_white: The color of the rook
     """
-    cdef unsigned long rook_col, rook_row
-
-    rook_row, rook_col = binary_ops_utils.translate_cell_to_row_col(rook_cell)
-    if is_white:
-        if rook_row == 0:
-            if rook_col == 0:
-                board.castling_options = ''.join([c for c in board.castling_options if c != u'Q'])
-            elif rook_col == 7:
-                board.castling_options = ''.join([c for c in board.castling_options if c != u'K'])
-    else:
-        if rook_row == 7:
-            if rook_col == 0:
-                board.castling_options = ''.join([c for c in board.castling_options if c != u'q'])
-            elif rook_col == 7:
-                board.castling_options = ''.join([c for c in board.castling_options if c != u'k'])
+    board.update_castling_rights(rook_cell)
 
 
 cpdef void undo_move(Board board, Move move):
@@ -491,43 +637,93 @@ cpdef void undo_move(Board board, Move move):
     :param board: The gameboard
     :param move: The last move performed on the board
     """
-    cdef int start_row, king_col, king_curr_col, rook_position
-    cdef bint color
-    cdef long rook_origin, rook_target, king_cell, king_target
-    cdef PieceType origin_piece
+    cdef unsigned long long started
 
-    board.castling_options = move.prev_castling
-    board.repetition_table.update_entry(board.zobrist_key, False)
+    started = profile_clock()
+    undo_packed_move(board, move.encode())
+    if PROFILE_ENABLED:
+        profile_record(Section.UNDO_MOVE, started)
 
-    if move.castle:
-        start_row = 8 if board.is_white else 1
-        king_col = 5
-        king_curr_col = 7 if move.is_king_side else 3
-        rook_position = 6 if move.is_king_side else 4
-        rook_target = 8 if move.is_king_side else 1
-        color = not board.is_white
-        rook_origin = binary_ops_utils.translate_row_col_to_cell(start_row, rook_position)
-        rook_target = binary_ops_utils.translate_row_col_to_cell(start_row, rook_target)
-        king_cell = binary_ops_utils.translate_row_col_to_cell(start_row, king_curr_col)
-        king_target = binary_ops_utils.translate_row_col_to_cell(start_row, king_col)
-        board.remove_cell_piece(rook_origin, PieceType.ROOK, color)
-        board.remove_cell_piece(king_cell, PieceType.KING, color)
-        board.set_cell_piece(king_target, PieceType.KING, color)
-        board.set_cell_piece(rook_target, PieceType.ROOK, color)
-        board.update_round(move.target, PieceType.KING, False)
+
+cpdef void undo_packed_move(Board board, unsigned int move):
+    """ This method restores the board state to before the packed move which was performed
+
+    :param board: The gameboard
+    :param move: The last packed move performed on the board
+    """
+    cdef unsigned long cell, target, rook_cell
+    cdef bint color
+    cdef long side
+    cdef PieceType piece
+    cdef Board_state state
+    cdef unsigned long long started
+
+    started = profile_clock()
+    state = board.pop_state()
+    board.repetition_table.pop()
+    cell = move_origin(move)
+    target = move_target(move)
+    color = not board.is_white
+
+    if move & MOVE_CASTLE:
+        side = -1 if (target & 7) == 6 else 1
+        rook_cell = (cell & 56) + (7 if side == -1 else 0)
+        board.remove_cell_piece(target + side, PieceType.ROOK, color)
+        board.remove_cell_piece(target, PieceType.KING, color)
+        board.set_cell_piece(cell, PieceType.KING, color)
+        board.set_cell_piece(rook_cell, PieceType.ROOK, color)
+        board.update_round(target, PieceType.KING, False)
+        board.restore_state(state)
+        if PROFILE_ENABLED:
+            profile_record(Section.UNDO_PACKED_MOVE, started)
         return
 
-    origin_piece = board.get_cell_type(move.target)
+    piece = board.get_cell_type(target)
+    board.remove_cell_piece(target, piece, color)
+    board.set_cell_piece(cell, PieceType.PAWN if move_promotion(move) != PieceType.EMPTY else piece, color)
+    if state.captured != PieceType.EMPTY:
+        board.set_cell_piece(state.captured_cell, <PieceType>state.captured, board.is_white)
+    board.update_round(state.captured_cell, <PieceType>state.captured)
+    board.restore_state(state)
+    if PROFILE_ENABLED:
+        profile_record(Section.UNDO_PACKED_MOVE, started)
+
 
-    if move.promotion != PieceType.EMPTY:
-        board.remove_cell_piece(move.target, move.promotion, not board.is_white)
-        board.set_cell_piece(move.target, PieceType.PAWN, not board.is_white)
-        origin_piece = PieceType.PAWN
+cpdef void make_null_move(Board board):
+    """ Pass the turn to the other player without moving, used by the null move pruning of the search.
+    The player to move must not be in check, and the positions after the null move never repeat the ones before it.
+
+    :param board: The board
+    """
+    board.push_state(PieceType.EMPTY, 0)
+    board.update_round(0, PieceType.EMPTY)
+    # The position after a passed turn isn't a real one, so it isn't added to the repetition history, and the count
+    # starts again so the repetition scan stops at the null move.
+    board.count = 0
+
+
+cpdef void undo_null_move(Board board):
+    """ This method restores the board state to before a null move.
+
+    :param board: The board
+    """
+    cdef Board_state state
+
+    state = board.pop_state()
+    board.update_round(0, PieceType.EMPTY)
+    board.restore_state(state)
+
+
+cpdef bint has_non_pawn_material(Board board, bint is_white):
+    """ Returns whether a player has pieces other than pawns and the king, without them passing the turn may be the
+    best move (zugzwang) and null move pruning is unsafe.
+
+    :param board: The board
+    :param is_white: The player's color
+    :return: Whether the player has a queen, a rook, a bishop or a knight
+    """
+    cdef unsigned long long pieces
 
-    board.remove_cell_piece(move.target, origin_piece, not board.is_white)
-    board.set_cell_piece(move.cell, origin_piece, not board.is_white)
-    if move.enemy_type != PieceType.EMPTY:
-        board.set_cell_piece(move.enemy_cell, move.enemy_type, board.is_white)
-    board.update_round(move.enemy_cell, move.enemy_type)
-    board.en_passant_ready = move.prev_en_passant
-    board.count = move.prev_count
+    pieces = board.piece_maps[<int>PieceType.QUEEN] | board.piece_maps[<int>PieceType.ROOK] | \
+        board.piece_maps[<int>PieceType.BISHOP] | board.piece_maps[<int>PieceType.KNIGHT]
+    return pieces & (board.white_board if is_white else board.black_board) != 0
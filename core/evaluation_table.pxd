@@ -0,0 +1,21 @@
+from cython cimport int, long
+
+cdef struct Evaluation_entry:
+    unsigned long long key
+    double score
+
+cdef class Evaluation_table:
+    """
+    This class represents a cache of static evaluations keyed by the zobrist key of the position
+    """
+    cdef Evaluation_entry* table
+    cdef unsigned long long num_entries
+    cdef public unsigned long size_in_MB
+    cdef readonly unsigned long long hits
+    cdef readonly unsigned long long misses
+
+    cpdef object get_score(self, unsigned long long key)
+    cpdef void store_score(self, unsigned long long key, double score)
+    cpdef void clear(self)
+    cpdef void reset_stats(self)
+    cpdef void resize(self, unsigned long size_in_MB) except *
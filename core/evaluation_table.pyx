@@ -0,0 +1,84 @@
+from cython cimport int, long
+from libc.stdlib cimport calloc, free
+from libc.string cimport memset
+
+
+cdef class Evaluation_table:
+    """
+    This class represents a cache of static evaluations keyed by the zobrist key of the position.
+    Every key has a single slot which is always replaced, and the probes are counted to measure the hit rate.
+    """
+
+    def __cinit__(self, size_in_MB: int = 1):
+        """ Initialize an empty table of a certain size.
+
+        :param size_in_MB: The size of the table in megabytes
+        """
+        self.table = NULL
+        self.resize(size_in_MB)
+
+    def __dealloc__(self):
+        free(self.table)
+
+    cpdef object get_score(self, unsigned long long key):
+        """ Returns the stored evaluation of a position.
+
+        :param key: The zobrist key of the position
+        :return: The score if the position is stored in the table, None otherwise
+        """
+        cdef Evaluation_entry* entry
+
+        entry = &self.table[key % self.num_entries]
+        # A key of 0 marks an empty slot, so such a position is never found.
+        if entry.key == key and key != 0:
+            self.hits += 1
+            return entry.score
+
+        self.misses += 1
+        return None
+
+    cpdef void store_score(self, unsigned long long key, double score):
+        """ Store the evaluation of a position, replacing the entry in its slot.
+
+        :param key: The zobrist key of the position
+        :param score: The evaluation of the position
+        """
+        cdef Evaluation_entry* entry
+
+        entry = &self.table[key % self.num_entries]
+        entry.key = key
+        entry.score = score
+
+    cpdef void clear(self):
+        """
+        This method empties the table, it is needed when the evaluation itself changes.
+        """
+        memset(self.table, 0, self.num_entries * sizeof(Evaluation_entry))
+
+    cpdef void reset_stats(self):
+        """
+        This method resets the hit and miss counters.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    cpdef void resize(self, unsigned long size_in_MB) except *:
+        """ Change the size of the table, all of the stored entries are discarded.
+
+        :param size_in_MB: The new size of the table in megabytes
+        """
+        cdef unsigned long long num_entries
+        cdef Evaluation_entry* table
+
+        num_entries = (<unsigned long long>size_in_MB * 1024 * 1024) // sizeof(Evaluation_entry)
+        if num_entries == 0:
+            raise ValueError("The evaluation table must hold at least one entry")
+
+        table = <Evaluation_entry*>calloc(num_entries, sizeof(Evaluation_entry))
+        if table == NULL:
+            raise MemoryError()
+        free(self.table)
+        self.table = table
+        self.num_entries = num_entries
+        self.size_in_MB = size_in_MB
+        self.reset_stats()
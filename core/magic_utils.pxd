@@ -0,0 +1,22 @@
+from cython cimport int, long
+
+# The rook tables of all the cells take 102400 entries and the bishop tables 5248.
+cdef enum:
+    ROOK_TABLE_SIZE = 102400
+    BISHOP_TABLE_SIZE = 5248
+
+cdef struct Magic:
+    # The cells whose occupancy affects the attacks, the board edges are left out
+    unsigned long long mask
+    unsigned long long magic
+    int shift
+    # The position of the cell's attacks in the attack table
+    unsigned long offset
+
+cdef unsigned long long sliding_attacks(int cell, unsigned long long occupancy, bint is_rook)
+cdef unsigned long long relevant_mask(int cell, bint is_rook)
+cdef bint fill_cell(int cell, bint is_rook, unsigned long long magic)
+cdef unsigned long long find_magic(int cell, bint is_rook, unsigned long long* state)
+cdef unsigned long long get_rook_attacks(unsigned long cell, unsigned long long occupancy) noexcept nogil
+cdef unsigned long long get_bishop_attacks(unsigned long cell, unsigned long long occupancy) noexcept nogil
+cdef unsigned long long get_queen_attacks(unsigned long cell, unsigned long long occupancy) noexcept nogil
@@ -0,0 +1,254 @@
+# cython: language_level=3
+import os
+import struct
+
+from cython cimport int, long
+from libc.string cimport memset
+from binary_ops_utils cimport pop_count
+
+cdef unsigned long long base
+base = 1
+
+cdef Magic[64] rook_magics
+cdef Magic[64] bishop_magics
+cdef unsigned long long[ROOK_TABLE_SIZE] rook_table
+cdef unsigned long long[BISHOP_TABLE_SIZE] bishop_table
+
+# The cache file holds this header followed by the rook magics and the bishop magics.
+cdef bytes cache_header = b"MAG1"
+cdef str cache_format = "<4s128Q"
+
+
+cdef unsigned long long sliding_attacks(int cell, unsigned long long occupancy, bint is_rook):
+    """ This function computes the attacks of a sliding piece by walking its rays, it is only used to build the tables.
+
+    :param cell: The cell of the piece
+    :param occupancy: The bitmap of the occupied cells
+    :param is_rook: Whether the piece moves as a rook or as a bishop
+    :return: The bitmap of the attacked cells, including the first blocker of every ray
+    """
+    cdef unsigned long long result
+    cdef int direction, row, col, row_step, col_step
+
+    cdef int[4] rook_row_steps = [1, -1, 0, 0]
+    cdef int[4] rook_col_steps = [0, 0, 1, -1]
+    cdef int[4] bishop_row_steps = [1, 1, -1, -1]
+    cdef int[4] bishop_col_steps = [1, -1, 1, -1]
+
+
+    result = 0
+    for direction in range(4):
+        row_step = rook_row_steps[direction] if is_rook else bishop_row_steps[direction]
+        col_step = rook_col_steps[direction] if is_rook else bishop_col_steps[direction]
+        row = (cell >> 3) + row_step
+        col = (cell & 7) + col_step
+        while 0 <= row < 8 and 0 <= col < 8:
+            result |= base << (row * 8 + col)
+            if occupancy & (base << (row * 8 + col)) != 0:
+                break
+            row += row_step
+            col += col_step
+    return result
+
+
+cdef unsigned long long relevant_mask(int cell, bint is_rook):
+    """ This function returns the cells whose occupancy changes the attacks of a sliding piece.
+
+    :param cell: The cell of the piece
+    :param is_rook: Whether the piece moves as a rook or as a bishop
+    :return: The attacks on an empty board without the last cell of every ray
+    """
+    cdef unsigned long long edges, rank_edges, file_edges
+
+    rank_edges = 0xFF000000000000FFULL & ~(0xFFULL << (cell & 56))
+    file_edges = 0x8181818181818181ULL & ~(0x0101010101010101ULL << (cell & 7))
+    edges = rank_edges | file_edges
+    return sliding_attacks(cell, 0, is_rook) & ~edges
+
+
+cdef bint fill_cell(int cell, bint is_rook, unsigned long long magic):
+    """ Fill the attacks of a cell in the attack table using a magic number.
+
+    :param cell: The cell of the piece
+    :param is_rook: Whether to fill the rook table or the bishop table
+    :param magic: The magic number of the cell
+    :return: False if two occupancies with different attacks collide, the table is then left partially filled
+    """
+    cdef Magic* entry
+    cdef unsigned long long* table
+    cdef unsigned long long occupancy, attacks, index
+
+    entry = &rook_magics[cell] if is_rook else &bishop_magics[cell]
+    table = (&rook_table[0] if is_rook else &bishop_table[0]) + entry.offset
+    entry.magic = magic
+    memset(table, 0, (base << (64 - entry.shift)) * sizeof(unsigned long long))
+
+    # Go over all the subsets of the mask with the carry-rippler trick.
+    occupancy = 0
+    while True:
+        index = (occupancy * magic) >> entry.shift
+        attacks = sliding_attacks(cell, occupancy, is_rook)
+        # A slider always attacks some cell, so an empty slot is zero.
+        if table[index] == 0:
+            table[index] = attacks
+        elif table[index] != attacks:
+            return False
+
+        occupancy = (occupancy - entry.mask) & entry.mask
+        if occupancy == 0:
+            return True
+
+
+cdef unsigned long long next_random(unsigned long long* state):
+    """ This is the splitmix64 generator, seeded so that the same magics are found on every run.
+
+    :param state: The state of the generator
+    :return: The next random number
+    """
+    cdef unsigned long long z
+
+    state[0] += 0x9E3779B97F4A7C15ULL
+    z = state[0]
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+    return z ^ (z >> 31)
+
+
+cdef unsigned long long find_magic(int cell, bint is_rook, unsigned long long* state):
+    """ This function searches for a magic number which maps the occupancies of a cell without harmful collisions.
+
+    :param cell: The cell of the piece
+    :param is_rook: Whether the magic is for a rook or for a bishop
+    :param state: The state of the random generator
+    :return: The magic number, its attacks are already filled in the table
+    """
+    cdef unsigned long long magic, mask
+
+    mask = rook_magics[cell].mask if is_rook else bishop_magics[cell].mask
+    while True:
+        # Sparse numbers make good magics.
+        magic = next_random(state) & next_random(state) & next_random(state)
+        if pop_count(((mask * magic) >> 56) & 0xFF) < 6:
+            continue
+        if fill_cell(cell, is_rook, magic):
+            return magic
+
+
+cdef void init_masks():
+    """
+    This function sets the masks, shifts and offsets of the cells, which don't depend on the magics.
+    """
+    cdef unsigned long rook_offset, bishop_offset
+    cdef int cell
+
+    rook_offset = 0
+    bishop_offset = 0
+    for cell in range(64):
+        rook_magics[cell].mask = relevant_mask(cell, True)
+        rook_magics[cell].shift = 64 - pop_count(rook_magics[cell].mask)
+        rook_magics[cell].offset = rook_offset
+        rook_offset += base << (64 - rook_magics[cell].shift)
+
+        bishop_magics[cell].mask = relevant_mask(cell, False)
+        bishop_magics[cell].shift = 64 - pop_count(bishop_magics[cell].mask)
+        bishop_magics[cell].offset = bishop_offset
+        bishop_offset += base << (64 - bishop_magics[cell].shift)
+
+
+def load_magics(path: str) -> bool:
+    """ Fill the attack tables with the magics of a cache file.
+
+    :param path: The path of the cache file
+    :return: False if the file is missing or doesn't hold valid magics
+    """
+    cdef int cell
+
+    try:
+        with open(path, "rb") as cache:
+            data = cache.read()
+    except OSError:
+        return False
+
+    if len(data) != struct.calcsize(cache_format):
+        return False
+    values = struct.unpack(cache_format, data)
+    if values[0] != cache_header:
+        return False
+
+    for cell in range(64):
+        if not fill_cell(cell, True, values[1 + cell]) or not fill_cell(cell, False, values[65 + cell]):
+            return False
+    return True
+
+
+def save_magics(path: str) -> None:
+    """ Write the magics of the attack tables to a cache file.
+
+    :param path: The path of the cache file
+    """
+    rooks = [rook_magics[cell].magic for cell in range(64)]
+    bishops = [bishop_magics[cell].magic for cell in range(64)]
+    with open(path, "wb") as cache:
+        cache.write(struct.pack(cache_format, cache_header, *rooks, *bishops))
+
+
+def init_attack_tables(cache_path=None) -> None:
+    """ Build the rook and bishop attack tables. The magics are read from the cache file if it is valid,
+    otherwise they are searched for and written to it.
+
+    :param cache_path: The path of the magics cache file, None to always search for the magics
+    """
+    cdef unsigned long long state
+    cdef int cell
+
+    if cache_path is not None and load_magics(cache_path):
+        return
+
+    state = 0x5EED
+    for cell in range(64):
+        find_magic(cell, True, &state)
+        find_magic(cell, False, &state)
+
+    if cache_path is not None:
+        try:
+            save_magics(cache_path)
+        except OSError:
+            # The cache is only an optimization, the tables are already built.
+            pass
+
+
+cdef unsigned long long get_rook_attacks(unsigned long cell, unsigned long long occupancy) noexcept nogil:
+    """ Returns the attacks of a rook.
+
+    :param cell: The cell of the rook
+    :param occupancy: The bitmap of the occupied cells
+    :return: The bitmap of the attacked cells, including the first blocker of every ray
+    """
+    cdef Magic* entry = &rook_magics[cell]
+    return rook_table[entry.offset + (((occupancy & entry.mask) * entry.magic) >> entry.shift)]
+
+
+cdef unsigned long long get_bishop_attacks(unsigned long cell, unsigned long long occupancy) noexcept nogil:
+    """ Returns the attacks of a bishop.
+
+    :param cell: The cell of the bishop
+    :param occupancy: The bitmap of the occupied cells
+    :return: The bitmap of the attacked cells, including the first blocker of every ray
+    """
+    cdef Magic* entry = &bishop_magics[cell]
+    return bishop_table[entry.offset + (((occupancy & entry.mask) * entry.magic) >> entry.shift)]
+
+
+cdef unsigned long long get_queen_attacks(unsigned long cell, unsigned long long occupancy) noexcept nogil:
+    """ Returns the attacks of a queen.
+
+    :param cell: The cell of the queen
+    :param occupancy: The bitmap of the occupied cells
+    :return: The bitmap of the attacked cells, including the first blocker of every ray
+    """
+    return get_rook_attacks(cell, occupancy) | get_bishop_attacks(cell, occupancy)
+
+
+init_masks()
+# The cache is kept next to the module unless the environment points elsewhere, an empty path disables it.
+init_attack_tables(os.environ.get("CHESS_MAGICS_CACHE", os.path.join(os.path.dirname(__file__), "magics.bin")) or None)
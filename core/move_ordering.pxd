@@ -0,0 +1,33 @@
+from cython cimport int, long
+
+from board cimport Board
+from core_utils cimport Move_buffer
+
+cdef enum:
+    # The deepest ply which has killer moves.
+    MAX_PLY = 128
+    # The history scores are halved when one of them passes this limit, so they stay below the killers.
+    HISTORY_LIMIT = 1 << 20
+
+cpdef int static_exchange_evaluation(Board board, unsigned int move)
+cpdef int capture_value(Board board, unsigned int move)
+
+cdef class Move_ordering:
+    """
+    This class orders the moves of a search: the transposition table move, then the captures which don't lose material by
+    MVV-LVA, then the killer moves of the ply, then the losing captures and then the quiet moves by their history
+    """
+    cdef unsigned int[MAX_PLY][2] killers
+    # The history scores of the quiet moves, indexed by the color and then the origin and target cells
+    cdef int[2][64][64] history
+    cdef readonly unsigned long long cutoffs
+    cdef readonly unsigned long long first_move_cutoffs
+
+    cdef int score_move(self, Board board, unsigned int move, unsigned int table_move, int ply)
+    cpdef void sort_moves(self, Board board, Move_buffer buffer, unsigned int table_move=*, int ply=*)
+    cpdef bint is_quiet(self, Board board, unsigned int move)
+    cpdef void store_cutoff(self, Board board, unsigned int move, int ply, int depth, int index)
+    cpdef double first_move_cutoff_rate(self)
+    cpdef void new_search(self)
+    cpdef void reset_stats(self)
+    cpdef void clear(self)
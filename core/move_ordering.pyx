@@ -0,0 +1,210 @@
+# cython: language_level=3
+from cython cimport int, long
+from libc.string cimport memset
+
+from piece cimport PieceType
+from board cimport Board
+from core_utils cimport Move_buffer, move_origin, move_target, move_promotion, MAX_MOVES
+from position cimport static_exchange, exchange_value
+
+# The order of the move groups, a group's scores are always above the scores of the next one.
+cdef int TABLE_MOVE_SCORE = 1 << 30
+cdef int CAPTURE_SCORE = 1 << 24
+cdef int KILLER_SCORE = 1 << 22
+
+# The rank of every piece type as a victim and as an attacker in MVV-LVA, indexed by PieceType.
+cdef int[6] piece_rank = [1, 5, 3, 2, 4, 6]
+
+
+cpdef int static_exchange_evaluation(Board board, unsigned int move):
+    """ The static exchange evaluation of a move, the material the player to move gains when both players keep
+    recapturing on the target cell with their least valuable attacker.
+
+    :param board: The position of the move
+    :param move: The packed move
+    :return: The material balance of the exchange in centipawns, negative when the move loses material
+    """
+    cdef unsigned long long[2] color_maps = [board.white_board, board.black_board]
+
+    return static_exchange(board.piece_maps, color_maps, move, board.is_white)
+
+
+cpdef int capture_value(Board board, unsigned int move):
+    """ Returns the most material a move can win at once, the value of the captured piece and of the promotion.
+
+    :param board: The position of the move
+    :param move: The packed move
+    :return: The material in centipawns
+    """
+    cdef unsigned long origin, target
+    cdef PieceType victim, promotion
+    cdef int value
+
+    origin = move_origin(move)
+    target = move_target(move)
+    victim = board.get_cell_type(target)
+    if victim == PieceType.EMPTY and board.get_cell_type(origin) == PieceType.PAWN and (origin & 7) != (target & 7):
+        victim = PieceType.PAWN
+    value = exchange_value(victim)
+    promotion = move_promotion(move)
+    if promotion != PieceType.EMPTY:
+        value += exchange_value(promotion) - exchange_value(PieceType.PAWN)
+    return value
+
+
+cdef class Move_ordering:
+    """
+    This class orders the moves of a search: the transposition table move, then the captures which don't lose material by
+    MVV-LVA, then the killer moves of the ply, then the losing captures and then the quiet moves by their history.
+    It also counts how many of the beta cutoffs were caused by the first move, to measure the ordering.
+    """
+
+    def __cinit__(self):
+        self.clear()
+
+    cdef int score_move(self, Board board, unsigned int move, unsigned int table_move, int ply):
+        """ Returns the ordering score of a move, moves with higher scores are searched first.
+
+        :param board: The position of the move
+        :param move: The packed move
+        :param table_move: The best move of the transposition table, 0 if there is none
+        :param ply: The distance from the root
+        :return: The score of the move
+        """
+        cdef unsigned long origin, target
+        cdef PieceType piece, victim, promotion
+        cdef int exchange
+
+        if move == table_move:
+            return TABLE_MOVE_SCORE
+
+        origin = move_origin(move)
+        target = move_target(move)
+        piece = board.get_cell_type(origin)
+        victim = board.get_cell_type(target)
+        promotion = move_promotion(move)
+        # A pawn which moves diagonally to an empty cell captures en-passant.
+        if victim == PieceType.EMPTY and piece == PieceType.PAWN and (origin & 7) != (target & 7):
+            victim = PieceType.PAWN
+
+        if victim != PieceType.EMPTY or promotion == PieceType.QUEEN:
+            # A capture by a more valuable piece can lose material, then it is scored by its loss after the killers.
+            if victim != PieceType.EMPTY and piece_rank[<int>piece] > piece_rank[<int>victim]:
+                exchange = static_exchange_evaluation(board, move)
+                if exchange < 0:
+                    return KILLER_SCORE - 2 + exchange
+            return CAPTURE_SCORE + (piece_rank[<int>victim] if victim != PieceType.EMPTY else 0) * 8 + \
+                (piece_rank[<int>promotion] * 8 if promotion != PieceType.EMPTY else 0) - piece_rank[<int>piece]
+
+        if ply < MAX_PLY:
+            if move == self.killers[ply][0]:
+                return KILLER_SCORE
+            if move == self.killers[ply][1]:
+                return KILLER_SCORE - 1
+        return self.history[0 if board.is_white else 1][origin][target]
+
+    cpdef void sort_moves(self, Board board, Move_buffer buffer, unsigned int table_move=0, int ply=0):
+        """ Sort the moves of a buffer from the most promising to the least.
+
+        :param board: The position of the moves
+        :param buffer: The buffer of the generated moves, it is sorted in place
+        :param table_move: The best move of the transposition table, 0 if there is none
+        :param ply: The distance from the root
+        """
+        cdef int[MAX_MOVES] scores
+        cdef unsigned int move
+        cdef int i, j, score
+
+        for i in range(buffer.count):
+            scores[i] = self.score_move(board, buffer.moves[i], table_move, ply)
+
+        # An insertion sort, the buffers are short and it keeps the generation order of equal moves.
+        for i in range(1, buffer.count):
+            move = buffer.moves[i]
+            score = scores[i]
+            j = i - 1
+            while j >= 0 and scores[j] < score:
+                buffer.moves[j + 1] = buffer.moves[j]
+                scores[j + 1] = scores[j]
+                j -= 1
+            buffer.moves[j + 1] = move
+            scores[j + 1] = score
+
+    cpdef bint is_quiet(self, Board board, unsigned int move):
+        """ Returns whether a move is neither a capture nor a promotion.
+
+        :param board: The position of the move
+        :param move: The packed move
+        :return: Whether the move is quiet
+        """
+        cdef unsigned long origin, target
+
+        origin = move_origin(move)
+        target = move_target(move)
+        if move_promotion(move) != PieceType.EMPTY or not board.is_cell_empty(target):
+            return False
+        return board.get_cell_type(origin) != PieceType.PAWN or (origin & 7) == (target & 7)
+
+    cpdef void store_cutoff(self, Board board, unsigned int move, int ply, int depth, int index):
+        """ Record a move which caused a beta cutoff, a quiet one becomes a killer of the ply and gains history.
+
+        :param board: The position of the move, before it is made
+        :param move: The packed move
+        :param ply: The distance from the root
+        :param depth: The remaining depth of the search
+        :param index: The place of the move in the searched order
+        """
+        cdef int side, origin, target, i, j
+
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if not self.is_quiet(board, move):
+            return
+
+        if ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+
+        side = 0 if board.is_white else 1
+        origin = move_origin(move)
+        target = move_target(move)
+        self.history[side][origin][target] += depth * depth
+        if self.history[side][origin][target] >= HISTORY_LIMIT:
+            for i in range(64):
+                for j in range(64):
+                    self.history[0][i][j] >>= 1
+                    self.history[1][i][j] >>= 1
+
+    cpdef double first_move_cutoff_rate(self):
+        """
+        :return: The part of the beta cutoffs which the first searched move caused, 0 if there were none
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs != 0 else 0
+
+    cpdef void new_search(self):
+        """
+        This method prepares the ordering for a new search, the killers are cleared and the history is aged.
+        """
+        cdef int i, j
+
+        memset(self.killers, 0, sizeof(self.killers))
+        for i in range(64):
+            for j in range(64):
+                self.history[0][i][j] >>= 1
+                self.history[1][i][j] >>= 1
+
+    cpdef void reset_stats(self):
+        """
+        This method resets the cutoff counters.
+        """
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    cpdef void clear(self):
+        """
+        This method clears the killers, the history and the counters.
+        """
+        memset(self.killers, 0, sizeof(self.killers))
+        memset(self.history, 0, sizeof(self.history))
+        self.reset_stats()
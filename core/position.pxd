@@ -0,0 +1,69 @@
+from cython cimport int, long
+
+from piece cimport PieceType
+from board cimport Board, Board_state
+
+cdef struct Position:
+    # The position state of a board as plain C data, so it can be searched without the GIL
+    unsigned long long[6] piece_maps
+    # The occupancy of each color, 0 for white and 1 for black
+    unsigned long long[2] color_maps
+    unsigned long long board
+    bint is_white
+    unsigned long en_passant_ready
+    unsigned char castling_rights
+    int count
+    unsigned long long zobrist_key
+    # The PeSTO sums from the side of white and the game phase, as kept by the board
+    int mg_score
+    int eg_score
+    int phase
+
+cdef void load_position(Board board, Position* position)
+cdef PieceType position_cell_type(Position* position, unsigned long cell) noexcept nogil
+cdef bint is_cell_attacked(Position* position, unsigned long cell, bint by_white) noexcept nogil
+cdef bint is_position_in_check(Position* position) noexcept nogil
+cdef int exchange_value(PieceType piece) noexcept nogil
+cdef unsigned long long attackers_to(const unsigned long long* piece_maps, const unsigned long long* color_maps,
+                                     unsigned long cell, unsigned long long occupied) noexcept nogil
+cdef int static_exchange(const unsigned long long* piece_maps, const unsigned long long* color_maps,
+                         unsigned int move, bint is_white) noexcept nogil
+cdef int generate_position_moves(Position* position, unsigned int* moves) noexcept nogil
+cdef void make_position_move(Position* position, unsigned int move, Board_state* state) noexcept nogil
+cdef void undo_position_move(Position* position, unsigned int move, Board_state* state) noexcept nogil
+cdef double evaluate_position(Position* position) noexcept nogil
+cdef bint mop_up_terms(Position* position, long* terms) noexcept nogil
+cdef void mobility_terms(Position* position, int* terms) noexcept nogil
+cdef double static_evaluation(Position* position) noexcept nogil
+cdef void load_bitboards(const unsigned long long* bitboards, bint is_white, Position* position) noexcept nogil
+cdef unsigned long long perft_position(Position* position, int depth) noexcept nogil
+
+cdef class Position_batch:
+    """
+    This class holds the positions of several boards in one C array, so threads can process parts of it without the GIL
+    """
+    cdef Position* positions
+    cdef double* scores
+    cdef public int size
+
+    cpdef void evaluate_range(self, int start, int end)
+    cpdef list get_scores(self)
+
+cdef struct Perft_entry:
+    # The zobrist key xor the data, so an entry torn by two threads fails the key check
+    unsigned long long key_check
+    # The leaves count in the lower 56 bits and the depth in the upper 8 bits
+    unsigned long long data
+
+cdef class Perft_table:
+    """
+    This class represents a cache of perft counts keyed by the zobrist key and the depth of a position
+    """
+    cdef Perft_entry* entries
+    cdef unsigned long long mask
+    cdef public unsigned long size_in_MB
+
+    cpdef void clear(self)
+
+cdef unsigned long long perft_hashed(Position* position, int depth, Perft_entry* entries,
+                                     unsigned long long mask) noexcept nogil
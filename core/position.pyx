@@ -0,0 +1,1154 @@
+# cython: language_level=3
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from cython cimport int, long
+from libc.stdlib cimport malloc, calloc, free, labs
+from libc.string cimport memset
+
+from binary_ops_utils cimport bit_scan_forward, pop_count
+from board cimport Pesto_tables, get_pesto_tables, zobrist_piece_key, zobrist_state_key, castling_mask, WHITE_KING_SIDE, WHITE_QUEEN_SIDE, \
+    BLACK_KING_SIDE, BLACK_QUEEN_SIDE
+from core_utils cimport pack_move, move_origin, move_target, move_promotion, MOVE_CASTLE, MAX_MOVES
+from magic_utils cimport get_rook_attacks, get_bishop_attacks
+
+cdef unsigned long long base
+base = 1
+
+# The bits of a perft table entry's data which hold the count.
+cdef unsigned long long COUNT_MASK = (base << 56) - 1
+
+# The attacks of the pieces with fixed steps, the pawn attacks are indexed by 0 for white and 1 for black.
+cdef unsigned long long[64] knight_attacks
+cdef unsigned long long[64] king_attacks
+cdef unsigned long long[2][64] pawn_attacks
+
+# The PeSTO tables of the boards.
+cdef Pesto_tables* pesto_tables = get_pesto_tables()
+
+# The weights of the mobility and the mop up terms of the evaluation, evaluation_utils sets them.
+cdef double[3] mobility_weights = [4, 5, 2]
+cdef double[2] mop_up_weights = [4.7, 1.6]
+
+# The values of the pieces in the static exchange evaluation, indexed by PieceType.
+cdef int[6] exchange_values = [100, 900, 330, 320, 500, 20000]
+# The order in which the pieces recapture in an exchange, the least valuable first.
+cdef PieceType[6] exchange_order = [PieceType.PAWN, PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK,
+                                    PieceType.QUEEN, PieceType.KING]
+
+
+def set_evaluation_weights(mobility, mop_up) -> None:
+    """ Set the weights of the mobility and the mop up terms of static_evaluation.
+
+    :param mobility: The weights of the cells attacked by the knights, bishops and rooks
+    :param mop_up: The weights of the enemy king's distance from the center and of the distance between the kings
+    """
+    cdef int i
+
+    for i in range(3):
+        mobility_weights[i] = mobility[i]
+    for i in range(2):
+        mop_up_weights[i] = mop_up[i]
+
+
+cdef unsigned long long step_attacks(int cell, int[8] row_steps, int[8] col_steps, int steps):
+    """ This function computes the attacks of a piece with fixed steps, it is only used to build the tables.
+
+    :param cell: The cell of the piece
+    :param row_steps: The row offsets of the steps
+    :param col_steps: The column offsets of the steps
+    :param steps: The amount of steps
+    :return: The bitmap of the cells the steps reach inside the board
+    """
+    cdef unsigned long long result
+    cdef int i, row, col
+
+    result = 0
+    for i in range(steps):
+        row = (cell >> 3) + row_steps[i]
+        col = (cell & 7) + col_steps[i]
+        if 0 <= row < 8 and 0 <= col < 8:
+            result |= base << (row * 8 + col)
+    return result
+
+
+cdef void init_attack_tables():
+    """
+    This function fills the attack tables of the knight, the king and the pawns.
+    """
+    cdef int[8] knight_rows = [2, 2, -2, -2, 1, -1, 1, -1]
+    cdef int[8] knight_cols = [1, -1, 1, -1, 2, 2, -2, -2]
+    cdef int[8] king_rows = [0, 0, 1, -1, 1, -1, 1, -1]
+    cdef int[8] king_cols = [1, -1, 1, -1, -1, 1, 0, 0]
+    cdef int[8] white_pawn_rows = [1, 1, 0, 0, 0, 0, 0, 0]
+    cdef int[8] black_pawn_rows = [-1, -1, 0, 0, 0, 0, 0, 0]
+    cdef int[8] pawn_cols = [1, -1, 0, 0, 0, 0, 0, 0]
+    cdef int cell
+
+    for cell in range(64):
+        knight_attacks[cell] = step_attacks(cell, knight_rows, knight_cols, 8)
+        king_attacks[cell] = step_attacks(cell, king_rows, king_cols, 8)
+        pawn_attacks[0][cell] = step_attacks(cell, white_pawn_rows, pawn_cols, 2)
+        pawn_attacks[1][cell] = step_attacks(cell, black_pawn_rows, pawn_cols, 2)
+
+
+init_attack_tables()
+
+
+cdef void load_position(Board board, Position* position):
+    """ This function copies the position state of a board.
+
+    :param board: The board
+    :param position: The position which is filled
+    """
+    cdef int piece
+
+    board.ensure_evaluation()
+    for piece in range(6):
+        position.piece_maps[piece] = board.piece_maps[piece]
+    position.color_maps[0] = board.white_board
+    position.color_maps[1] = board.black_board
+    position.board = board.board
+    position.is_white = board.is_white
+    position.en_passant_ready = board.en_passant_ready
+    position.castling_rights = board.castling_rights
+    position.count = board.count
+    position.zobrist_key = board.zobrist_key
+    position.mg_score = board.mg_score
+    position.eg_score = board.eg_score
+    position.phase = board.phase
+
+
+cdef inline void toggle_piece(Position* position, unsigned long cell, PieceType piece, bint is_white) noexcept nogil:
+    """ Set a piece on an empty cell or remove it from its cell.
+
+    :param position: The position
+    :param cell: The cell index
+    :param piece: The piece type
+    :param is_white: The color of the piece
+    """
+    cdef unsigned long long bit
+    cdef int sign
+
+    bit = base << cell
+    # The piece is set if its cell is empty.
+    sign = 1 if position.board & bit == 0 else -1
+    position.piece_maps[<int>piece] ^= bit
+    position.color_maps[0 if is_white else 1] ^= bit
+    position.board ^= bit
+    position.zobrist_key ^= zobrist_piece_key(cell, piece, is_white)
+
+    position.phase += sign * pesto_tables.phase_weights[<int>piece]
+    if is_white:
+        position.mg_score += sign * pesto_tables.mg_values[<int>piece * 2][cell]
+        position.eg_score += sign * pesto_tables.eg_values[<int>piece * 2][cell]
+    else:
+        position.mg_score -= sign * pesto_tables.mg_values[<int>piece * 2 + 1][cell]
+        position.eg_score -= sign * pesto_tables.eg_values[<int>piece * 2 + 1][cell]
+
+
+cdef PieceType position_cell_type(Position* position, unsigned long cell) noexcept nogil:
+    """ Returns the PieceType of a cell.
+
+    :param position: The position
+    :param cell: The cell index
+    :return: The cell's PieceType, EMPTY if there is no piece on it
+    """
+    cdef unsigned long long bit
+    cdef int piece
+
+    bit = base << cell
+    if position.board & bit == 0:
+        return PieceType.EMPTY
+    for piece in range(6):
+        if position.piece_maps[piece] & bit != 0:
+            return <PieceType>piece
+    return PieceType.EMPTY
+
+
+cdef bint is_cell_attacked(Position* position, unsigned long cell, bint by_white) noexcept nogil:
+    """ Returns whether a cell is attacked by a player.
+
+    :param position: The position
+    :param cell: The cell index
+    :param by_white: The color of the attacking player
+    :return: True if a piece of the player attacks the cell
+    """
+    cdef unsigned long long attackers, diagonal, vertical
+
+    attackers = position.color_maps[0 if by_white else 1]
+    # A pawn attacks the cell if a pawn of the other color on the cell would attack the pawn.
+    if pawn_attacks[1 if by_white else 0][cell] & position.piece_maps[<int>PieceType.PAWN] & attackers != 0:
+        return True
+    if knight_attacks[cell] & position.piece_maps[<int>PieceType.KNIGHT] & attackers != 0:
+        return True
+    if king_attacks[cell] & position.piece_maps[<int>PieceType.KING] & attackers != 0:
+        return True
+
+    diagonal = (position.piece_maps[<int>PieceType.BISHOP] | position.piece_maps[<int>PieceType.QUEEN]) & attackers
+    if diagonal != 0 and get_bishop_attacks(cell, position.board) & diagonal != 0:
+        return True
+    vertical = (position.piece_maps[<int>PieceType.ROOK] | position.piece_maps[<int>PieceType.QUEEN]) & attackers
+    return vertical != 0 and get_rook_attacks(cell, position.board) & vertical != 0
+
+
+cdef bint is_position_in_check(Position* position) noexcept nogil:
+    """ Returns whether the player to move is in check.
+
+    :param position: The position
+    :return: True if the king of the player to move is attacked
+    """
+    cdef unsigned long long king
+
+    king = position.piece_maps[<int>PieceType.KING] & position.color_maps[0 if position.is_white else 1]
+    return king != 0 and is_cell_attacked(position, bit_scan_forward(king), not position.is_white)
+
+
+cdef int exchange_value(PieceType piece) noexcept nogil:
+    """
+    :param piece: The piece type
+    :return: The value of the piece in the static exchange evaluation, 0 for an empty cell
+    """
+    return exchange_values[<int>piece] if piece != PieceType.EMPTY else 0
+
+
+cdef unsigned long long attackers_to(const unsigned long long* piece_maps, const unsigned long long* color_maps,
+                                     unsigned long cell, unsigned long long occupied) noexcept nogil:
+    """ Returns the pieces of both colors which attack a cell, the sliders are blocked by the given occupancy so
+    pieces behind a removed attacker are found.
+
+    :param piece_maps: The bitmaps of the pieces, indexed by PieceType
+    :param color_maps: The occupancy of each color, 0 for white and 1 for black
+    :param cell: The cell index
+    :param occupied: The pieces which are still on the board
+    :return: The bitmap of the attackers among the occupied cells
+    """
+    cdef unsigned long long attackers, diagonal, vertical
+
+    diagonal = piece_maps[<int>PieceType.BISHOP] | piece_maps[<int>PieceType.QUEEN]
+    vertical = piece_maps[<int>PieceType.ROOK] | piece_maps[<int>PieceType.QUEEN]
+    attackers = pawn_attacks[1][cell] & piece_maps[<int>PieceType.PAWN] & color_maps[0]
+    attackers |= pawn_attacks[0][cell] & piece_maps[<int>PieceType.PAWN] & color_maps[1]
+    attackers |= knight_attacks[cell] & piece_maps[<int>PieceType.KNIGHT]
+    attackers |= king_attacks[cell] & piece_maps[<int>PieceType.KING]
+    attackers |= get_bishop_attacks(cell, occupied) & diagonal
+    attackers |= get_rook_attacks(cell, occupied) & vertical
+    return attackers & occupied
+
+
+cdef int static_exchange(const unsigned long long* piece_maps, const unsigned long long* color_maps,
+                         unsigned int move, bint is_white) noexcept nogil:
+    """ The static exchange evaluation of a move: the material the player gains when both players keep recapturing
+    on the target cell with their least valuable attacker, and each may stop when continuing would lose material.
+
+    :param piece_maps: The bitmaps of the pieces, indexed by PieceType
+    :param color_maps: The occupancy of each color, 0 for white and 1 for black
+    :param move: The packed move
+    :param is_white: The color of the player who makes the move
+    :return: The material balance of the exchange in centipawns
+    """
+    cdef int[32] gain
+    cdef unsigned long origin, target
+    cdef unsigned long long occupied, attackers, side_attackers, pieces
+    cdef PieceType attacker, victim, promotion
+    cdef int depth, side, i
+
+    origin = move_origin(move)
+    target = move_target(move)
+    occupied = color_maps[0] | color_maps[1]
+    attacker = PieceType.EMPTY
+    victim = PieceType.EMPTY
+    for i in range(6):
+        if piece_maps[i] & (base << origin) != 0:
+            attacker = <PieceType>i
+        if piece_maps[i] & (base << target) != 0:
+            victim = <PieceType>i
+    if attacker == PieceType.EMPTY or move & MOVE_CASTLE != 0:
+        return 0
+
+    gain[0] = exchange_values[<int>victim] if victim != PieceType.EMPTY else 0
+    # A pawn which moves diagonally to an empty cell captures en-passant, the captured pawn is beside the target.
+    if victim == PieceType.EMPTY and attacker == PieceType.PAWN and (origin & 7) != (target & 7):
+        gain[0] = exchange_values[<int>PieceType.PAWN]
+        occupied ^= base << ((origin & 56) | (target & 7))
+    promotion = move_promotion(move)
+    if promotion != PieceType.EMPTY:
+        gain[0] += exchange_values[<int>promotion] - exchange_values[<int>PieceType.PAWN]
+        attacker = promotion
+
+    occupied ^= base << origin
+    side = 1 if is_white else 0
+    depth = 0
+    while depth < 31:
+        attackers = attackers_to(piece_maps, color_maps, target, occupied)
+        side_attackers = attackers & color_maps[side]
+        if side_attackers == 0:
+            break
+        for i in range(6):
+            pieces = side_attackers & piece_maps[<int>exchange_order[i]]
+            if pieces != 0:
+                break
+        # The king can only recapture when the other player has no attacker left.
+        if exchange_order[i] == PieceType.KING and attackers & color_maps[1 - side] != 0:
+            break
+        depth += 1
+        gain[depth] = exchange_values[<int>attacker] - gain[depth - 1]
+        occupied ^= pieces & (~pieces + 1)
+        attacker = exchange_order[i]
+        side = 1 - side
+
+    # Each player only takes part in the exchange while it doesn't lose by it.
+    while depth > 0:
+        if -gain[depth] < gain[depth - 1]:
+            gain[depth - 1] = -gain[depth]
+        depth -= 1
+    return gain[0]
+
+
+cdef inline int add_targets(unsigned int* moves, int count, unsigned long cell, unsigned long long targets,
+                            bint promotes) noexcept nogil:
+    """ Add the moves from a cell to every target of a bitmap.
+
+    :param moves: The moves array
+    :param count: The amount of moves already in the array
+    :param cell: The origin cell
+    :param targets: The bitmap of the targets
+    :param promotes: Whether the moves are pawn moves to the last rank
+    :return: The amount of moves in the array after the addition
+    """
+    cdef unsigned long target
+
+    while targets != 0:
+        target = bit_scan_forward(targets)
+        targets &= targets - 1
+        if promotes:
+            moves[count] = pack_move(cell, target, PieceType.QUEEN, False)
+            moves[count + 1] = pack_move(cell, target, PieceType.ROOK, False)
+            moves[count + 2] = pack_move(cell, target, PieceType.KNIGHT, False)
+            moves[count + 3] = pack_move(cell, target, PieceType.BISHOP, False)
+            count += 4
+        else:
+            moves[count] = pack_move(cell, target, PieceType.EMPTY, False)
+            count += 1
+    return count
+
+
+cdef int generate_pseudo_moves(Position* position, unsigned int* moves) noexcept nogil:
+    """ Generates the pseudo-legal moves of the player to move, castling moves are only generated when legal.
+
+    :param position: The position
+    :param moves: The array which is filled with the packed moves, it must hold MAX_MOVES moves
+    :return: The amount of moves generated
+    """
+    cdef unsigned long long own, enemy, empty, piece_map, targets, captures, single
+    cdef unsigned long cell, king_cell
+    cdef int count, us
+    cdef bint is_white
+    cdef long forward, last_row, start_row
+    cdef unsigned char king_side, queen_side
+
+    is_white = position.is_white
+    us = 0 if is_white else 1
+    own = position.color_maps[us]
+    enemy = position.color_maps[1 - us]
+    empty = ~position.board
+    count = 0
+
+    piece_map = position.piece_maps[<int>PieceType.KNIGHT] & own
+    while piece_map != 0:
+        cell = bit_scan_forward(piece_map)
+        piece_map &= piece_map - 1
+        count = add_targets(moves, count, cell, knight_attacks[cell] & ~own, False)
+
+    piece_map = (position.piece_maps[<int>PieceType.BISHOP] | position.piece_maps[<int>PieceType.QUEEN]) & own
+    while piece_map != 0:
+        cell = bit_scan_forward(piece_map)
+        piece_map &= piece_map - 1
+        count = add_targets(moves, count, cell, get_bishop_attacks(cell, position.board) & ~own, False)
+
+    piece_map = (position.piece_maps[<int>PieceType.ROOK] | position.piece_maps[<int>PieceType.QUEEN]) & own
+    while piece_map != 0:
+        cell = bit_scan_forward(piece_map)
+        piece_map &= piece_map - 1
+        count = add_targets(moves, count, cell, get_rook_attacks(cell, position.board) & ~own, False)
+
+    king_cell = bit_scan_forward(position.piece_maps[<int>PieceType.KING] & own)
+    count = add_targets(moves, count, king_cell, king_attacks[king_cell] & ~own, False)
+
+    forward = 8 if is_white else -8
+    last_row = 7 if is_white else 0
+    start_row = 1 if is_white else 6
+    captures = enemy
+    if position.en_passant_ready != 0:
+        captures |= base << (position.en_passant_ready + forward)
+
+    piece_map = position.piece_maps[<int>PieceType.PAWN] & own
+    while piece_map != 0:
+        cell = bit_scan_forward(piece_map)
+        piece_map &= piece_map - 1
+        single = (base << (cell + forward)) & empty
+        targets = single | (pawn_attacks[us][cell] & captures)
+        if single != 0 and <long>(cell >> 3) == start_row:
+            targets |= (base << (cell + 2 * forward)) & empty
+        count = add_targets(moves, count, cell, targets, <long>(cell >> 3) + (forward >> 3) == last_row)
+
+    # Castling needs the cells between the king and the rook to be empty and the king's path to be safe.
+    king_side = WHITE_KING_SIDE if is_white else BLACK_KING_SIDE
+    queen_side = WHITE_QUEEN_SIDE if is_white else BLACK_QUEEN_SIDE
+    if position.castling_rights & (king_side | queen_side) != 0 and \
+            not is_cell_attacked(position, king_cell, not is_white):
+        if position.castling_rights & king_side != 0 and position.board & (base << (king_cell + 1)) == 0 and \
+                position.board & (base << (king_cell + 2)) == 0 and \
+                not is_cell_attacked(position, king_cell + 1, not is_white) and \
+                not is_cell_attacked(position, king_cell + 2, not is_white):
+            moves[count] = pack_move(king_cell, king_cell + 2, PieceType.EMPTY, True)
+            count += 1
+        if position.castling_rights & queen_side != 0 and position.board & (base << (king_cell - 1)) == 0 and \
+                position.board & (base << (king_cell - 2)) == 0 and position.board & (base << (king_cell - 3)) == 0 and \
+                not is_cell_attacked(position, king_cell - 1, not is_white) and \
+                not is_cell_attacked(position, king_cell - 2, not is_white):
+            moves[count] = pack_move(king_cell, king_cell - 2, PieceType.EMPTY, True)
+            count += 1
+
+    return count
+
+
+cdef unsigned long long get_pinned(Position* position, unsigned long king_cell, bint is_white) noexcept nogil:
+    """ Returns the pieces of a player which are pinned to its king.
+
+    :param position: The position
+    :param king_cell: The cell of the player's king
+    :param is_white: The color of the player
+    :return: The bitmap of the pinned pieces
+    """
+    cdef unsigned long long own, enemy, snipers, pinned
+    cdef unsigned long sniper
+
+    own = position.color_maps[0 if is_white else 1]
+    enemy = position.color_maps[1 if is_white else 0]
+    pinned = 0
+
+    # The enemy sliders which would attack the king if the player's pieces were removed, a single piece of the player
+    # between such a slider and the king is where the rays of both of them meet.
+    snipers = get_rook_attacks(king_cell, enemy) & enemy & \
+        (position.piece_maps[<int>PieceType.ROOK] | position.piece_maps[<int>PieceType.QUEEN])
+    while snipers != 0:
+        sniper = bit_scan_forward(snipers)
+        snipers &= snipers - 1
+        pinned |= get_rook_attacks(king_cell, position.board) & get_rook_attacks(sniper, position.board) & own
+
+    snipers = get_bishop_attacks(king_cell, enemy) & enemy & \
+        (position.piece_maps[<int>PieceType.BISHOP] | position.piece_maps[<int>PieceType.QUEEN])
+    while snipers != 0:
+        sniper = bit_scan_forward(snipers)
+        snipers &= snipers - 1
+        pinned |= get_bishop_attacks(king_cell, position.board) & get_bishop_attacks(sniper, position.board) & own
+    return pinned
+
+
+cdef int generate_position_moves(Position* position, unsigned int* moves) noexcept nogil:
+    """ Generates the legal moves of the player to move, a pseudo-legal move is legal if it doesn't leave the king attacked.
+    Only the moves which may expose the king are made to check it, the moves of unpinned pieces out of check are legal.
+
+    :param position: The position
+    :param moves: The array which is filled with the packed moves, it must hold MAX_MOVES moves
+    :return: The amount of moves generated
+    """
+    cdef unsigned int[MAX_MOVES] pseudo
+    cdef unsigned long long risky
+    cdef unsigned long king_cell, en_passant_target
+    cdef int pseudo_count, count, i
+    cdef Board_state state
+    cdef bint is_white
+
+    is_white = position.is_white
+    king_cell = bit_scan_forward(position.piece_maps[<int>PieceType.KING] & position.color_maps[0 if is_white else 1])
+    pseudo_count = generate_pseudo_moves(position, pseudo)
+
+    if is_cell_attacked(position, king_cell, not is_white):
+        risky = ~(<unsigned long long>0)
+    else:
+        risky = get_pinned(position, king_cell, is_white) | (base << king_cell)
+    # An en passant capture removes two pieces from the capturing pawn's row.
+    en_passant_target = 64
+    if position.en_passant_ready != 0:
+        en_passant_target = position.en_passant_ready + (8 if is_white else -8)
+
+    count = 0
+    for i in range(pseudo_count):
+        # Castling moves are only generated when they are legal.
+        if pseudo[i] & MOVE_CASTLE == 0 and ((base << move_origin(pseudo[i])) & risky != 0 or (
+                move_target(pseudo[i]) == en_passant_target and
+                position.piece_maps[<int>PieceType.PAWN] & (base << move_origin(pseudo[i])) != 0)):
+            make_position_move(position, pseudo[i], &state)
+            if is_cell_attacked(position, bit_scan_forward(position.piece_maps[<int>PieceType.KING] &
+                                                           position.color_maps[0 if is_white else 1]), not is_white):
+                undo_position_move(position, pseudo[i], &state)
+                continue
+            undo_position_move(position, pseudo[i], &state)
+        moves[count] = pseudo[i]
+        count += 1
+    return count
+
+
+cdef void make_position_move(Position* position, unsigned int move, Board_state* state) noexcept nogil:
+    """ Perform a packed move on the position, the information needed to undo it is saved in a state.
+
+    :param position: The position
+    :param move: The packed move, it must be pseudo-legal in the position
+    :param state: The state which is filled with the undo information
+    """
+    cdef unsigned long cell, target, captured_cell, rook_cell
+    cdef PieceType piece, captured
+    cdef bint is_white
+    cdef long side
+
+    cell = move_origin(move)
+    target = move_target(move)
+    is_white = position.is_white
+    piece = position_cell_type(position, cell)
+
+    state.zobrist_key = position.zobrist_key
+    state.en_passant_ready = position.en_passant_ready
+    state.count = position.count
+    state.castling_rights = position.castling_rights
+    state.captured = <unsigned char>PieceType.EMPTY
+    state.captured_cell = target
+
+    position.zobrist_key ^= zobrist_state_key(position.castling_rights, position.en_passant_ready, is_white)
+    if move & MOVE_CASTLE:
+        side = -1 if (target & 7) == 6 else 1
+        rook_cell = (cell & 56) + (7 if side == -1 else 0)
+        toggle_piece(position, cell, PieceType.KING, is_white)
+        toggle_piece(position, rook_cell, PieceType.ROOK, is_white)
+        toggle_piece(position, target, PieceType.KING, is_white)
+        toggle_piece(position, target + side, PieceType.ROOK, is_white)
+        position.count += 1
+        position.en_passant_ready = 0
+    else:
+        captured = position_cell_type(position, target)
+        captured_cell = target
+        # A pawn which moves diagonally to an empty cell captures en passant
+        if piece == PieceType.PAWN and captured == PieceType.EMPTY and (cell & 7) != (target & 7):
+            captured = PieceType.PAWN
+            captured_cell = cell + (1 if (cell & 7) < (target & 7) else -1)
+        if captured != PieceType.EMPTY:
+            toggle_piece(position, captured_cell, captured, not is_white)
+            state.captured = <unsigned char>captured
+            state.captured_cell = captured_cell
+
+        toggle_piece(position, cell, piece, is_white)
+        toggle_piece(position, target, move_promotion(move) if move_promotion(move) != PieceType.EMPTY else piece,
+                     is_white)
+        position.count = 1 if piece == PieceType.PAWN or captured != PieceType.EMPTY else position.count + 1
+        position.en_passant_ready = target if piece == PieceType.PAWN and (cell ^ target) == 16 else 0
+
+    position.castling_rights &= castling_mask(cell) & castling_mask(target)
+    position.is_white = not is_white
+    position.zobrist_key ^= zobrist_state_key(position.castling_rights, position.en_passant_ready, position.is_white)
+
+
+cdef void undo_position_move(Position* position, unsigned int move, Board_state* state) noexcept nogil:
+    """ This function restores the position to before a packed move.
+
+    :param position: The position
+    :param move: The last packed move performed on the position
+    :param state: The state which was filled when the move was performed
+    """
+    cdef unsigned long cell, target, rook_cell
+    cdef PieceType piece
+    cdef bint color
+    cdef long side
+
+    cell = move_origin(move)
+    target = move_target(move)
+    color = not position.is_white
+
+    if move & MOVE_CASTLE:
+        side = -1 if (target & 7) == 6 else 1
+        rook_cell = (cell & 56) + (7 if side == -1 else 0)
+        toggle_piece(position, target + side, PieceType.ROOK, color)
+        toggle_piece(position, target, PieceType.KING, color)
+        toggle_piece(position, cell, PieceType.KING, color)
+        toggle_piece(position, rook_cell, PieceType.ROOK, color)
+    else:
+        piece = position_cell_type(position, target)
+        toggle_piece(position, target, piece, color)
+        toggle_piece(position, cell, PieceType.PAWN if move_promotion(move) != PieceType.EMPTY else piece, color)
+        if state.captured != <unsigned char>PieceType.EMPTY:
+            toggle_piece(position, state.captured_cell, <PieceType>state.captured, not color)
+
+    position.is_white = color
+    position.en_passant_ready = state.en_passant_ready
+    position.count = state.count
+    position.castling_rights = state.castling_rights
+    position.zobrist_key = state.zobrist_key
+
+
+cdef double evaluate_position(Position* position) noexcept nogil:
+    """ This function returns the tapered PeSTO evaluation of a position, the material and piece-square part of
+    evaluation_utils.evaluate. The sums are kept by the moves, so it is O(1).
+
+    :param position: The position
+    :return: The evaluation from the side of the player to move
+    """
+    cdef int mg_score, eg_score, phase
+
+    mg_score = position.mg_score if position.is_white else -position.mg_score
+    eg_score = position.eg_score if position.is_white else -position.eg_score
+    phase = position.phase if position.phase < 24 else 24
+    return (mg_score * phase + eg_score * (24 - phase)) / 24.0
+
+
+cdef bint mop_up_terms(Position* position, long* terms) noexcept nogil:
+    """ This function computes the terms of the mop up of evaluation_utils.evaluate, which pushes the enemy king to
+    the corner.
+
+    :param position: The position
+    :param terms: Filled with the enemy king's distance from the center and 14 minus the distance between the kings
+    :return: False if a king is missing, the terms are 0 then
+    """
+    cdef unsigned long long king, enemy_king
+    cdef long file, rank, enemy_file, enemy_rank
+
+    terms[0] = 0
+    terms[1] = 0
+    king = position.piece_maps[<int>PieceType.KING] & position.color_maps[0 if position.is_white else 1]
+    enemy_king = position.piece_maps[<int>PieceType.KING] & position.color_maps[1 if position.is_white else 0]
+    if king == 0 or enemy_king == 0:
+        return False
+
+    file = bit_scan_forward(king) & 7
+    rank = bit_scan_forward(king) >> 3
+    enemy_file = bit_scan_forward(enemy_king) & 7
+    enemy_rank = bit_scan_forward(enemy_king) >> 3
+    enemy_file ^= (enemy_file - 4) >> 8
+    enemy_rank ^= (enemy_rank - 4) >> 8
+    terms[0] = (enemy_file + enemy_rank) & 7
+    terms[1] = 14 - (labs(file - enemy_file) + labs(rank - enemy_rank))
+    return True
+
+
+cdef void mobility_terms(Position* position, int* terms) noexcept nogil:
+    """ This function computes the terms of the mobility of evaluation_utils.evaluate.
+
+    :param position: The position
+    :param terms: Filled with the differences between the cells which the knights, the bishops and the rooks of the
+    player to move attack and the ones of the enemy
+    """
+    cdef unsigned long long[2] knights, bishops, rooks
+    cdef unsigned long long piece_map
+    cdef unsigned long cell
+    cdef int side, us
+
+    for side in range(2):
+        knights[side] = 0
+        bishops[side] = 0
+        rooks[side] = 0
+        piece_map = position.piece_maps[<int>PieceType.KNIGHT] & position.color_maps[side]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            knights[side] |= knight_attacks[cell]
+        piece_map = position.piece_maps[<int>PieceType.BISHOP] & position.color_maps[side]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            bishops[side] |= get_bishop_attacks(cell, position.board)
+        piece_map = position.piece_maps[<int>PieceType.ROOK] & position.color_maps[side]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            rooks[side] |= get_rook_attacks(cell, position.board)
+
+    us = 0 if position.is_white else 1
+    terms[0] = pop_count(knights[us]) - pop_count(knights[1 - us])
+    terms[1] = pop_count(bishops[us]) - pop_count(bishops[1 - us])
+    terms[2] = pop_count(rooks[us]) - pop_count(rooks[1 - us])
+
+
+cdef double static_evaluation(Position* position) noexcept nogil:
+    """ This function returns the same score as evaluation_utils.evaluate: the tapered PeSTO evaluation with the mop up
+    term added to the endgame part, plus the mobility.
+
+    :param position: The position
+    :return: The evaluation from the side of the player to move
+    """
+    cdef double mg_score, eg_score, mobility
+    cdef long[2] mop_up
+    cdef int[3] moves
+    cdef int phase, i
+
+    mg_score = position.mg_score if position.is_white else -position.mg_score
+    eg_score = position.eg_score if position.is_white else -position.eg_score
+    if mop_up_terms(position, mop_up):
+        eg_score += mop_up_weights[0] * mop_up[0] + mop_up_weights[1] * mop_up[1]
+    mobility_terms(position, moves)
+    mobility = 0
+    for i in range(3):
+        mobility += mobility_weights[i] * moves[i]
+    phase = position.phase if position.phase < 24 else 24
+    return (mg_score * phase + eg_score * (24 - phase)) / 24.0 + mobility
+
+
+cdef void load_bitboards(const unsigned long long* bitboards, bint is_white, Position* position) noexcept nogil:
+    """ This function sets a position from packed bitboards, without castling rights or en-passant.
+
+    :param bitboards: The six piece maps in PieceType order, then the white and the black occupancy
+    :param is_white: The player to move
+    :param position: The position which is filled
+    """
+    cdef unsigned long long piece_map
+    cdef unsigned long cell
+    cdef int piece
+
+    memset(position, 0, sizeof(Position))
+    position.is_white = is_white
+    position.zobrist_key = zobrist_state_key(0, 0, is_white)
+    for piece in range(6):
+        piece_map = bitboards[piece] & bitboards[6]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            toggle_piece(position, cell, <PieceType>piece, True)
+        piece_map = bitboards[piece] & bitboards[7]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            toggle_piece(position, cell, <PieceType>piece, False)
+
+
+cdef unsigned long long perft_position(Position* position, int depth) noexcept nogil:
+    """ Counts the leaves of the move tree of a position up to a certain depth.
+
+    :param position: The position
+    :param depth: The depth of the tree
+    :return: The amount of positions at that depth
+    """
+    cdef unsigned int[MAX_MOVES] moves
+    cdef unsigned long long result
+    cdef int count, i
+    cdef Board_state state
+
+    if depth <= 0:
+        return 1
+
+    count = generate_position_moves(position, moves)
+    # The leaves are the legal moves themselves, so they aren't made.
+    if depth == 1:
+        return count
+
+    result = 0
+    for i in range(count):
+        make_position_move(position, moves[i], &state)
+        result += perft_position(position, depth - 1)
+        undo_position_move(position, moves[i], &state)
+    return result
+
+
+cdef unsigned long long perft_hashed(Position* position, int depth, Perft_entry* entries,
+                                     unsigned long long mask) noexcept nogil:
+    """ Counts the leaves of the move tree of a position, the counts of the subtrees are cached in a perft table.
+
+    :param position: The position
+    :param depth: The depth of the tree
+    :param entries: The entries of the perft table
+    :param mask: The mask of the table's index bits
+    :return: The amount of positions at that depth
+    """
+    cdef unsigned int[MAX_MOVES] moves
+    cdef unsigned long long result, data
+    cdef Perft_entry* entry
+    cdef int count, i
+    cdef Board_state state
+
+    # The last plies are cheaper to count than to look up.
+    if depth <= 2:
+        return perft_position(position, depth)
+
+    entry = &entries[position.zobrist_key & mask]
+    data = entry.data
+    if entry.key_check ^ data == position.zobrist_key and (data >> 56) == <unsigned long long>depth:
+        return data & COUNT_MASK
+
+    count = generate_position_moves(position, moves)
+    result = 0
+    for i in range(count):
+        make_position_move(position, moves[i], &state)
+        result += perft_hashed(position, depth - 1, entries, mask)
+        undo_position_move(position, moves[i], &state)
+
+    data = (result & COUNT_MASK) | (<unsigned long long>depth << 56)
+    entry.data = data
+    entry.key_check = position.zobrist_key ^ data
+    return result
+
+
+cdef class Perft_table:
+    """
+    This class represents a cache of perft counts keyed by the zobrist key and the depth of a position,
+    an entry is always replaced.
+    """
+
+    def __cinit__(self, unsigned long size_in_MB=16):
+        """ Allocate an empty table.
+
+        :param size_in_MB: The size of the table, it is rounded down to a power of two amount of entries
+        """
+        cdef unsigned long long count
+
+        count = 1
+        while count * 2 * sizeof(Perft_entry) <= max(size_in_MB, 1) * 1024 * 1024:
+            count *= 2
+        self.entries = <Perft_entry*>calloc(count, sizeof(Perft_entry))
+        if self.entries == NULL:
+            raise MemoryError()
+        self.mask = count - 1
+        self.size_in_MB = size_in_MB
+
+    def __dealloc__(self):
+        free(self.entries)
+
+    def __len__(self):
+        return self.mask + 1
+
+    cpdef void clear(self):
+        """
+        This method empties the table.
+        """
+        memset(self.entries, 0, (self.mask + 1) * sizeof(Perft_entry))
+
+
+cdef unsigned long long count_leaves(Position* position, int depth, Perft_table table) noexcept:
+    """ Counts the leaves of the move tree of a position without the GIL, with a perft table if one is given.
+
+    :param position: The position
+    :param depth: The depth of the tree
+    :param table: The perft table, None to count without a cache
+    :return: The amount of positions at that depth
+    """
+    cdef unsigned long long result
+    cdef Perft_entry* entries
+    cdef unsigned long long mask
+
+    if table is None:
+        with nogil:
+            result = perft_position(position, depth)
+        return result
+
+    entries = table.entries
+    mask = table.mask
+    with nogil:
+        result = perft_hashed(position, depth, entries, mask)
+    return result
+
+
+cdef unsigned long long perft_after_move(Position position, unsigned int move, int depth, Perft_table table):
+    """ Counts the leaves of the move tree after a root move.
+
+    :param position: A copy of the root position
+    :param move: The root move
+    :param depth: The depth of the tree from the root
+    :param table: The perft table, None to count without a cache
+    :return: The amount of positions at that depth which start with the move
+    """
+    cdef Board_state state
+
+    make_position_move(&position, move, &state)
+    return count_leaves(&position, depth - 1, table)
+
+
+def perft(Board board, int depth, Perft_table table=None) -> int:
+    """ Counts the leaves of the move tree of a board up to a certain depth, the count runs without the GIL.
+
+    :param board: The board, it isn't changed
+    :param depth: The depth of the tree
+    :param table: A perft table to cache the counts of subtrees in, None to count without a cache
+    :return: The amount of positions at that depth
+    """
+    cdef Position position
+
+    load_position(board, &position)
+    return count_leaves(&position, depth, table)
+
+
+def divide(Board board, int depth, Perft_table table=None) -> dict:
+    """ Counts the leaves of the move tree of a board separately for every root move.
+
+    :param board: The board, it isn't changed
+    :param depth: The depth of the tree, at least 1
+    :param table: A perft table to cache the counts of subtrees in, None to count without a cache
+    :return: A dictionary from every legal packed move to the amount of leaves after it
+    """
+    cdef Position position
+    cdef unsigned int[MAX_MOVES] moves
+    cdef int count, i
+
+    load_position(board, &position)
+    count = generate_position_moves(&position, moves)
+    return {moves[i]: perft_after_move(position, moves[i], depth, table) for i in range(count)}
+
+
+def parallel_perft(Board board, int depth, threads=None, Perft_table table=None) -> int:
+    """ Counts the leaves of the move tree of a board, the root moves are split over a thread pool.
+    The counting releases the GIL so the threads run on all cores.
+
+    :param board: The board, it isn't changed
+    :param depth: The depth of the tree
+    :param threads: The amount of threads, the amount of cores if None
+    :param table: A perft table which the threads share, None to count without a cache
+    :return: The amount of positions at that depth
+    """
+    cdef Position position
+    cdef unsigned int[MAX_MOVES] moves
+    cdef int count
+
+    load_position(board, &position)
+    if depth <= 1:
+        return perft_position(&position, depth)
+
+    count = generate_position_moves(&position, moves)
+    root_moves = [moves[i] for i in range(count)]
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1) as executor:
+        return sum(executor.map(lambda move: perft_after_move(position, move, depth, table), root_moves))
+
+
+def legal_moves(Board board) -> list:
+    """ Returns the legal moves of the player to move, generated without the GIL.
+
+    :param board: The board
+    :return: A list of the packed moves
+    """
+    cdef Position position
+    cdef unsigned int[MAX_MOVES] moves
+    cdef int count
+
+    load_position(board, &position)
+    with nogil:
+        count = generate_position_moves(&position, moves)
+    return [moves[i] for i in range(count)]
+
+
+def pesto_evaluate(Board board) -> float:
+    """ Returns the PeSTO evaluation of a board, computed without the GIL.
+
+    :param board: The board
+    :return: The evaluation from the side of the player to move
+    """
+    cdef Position position
+    cdef double result
+
+    load_position(board, &position)
+    with nogil:
+        result = evaluate_position(&position)
+    return result
+
+
+cdef class Position_batch:
+    """
+    This class holds the positions of several boards in one C array, so threads can process parts of it without the GIL
+    """
+
+    def __cinit__(self, boards):
+        """ Copy the positions of the boards.
+
+        :param boards: A sequence of boards
+        """
+        cdef int i
+
+        self.size = len(boards)
+        self.positions = <Position*>malloc(max(self.size, 1) * sizeof(Position))
+        self.scores = <double*>malloc(max(self.size, 1) * sizeof(double))
+        if self.positions == NULL or self.scores == NULL:
+            raise MemoryError()
+        for i in range(self.size):
+            load_position(boards[i], &self.positions[i])
+            self.scores[i] = 0
+
+    def __dealloc__(self):
+        free(self.positions)
+        free(self.scores)
+
+    def __len__(self):
+        return self.size
+
+    cpdef void evaluate_range(self, int start, int end):
+        """ Evaluate part of the positions without the GIL.
+
+        :param start: The index of the first position
+        :param end: The index after the last position
+        """
+        cdef int i
+
+        start = max(start, 0)
+        end = min(end, self.size)
+        with nogil:
+            for i in range(start, end):
+                self.scores[i] = evaluate_position(&self.positions[i])
+
+    cpdef list get_scores(self):
+        """ Returns the evaluations of the positions
+
+        :return: A list of the scores, 0 for positions which weren't evaluated
+        """
+        return [self.scores[i] for i in range(self.size)]
+
+
+def parallel_evaluate(boards, threads=None) -> list:
+    """ Returns the PeSTO evaluations of several boards, the boards are split into chunks which a thread pool evaluates.
+
+    :param boards: A sequence of boards
+    :param threads: The amount of threads, the amount of cores if None
+    :return: The evaluation of every board from the side of its player to move
+    """
+    cdef Position_batch batch
+    cdef int chunk
+
+    batch = Position_batch(boards)
+    threads = threads or os.cpu_count() or 1
+    chunk = max((batch.size + threads - 1) // threads, 1)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda start: batch.evaluate_range(start, start + chunk), range(0, batch.size, chunk)))
+    return batch.get_scores()
+
+
+# The piece types of the letters of a fen, in lower case.
+cdef dict fen_pieces = {"p": PieceType.PAWN, "q": PieceType.QUEEN, "b": PieceType.BISHOP, "n": PieceType.KNIGHT,
+                        "r": PieceType.ROOK, "k": PieceType.KING}
+
+
+def pack_fens(fens) -> tuple:
+    """ Packs positions given as fen into the input of batch_evaluate, only the placement and the player to move are read.
+
+    :param fens: A sequence of fen strings
+    :return: The bitboards as an N x 8 buffer of unsigned 64 bit integers and the players to move as N bytes
+    """
+    cdef unsigned long long[:, ::1] bitboards
+    cdef unsigned char[::1] sides
+    cdef unsigned long long bit
+    cdef unicode fen
+    cdef Py_UCS4 letter
+    cdef int i, row, col, length, index
+
+    bitboards, sides = allocate_packed(len(fens))
+    for i, fen in enumerate(fens):
+        length = len(fen)
+        row, col, index = 7, 0, 0
+        while index < length:
+            letter = fen[index]
+            index += 1
+            if letter == " ":
+                break
+            if letter == "/":
+                row, col = row - 1, 0
+            elif "1" <= letter <= "8":
+                col += <int>letter - ord("0")
+            else:
+                bit = base << (row * 8 + col)
+                if "a" <= letter <= "z":
+                    bitboards[i, 7] |= bit
+                    bitboards[i, <int>fen_pieces[letter]] |= bit
+                else:
+                    bitboards[i, 6] |= bit
+                    bitboards[i, <int>fen_pieces[<Py_UCS4>(<int>letter - ord("A") + ord("a"))]] |= bit
+                col += 1
+        sides[i] = index < length and fen[index] == "w"
+    return bitboards, sides
+
+
+def pack_boards(boards) -> tuple:
+    """ Packs the positions of boards into the input of batch_evaluate.
+
+    :param boards: A sequence of boards
+    :return: The bitboards as an N x 8 buffer of unsigned 64 bit integers and the players to move as N bytes
+    """
+    cdef unsigned long long[:, ::1] bitboards
+    cdef unsigned char[::1] sides
+    cdef Board board
+    cdef int i, piece
+
+    bitboards, sides = allocate_packed(len(boards))
+    for i in range(len(boards)):
+        board = boards[i]
+        for piece in range(6):
+            bitboards[i, piece] = board.piece_maps[piece]
+        bitboards[i, 6] = board.white_board
+        bitboards[i, 7] = board.black_board
+        sides[i] = board.is_white
+    return bitboards, sides
+
+
+cdef tuple allocate_packed(int size):
+    """ Allocates zeroed packed positions.
+
+    :param size: The amount of positions
+    :return: An N x 8 buffer of unsigned 64 bit integers and a buffer of N bytes
+    """
+    cdef unsigned long long[:, ::1] bitboards
+    cdef unsigned char[::1] sides
+
+    # A buffer can't have an empty dimension, so there is always room for one position.
+    bitboards = memoryview(array("Q", bytes(max(size, 1) * 64))).cast("B").cast("Q", (max(size, 1), 8))
+    sides = array("B", bytes(max(size, 1)))
+    return bitboards[:size], sides[:size]
+
+
+def evaluate_packed(const unsigned long long[:, ::1] bitboards, const unsigned char[::1] sides, double[::1] scores,
+                    int start, int end) -> None:
+    """ Evaluates part of the packed positions without the GIL.
+
+    :param bitboards: The N x 8 bitboards of the positions
+    :param sides: The players to move, non zero for white
+    :param scores: The buffer which the scores are written to
+    :param start: The index of the first position
+    :param end: The index after the last position
+    """
+    cdef const unsigned long long* rows
+    cdef const unsigned char* players
+    cdef double* results
+    cdef Position position
+    cdef int i
+
+    if start >= end:
+        return
+    rows = &bitboards[start, 0]
+    players = &sides[start]
+    results = &scores[start]
+    with nogil:
+        for i in range(end - start):
+            load_bitboards(&rows[i * 8], players[i] != 0, &position)
+            results[i] = static_evaluation(&position)
+
+
+def batch_evaluate(const unsigned long long[:, ::1] bitboards not None, const unsigned char[::1] sides not None,
+                   double[::1] scores=None, threads=None):
+    """ Returns the evaluations of many packed positions, the same scores as evaluation_utils.evaluate gives.
+    The input can be any buffer of the right type, numpy arrays of uint64 and uint8 included.
+    The positions are split into chunks which a thread pool evaluates without the GIL.
+
+    :param bitboards: An N x 8 buffer of the six piece maps in PieceType order, then the white and the black occupancy
+    :param sides: A buffer of N bytes, non zero if white is the player to move
+    :param scores: A buffer of N doubles to write the scores to, a new array is allocated if None
+    :param threads: The amount of threads, the amount of cores if None
+    :return: The scores buffer, from the side of the player to move of every position
+    """
+    cdef int size, chunk
+
+    size = bitboards.shape[0]
+    if bitboards.shape[1] != 8 or sides.shape[0] != size:
+        raise ValueError("Expected an N x 8 bitboards buffer and N players to move")
+    if scores is None:
+        scores = array("d", bytes(size * 8))
+    elif scores.shape[0] != size:
+        raise ValueError("Expected a scores buffer of N doubles")
+
+    threads = threads or os.cpu_count() or 1
+    chunk = max((size + threads - 1) // threads, 1)
+    if threads == 1 or size <= chunk:
+        evaluate_packed(bitboards, sides, scores, 0, size)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda start: evaluate_packed(bitboards, sides, scores, start, min(start + chunk, size)),
+                              range(0, size, chunk)))
+    return scores.base
@@ -0,0 +1,30 @@
+/* The switch and the clock of the instrumented build of the core.
+   setup.py defines CHESS_PROFILE when the CHESS_PROFILE environment variable is set, otherwise PROFILE_ENABLED is 0
+   and the compiler removes every timer and counter of the hot paths. */
+#ifndef CHESS_PROFILER_H
+#define CHESS_PROFILER_H
+
+#include <time.h>
+
+#ifdef CHESS_PROFILE
+#define PROFILE_ENABLED 1
+#else
+#define PROFILE_ENABLED 0
+#endif
+
+/* The time in nanoseconds from an arbitrary start, 0 in the normal build. */
+static inline unsigned long long profile_clock(void) {
+#if PROFILE_ENABLED
+    struct timespec now;
+#ifdef _WIN32
+    timespec_get(&now, TIME_UTC);
+#else
+    clock_gettime(CLOCK_MONOTONIC, &now);
+#endif
+    return (unsigned long long)now.tv_sec * 1000000000ULL + (unsigned long long)now.tv_nsec;
+#else
+    return 0;
+#endif
+}
+
+#endif
@@ -0,0 +1,24 @@
+from cython cimport int, long
+
+cdef extern from "profiler.h":
+    # 1 in the build with CHESS_PROFILE, the sections are only recorded inside "if PROFILE_ENABLED:" blocks
+    const bint PROFILE_ENABLED
+    unsigned long long profile_clock() noexcept nogil
+
+# The functions of the hot paths which are counted and timed.
+cdef enum Section:
+    MAKE_MOVE
+    MAKE_PACKED_MOVE
+    UNDO_MOVE
+    UNDO_PACKED_MOVE
+    UPDATE_ROUND
+    UPDATE_ATTACKER
+    UPDATE_PINS_AND_CHECKS
+    GET_ALL_LEGAL_MOVES
+    CONDITION
+    GENERATE_MOVES
+
+cdef enum:
+    NUM_SECTIONS = 10
+
+cdef void profile_record(Section section, unsigned long long started) noexcept nogil
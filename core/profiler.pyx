@@ -0,0 +1,55 @@
+# cython: language_level=3
+from cython cimport int, long
+from libc.string cimport memset
+
+# The calls and the total time in nanoseconds of every section, the time of a section includes the sections it calls.
+cdef unsigned long long[NUM_SECTIONS] calls
+cdef unsigned long long[NUM_SECTIONS] elapsed
+
+# The names of the sections in the report, indexed by Section.
+section_names = ("make_move", "make_packed_move", "undo_move", "undo_packed_move", "update_round",
+                 "__update_attacker__", "__update_pins_and_checks__", "get_all_legal_moves", "condition",
+                 "generate_moves")
+
+# Whether the core was built with the counters and timers.
+enabled = PROFILE_ENABLED
+
+
+cdef void profile_record(Section section, unsigned long long started) noexcept nogil:
+    """ Count a call of a section and add its time, the counters aren't atomic so only one thread should be profiled.
+
+    :param section: The section which ended
+    :param started: The profile_clock when the section started
+    """
+    calls[<int>section] += 1
+    elapsed[<int>section] += profile_clock() - started
+
+
+def profile_report() -> dict:
+    """ Returns the counters of the hot paths of the core, it is empty unless the core was built with
+    CHESS_PROFILE=1 python setup.py build_ext --inplace --force
+
+    :return: The calls, the total seconds and the nanoseconds per call of every section by its name, the slowest
+    section first
+    """
+    cdef int i
+
+    if not PROFILE_ENABLED:
+        return {}
+
+    report = {}
+    for i in sorted(range(NUM_SECTIONS), key=lambda section: elapsed[section], reverse=True):
+        report[section_names[i]] = {
+            "calls": calls[i],
+            "seconds": elapsed[i] / 1e9,
+            "ns_per_call": elapsed[i] / calls[i] if calls[i] != 0 else 0.0,
+        }
+    return report
+
+
+def profile_reset() -> None:
+    """
+    Reset the counters of all the sections.
+    """
+    memset(calls, 0, sizeof(calls))
+    memset(elapsed, 0, sizeof(elapsed))
@@ -1,19 +1,16 @@
 from cython cimport int, long
 
-cdef class Repetition_entry:
-    """
-    This class represents an entry in the repetition table
-    """
-    cdef public unsigned long long zobrist_key
-    cdef public int occurences
-
 
 cdef class Repetition_table:
     """
-    This class represents the repetition table
+    This class represents the repetition table, a stack of the zobrist keys of the positions in the game
     """
-    cdef list table
-    cdef int num_entries
+    cdef unsigned long long* keys
+    cdef int size
+    cdef int capacity
 
-    cpdef int get_entry(self, unsigned long long node_zobrist_key)
-    cpdef void update_entry(self, unsigned long long key, bint is_add)
+    cpdef void load(self, Repetition_table other) except *
+    cpdef void push(self, unsigned long long key) except *
+    cpdef void pop(self)
+    cpdef list get_keys(self)
+    cpdef int get_entry(self, unsigned long long node_zobrist_key, int window=*)
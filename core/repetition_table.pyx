@@ -1,45 +1,95 @@
 from cython cimport int, long
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
+from libc.string cimport memcpy
 
-cdef class Repetition_entry:
+
+cdef class Repetition_table:
     """
-    This class represents an entry in the repetition table
+    This class represents the repetition table, a stack of the zobrist keys of the positions in the game
     """
 
-    def __cinit__(self, key):
-        self.zobrist_key = key
-        self.occurences = 0
+    def __cinit__(self, int capacity=128):
+        """ Initialize an empty history.
 
+        :param capacity: The amount of positions the history holds before it grows
+        """
+        self.size = 0
+        self.capacity = max(capacity, 1)
+        self.keys = <unsigned long long*>PyMem_Malloc(self.capacity * sizeof(unsigned long long))
+        if self.keys == NULL:
+            raise MemoryError()
 
-cdef class Repetition_table:
-    """
-    This class represents the repetition table
-    """
+    def __dealloc__(self):
+        PyMem_Free(self.keys)
+
+    def __len__(self):
+        return self.size
+
+    cpdef void load(self, Repetition_table other) except *:
+        """ Replace the history with the history of another table.
+
+        :param other: The table to copy
+        """
+        cdef unsigned long long* keys
+
+        if self.capacity < other.size:
+            keys = <unsigned long long*>PyMem_Realloc(self.keys, other.capacity * sizeof(unsigned long long))
+            if keys == NULL:
+                raise MemoryError()
+            self.keys = keys
+            self.capacity = other.capacity
+
+        memcpy(self.keys, other.keys, other.size * sizeof(unsigned long long))
+        self.size = other.size
+
+    cpdef void push(self, unsigned long long key) except *:
+        """ Add the key of a position that was reached to the history.
+
+        :param key: The zobrist key of the position
+        """
+        cdef unsigned long long* keys
+
+        if self.size == self.capacity:
+            keys = <unsigned long long*>PyMem_Realloc(self.keys, 2 * self.capacity * sizeof(unsigned long long))
+            if keys == NULL:
+                raise MemoryError()
+            self.keys = keys
+            self.capacity *= 2
 
-    def __cinit__(self, size_in_MB: int):
-        self.num_entries = size_in_MB // sizeof(Repetition_entry)
-        self.table = []
-        for i in range(self.num_entries):
-            self.table.append(Repetition_entry(0))
-    
+        self.keys[self.size] = key
+        self.size += 1
 
-    cpdef int get_entry(self, unsigned long long node_zobrist_key):
-        cdef int index
-        cdef Repetition_entry entry
+    cpdef void pop(self):
+        """
+        Remove the last position from the history, used when a move is undone.
+        """
+        if self.size > 0:
+            self.size -= 1
 
-        index = node_zobrist_key % self.num_entries
-        entry = self.table[index]
-        
-        if entry.zobrist_key != node_zobrist_key:
-            return -1
-        
-        return entry.occurences
+    cpdef list get_keys(self):
+        """
+        :return: The keys of the history from the first position to the last, to rebuild it in another process
+        """
+        return [self.keys[i] for i in range(self.size)]
 
+    cpdef int get_entry(self, unsigned long long node_zobrist_key, int window=-1):
+        """ Count the occurrences of a position in the history.
+        Only the positions since the last capture or pawn move can repeat, so the scan stops there.
 
-    cpdef void update_entry(self, unsigned long long key, bint is_add):
-        cdef int index, change
+        :param node_zobrist_key: The zobrist key of the position
+        :param window: The amount of latest positions which are scanned, the board's count. -1 scans the whole history
+        :return: How many times the position occurred
+        """
+        cdef int i, end, occurrences
 
-        index = key % self.num_entries
-        change = 1 if is_add else -1
+        end = 0
+        if window >= 0:
+            end = max(0, self.size - window)
 
-        self.table[index].zobrist_key = key
-        self.table[index].occurences = self.table[index].occurences + change
\ No newline at end of file
+        occurrences = 0
+        i = self.size - 1
+        while i >= end:
+            if self.keys[i] == node_zobrist_key:
+                occurrences += 1
+            i -= 1
+        return occurrences
@@ -2,8 +2,16 @@ from setuptools import Extension, setup
 from Cython.Build import cythonize
 import os
 
+# "CHESS_PROFILE=1 python setup.py build_ext --inplace --force" builds the core with call counters and timers on its
+# hot paths, which core.profile_report() reports. They compile to nothing in the normal build.
+define_macros = [("CHESS_PROFILE", "1")] if os.environ.get("CHESS_PROFILE", "0") not in ("", "0") else []
+
 ext_modules = [
     # Other extension modules (if any)
+    Extension(
+        name="profiler",
+        sources=["profiler.pyx"],
+    ),
     Extension(
         name="mask_utils",
         sources=["mask_utils.pyx"],
@@ -16,6 +24,10 @@ ext_modules = [
         name="piece",
         sources=["piece.pyx"],
     ),
+    Extension(
+        name="magic_utils",
+        sources=["magic_utils.pyx"],
+    ),
     Extension(
         name="board",
         sources=["board.pyx"],
@@ -24,15 +36,33 @@ ext_modules = [
         name="core_utils",
         sources=["core_utils.pyx"],
     ),
+    Extension(
+        name="move_ordering",
+        sources=["move_ordering.pyx"],
+    ),
+    Extension(
+        name="position",
+        sources=["position.pyx"],
+    ),
+    Extension(
+        name="texel_utils",
+        sources=["texel_utils.pyx"],
+    ),
     Extension(
         name="transposition_table",
         sources=["transposition_table.pyx"],
     ),
+    Extension(
+        name="evaluation_table",
+        sources=["evaluation_table.pyx"],
+    ),
     Extension(
         name="repetition_table",
         sources=["repetition_table.pyx"],
     ),
 ]
+for extension in ext_modules:
+    extension.define_macros += define_macros
 
 setup(
     ext_modules=cythonize(ext_modules),
@@ -0,0 +1,39 @@
+from cython cimport int, long
+
+from position cimport Position
+
+# The features of a position: a piece on a cell from the side of white, the mobility terms and the mop up terms.
+cdef enum:
+    PIECE_FEATURES = 384
+    MOBILITY_FEATURE = 384
+    MOP_UP_FEATURE = 387
+    MAX_POSITION_FEATURES = 72
+
+# The layout of the weights vector which is tuned.
+cdef enum:
+    MG_VALUE_WEIGHT = 0
+    EG_VALUE_WEIGHT = 6
+    MG_TABLE_WEIGHT = 12
+    EG_TABLE_WEIGHT = 396
+    MOBILITY_WEIGHT = 780
+    MOP_UP_WEIGHT = 783
+    NUM_WEIGHTS = 785
+
+cdef int position_features(Position* position, unsigned short* indices, signed char* values) noexcept nogil
+
+cdef class Feature_set:
+    """
+    This class maps a feature cache file, the sparse features of labelled positions, to tune the evaluation over
+    """
+    cdef object file
+    cdef object mapping
+    cdef const unsigned long long* offsets
+    cdef const unsigned short* indices
+    cdef const signed char* values
+    cdef const unsigned char* results
+    cdef const unsigned char* phases
+    cdef public long size
+
+    cdef double position_score(self, const double* weights, long index) noexcept nogil
+    cdef double chunk_gradient(self, const double* weights, double* gradient, double scaling, long start,
+                               long end) noexcept nogil
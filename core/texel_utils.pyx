@@ -0,0 +1,391 @@
+# cython: language_level=3
+import mmap
+import os
+import struct
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from cython cimport int, long
+from libc.math cimport exp, log
+from libc.stdlib cimport malloc, free
+from libc.string cimport memset
+
+from binary_ops_utils cimport bit_scan_forward
+from piece cimport PieceType
+from position cimport Position, load_bitboards, mop_up_terms, mobility_terms
+from .position import pack_fens
+
+# The first bytes of a feature cache file, then the amount of positions and the amount of features.
+cache_magic = b"TEXELFS1"
+cache_header = struct.Struct("=8sQQ")
+
+cdef double LN_10 = log(10)
+
+
+cdef int position_features(Position* position, unsigned short* indices, signed char* values) noexcept nogil:
+    """ This function computes the sparse features of a position, from the side of white.
+    A piece is a feature of its type and of its cell mirrored for black, with +1 for white and -1 for black.
+
+    :param position: The position
+    :param indices: Filled with the indices of the features which aren't 0
+    :param values: Filled with the values of these features
+    :return: The amount of features
+    """
+    cdef signed char[MOP_UP_FEATURE + 2] counts
+    cdef unsigned long long piece_map
+    cdef unsigned long cell
+    cdef long[2] mop_up
+    cdef int[3] moves
+    cdef int piece, sign, count, i
+
+    memset(counts, 0, sizeof(counts))
+    for piece in range(6):
+        piece_map = position.piece_maps[piece] & position.color_maps[0]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            counts[piece * 64 + cell] += 1
+        piece_map = position.piece_maps[piece] & position.color_maps[1]
+        while piece_map != 0:
+            cell = bit_scan_forward(piece_map)
+            piece_map &= piece_map - 1
+            counts[piece * 64 + (cell ^ 56)] -= 1
+
+    # The mobility and the mop up are computed from the side of the player to move.
+    sign = 1 if position.is_white else -1
+    mobility_terms(position, moves)
+    for i in range(3):
+        counts[MOBILITY_FEATURE + i] = sign * moves[i]
+    mop_up_terms(position, mop_up)
+    for i in range(2):
+        counts[MOP_UP_FEATURE + i] = sign * mop_up[i]
+
+    count = 0
+    for i in range(MOP_UP_FEATURE + 2):
+        if counts[i] != 0:
+            indices[count] = i
+            values[count] = counts[i]
+            count += 1
+    return count
+
+
+cdef void append_features(list fens, offsets, indices, values, phases) except *:
+    """ This function computes the features of a batch of positions and appends them to the arrays of a cache.
+
+    :param fens: The fen strings of the positions
+    :param offsets: The array of the offsets of every position's features
+    :param indices: The array of the feature indices
+    :param values: The array of the feature values
+    :param phases: The array of the game phases
+    """
+    cdef unsigned long long[:, ::1] bitboards
+    cdef unsigned char[::1] sides
+    cdef unsigned short* batch_indices
+    cdef signed char* batch_values
+    cdef unsigned long long* batch_offsets
+    cdef unsigned char* batch_phases
+    cdef const unsigned long long* rows
+    cdef const unsigned char* players
+    cdef unsigned long long total, first
+    cdef Position position
+    cdef long size, i
+
+    size = len(fens)
+    if size == 0:
+        return
+    bitboards, sides = pack_fens(fens)
+    rows = &bitboards[0, 0]
+    players = &sides[0]
+    first = offsets[len(offsets) - 1]
+
+    batch_indices = <unsigned short*>malloc(size * MAX_POSITION_FEATURES * sizeof(unsigned short))
+    batch_values = <signed char*>malloc(size * MAX_POSITION_FEATURES * sizeof(signed char))
+    batch_offsets = <unsigned long long*>malloc(size * sizeof(unsigned long long))
+    batch_phases = <unsigned char*>malloc(size * sizeof(unsigned char))
+    try:
+        if batch_indices == NULL or batch_values == NULL or batch_offsets == NULL or batch_phases == NULL:
+            raise MemoryError()
+
+        total = 0
+        with nogil:
+            for i in range(size):
+                load_bitboards(&rows[i * 8], players[i] != 0, &position)
+                total += position_features(&position, &batch_indices[total], &batch_values[total])
+                batch_offsets[i] = first + total
+                batch_phases[i] = position.phase if position.phase < 24 else 24
+
+        indices.frombytes((<char*>batch_indices)[:total * sizeof(unsigned short)])
+        values.frombytes((<char*>batch_values)[:total])
+        offsets.frombytes((<char*>batch_offsets)[:size * sizeof(unsigned long long)])
+        phases.frombytes((<char*>batch_phases)[:size])
+    finally:
+        free(batch_indices)
+        free(batch_values)
+        free(batch_offsets)
+        free(batch_phases)
+
+
+def write_feature_cache(path, positions, int batch_size=65536) -> int:
+    """ Computes the features of labelled positions and writes them to a cache file which Feature_set maps.
+    The PeSTO tables must be set, importing evaluation_utils sets them, since the game phase is taken from them.
+
+    :param path: The path of the cache file
+    :param positions: An iterable of (fen, result) pairs, the result is 1 for a win of white, 0.5 for a draw and
+    0 for a loss, the positions are streamed in batches
+    :param batch_size: The amount of positions whose features are computed at once
+    :return: The amount of positions
+    """
+    offsets = array("Q", [0])
+    indices = array("H")
+    values = array("b")
+    results = array("B")
+    phases = array("B")
+
+    fens = []
+    for fen, result in positions:
+        if not 0 <= result <= 1:
+            raise ValueError(f"The result of {fen} isn't between 0 and 1")
+        fens.append(fen)
+        results.append(round(result * 2))
+        if len(fens) == batch_size:
+            append_features(fens, offsets, indices, values, phases)
+            fens = []
+    append_features(fens, offsets, indices, values, phases)
+
+    with open(path, "wb") as output:
+        output.write(cache_header.pack(cache_magic, len(results), len(indices)))
+        for data in (offsets, indices, values, results, phases):
+            output.write(data.tobytes())
+    return len(results)
+
+
+cdef class Feature_set:
+    """
+    This class maps a feature cache file, the sparse features of labelled positions, to tune the evaluation over
+    """
+
+    def __cinit__(self, path):
+        """ Map a feature cache file.
+
+        :param path: The path of a file which write_feature_cache wrote
+        """
+        cdef const unsigned char[::1] data
+        cdef const unsigned char* start
+        cdef unsigned long long entries, position
+
+        self.file = open(path, "rb")
+        self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, entries = cache_header.unpack_from(self.mapping)
+        if magic != cache_magic:
+            raise ValueError(f"{path} isn't a feature cache")
+
+        # The mapping stays open as long as the set, so pointers into it stay valid.
+        data = self.mapping
+        start = &data[0]
+        position = cache_header.size
+        self.offsets = <const unsigned long long*>(start + position)
+        position += (self.size + 1) * sizeof(unsigned long long)
+        self.indices = <const unsigned short*>(start + position)
+        position += entries * sizeof(unsigned short)
+        self.values = <const signed char*>(start + position)
+        position += entries
+        self.results = start + position
+        position += self.size
+        self.phases = start + position
+        if position + self.size != len(self.mapping):
+            raise ValueError(f"{path} is a truncated feature cache")
+
+    def __len__(self):
+        return self.size
+
+    cdef double position_score(self, const double* weights, long index) noexcept nogil:
+        """ Returns the evaluation of a position with certain weights, from the side of white.
+
+        :param weights: The weights vector
+        :param index: The index of the position
+        :return: The evaluation
+        """
+        cdef double mg_score, eg_score, score
+        cdef unsigned long long i
+        cdef int feature, phase
+        cdef double value
+
+        mg_score = 0
+        eg_score = 0
+        score = 0
+        for i in range(self.offsets[index], self.offsets[index + 1]):
+            feature = self.indices[i]
+            value = self.values[i]
+            if feature < PIECE_FEATURES:
+                mg_score += value * (weights[MG_VALUE_WEIGHT + (feature >> 6)] + weights[MG_TABLE_WEIGHT + feature])
+                eg_score += value * (weights[EG_VALUE_WEIGHT + (feature >> 6)] + weights[EG_TABLE_WEIGHT + feature])
+            elif feature < MOP_UP_FEATURE:
+                score += value * weights[MOBILITY_WEIGHT + feature - MOBILITY_FEATURE]
+            else:
+                eg_score += value * weights[MOP_UP_WEIGHT + feature - MOP_UP_FEATURE]
+        phase = self.phases[index]
+        return score + (mg_score * phase + eg_score * (24 - phase)) / 24.0
+
+    cdef double chunk_gradient(self, const double* weights, double* gradient, double scaling, long start,
+                               long end) noexcept nogil:
+        """ Sums the squared errors of the predicted results of some positions and their gradient by the weights.
+        The prediction is the sigmoid 1 / (1 + 10 ^ (-scaling * score / 400)).
+
+        :param weights: The weights vector
+        :param gradient: The vector which the gradient is added to, NULL to only sum the errors
+        :param scaling: The scaling of the scores in the sigmoid
+        :param start: The index of the first position
+        :param end: The index after the last position
+        :return: The sum of the squared errors
+        """
+        cdef double loss, prediction, error, slope, mg_slope, eg_slope, value
+        cdef unsigned long long i
+        cdef int feature, phase
+        cdef long index
+
+        loss = 0
+        for index in range(start, end):
+            prediction = 1 / (1 + exp(-scaling * LN_10 * self.position_score(weights, index) / 400))
+            error = prediction - self.results[index] / 2.0
+            loss += error * error
+            if gradient == NULL:
+                continue
+
+            slope = 2 * error * prediction * (1 - prediction) * scaling * LN_10 / 400
+            phase = self.phases[index]
+            mg_slope = slope * phase / 24.0
+            eg_slope = slope * (24 - phase) / 24.0
+            for i in range(self.offsets[index], self.offsets[index + 1]):
+                feature = self.indices[i]
+                value = self.values[i]
+                if feature < PIECE_FEATURES:
+                    gradient[MG_VALUE_WEIGHT + (feature >> 6)] += value * mg_slope
+                    gradient[MG_TABLE_WEIGHT + feature] += value * mg_slope
+                    gradient[EG_VALUE_WEIGHT + (feature >> 6)] += value * eg_slope
+                    gradient[EG_TABLE_WEIGHT + feature] += value * eg_slope
+                elif feature < MOP_UP_FEATURE:
+                    gradient[MOBILITY_WEIGHT + feature - MOBILITY_FEATURE] += value * slope
+                else:
+                    gradient[MOP_UP_WEIGHT + feature - MOP_UP_FEATURE] += value * eg_slope
+        return loss
+
+    def evaluate(self, const double[::1] weights not None, long index) -> float:
+        """ Returns the evaluation of a position with certain weights.
+
+        :param weights: The weights vector
+        :param index: The index of the position
+        :return: The evaluation from the side of white
+        """
+        if not 0 <= index < self.size:
+            raise IndexError("The position index is out of range")
+        if weights.shape[0] != NUM_WEIGHTS:
+            raise ValueError(f"Expected {NUM_WEIGHTS} weights")
+        return self.position_score(&weights[0], index)
+
+    def gradient_range(self, const double[::1] weights not None, double scaling, long start, long end,
+                       bint with_gradient=True) -> tuple:
+        """ Sums the squared errors of part of the positions and their gradient without the GIL.
+
+        :param weights: The weights vector
+        :param scaling: The scaling of the scores in the sigmoid
+        :param start: The index of the first position
+        :param end: The index after the last position
+        :param with_gradient: Whether to compute the gradient as well
+        :return: The sum of the squared errors and the gradient, None if it isn't computed
+        """
+        cdef double[::1] gradient
+        cdef const double* vector
+        cdef double* result
+        cdef double loss
+
+        if weights.shape[0] != NUM_WEIGHTS:
+            raise ValueError(f"Expected {NUM_WEIGHTS} weights")
+        start = max(start, 0)
+        end = min(end, self.size)
+        gradient = array("d", bytes(NUM_WEIGHTS * sizeof(double)))
+        vector = &weights[0]
+        result = &gradient[0] if with_gradient else NULL
+        with nogil:
+            loss = self.chunk_gradient(vector, result, scaling, start, end)
+        return loss, gradient.base if with_gradient else None
+
+
+def loss_and_gradient(Feature_set features, weights, double scaling, threads=None, bint with_gradient=True) -> tuple:
+    """ Returns the mean squared error of the predicted results of all the positions and its gradient by the weights.
+    The positions are split into chunks which a thread pool processes.
+
+    :param features: The positions
+    :param weights: The weights vector
+    :param scaling: The scaling of the scores in the sigmoid
+    :param threads: The amount of threads, the amount of cores if None
+    :param with_gradient: Whether to compute the gradient as well
+    :return: The mean squared error and its gradient, None if it isn't computed
+    """
+    cdef long chunk
+    cdef int i
+
+    weights = array("d", weights)
+    threads = threads or os.cpu_count() or 1
+    chunk = max((features.size + threads - 1) // threads, 1)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        parts = list(executor.map(lambda start: features.gradient_range(weights, scaling, start, start + chunk,
+                                                                        with_gradient),
+                                  range(0, max(features.size, 1), chunk)))
+
+    size = max(features.size, 1)
+    loss = sum(part[0] for part in parts) / size
+    if not with_gradient:
+        return loss, None
+    gradient = array("d", bytes(NUM_WEIGHTS * sizeof(double)))
+    for part in parts:
+        for i in range(NUM_WEIGHTS):
+            gradient[i] += part[1][i]
+    for i in range(NUM_WEIGHTS):
+        gradient[i] /= size
+    return loss, gradient
+
+
+def pack_weights(middle_game_value, endgame_value, mg_pesto_table, eg_pesto_table, mobility_weights,
+                 mop_up_weights) -> array:
+    """ Packs the weights of the evaluation into the vector which is tuned.
+
+    :param middle_game_value: The middle game value of every piece type
+    :param endgame_value: The endgame value of every piece type
+    :param mg_pesto_table: The middle game piece-square table of every piece type, from the side of white
+    :param eg_pesto_table: The endgame piece-square table of every piece type, from the side of white
+    :param mobility_weights: The weights of the cells attacked by the knights, bishops and rooks
+    :param mop_up_weights: The weights of the enemy king's distance from the center and of the distance between the kings
+    :return: The weights vector
+    """
+    cdef int piece, cell, i
+
+    weights = array("d", bytes(NUM_WEIGHTS * sizeof(double)))
+    for piece in range(6):
+        weights[MG_VALUE_WEIGHT + piece] = middle_game_value[piece]
+        weights[EG_VALUE_WEIGHT + piece] = endgame_value[piece]
+        for cell in range(64):
+            weights[MG_TABLE_WEIGHT + piece * 64 + cell] = mg_pesto_table[piece][cell]
+            weights[EG_TABLE_WEIGHT + piece * 64 + cell] = eg_pesto_table[piece][cell]
+    for i in range(3):
+        weights[MOBILITY_WEIGHT + i] = mobility_weights[i]
+    for i in range(2):
+        weights[MOP_UP_WEIGHT + i] = mop_up_weights[i]
+    return weights
+
+
+def unpack_weights(weights) -> dict:
+    """ Unpacks a weights vector into the weights of the evaluation.
+
+    :param weights: The weights vector
+    :return: A dictionary from the names of the weights in evaluation_tables to their values
+    """
+    return {
+        "middle_game_value": tuple(weights[MG_VALUE_WEIGHT:MG_VALUE_WEIGHT + 6]),
+        "endgame_value": tuple(weights[EG_VALUE_WEIGHT:EG_VALUE_WEIGHT + 6]),
+        "mg_pesto_table": tuple(tuple(weights[MG_TABLE_WEIGHT + piece * 64:MG_TABLE_WEIGHT + (piece + 1) * 64])
+                                for piece in range(6)),
+        "eg_pesto_table": tuple(tuple(weights[EG_TABLE_WEIGHT + piece * 64:EG_TABLE_WEIGHT + (piece + 1) * 64])
+                                for piece in range(6)),
+        "mobility_weights": tuple(weights[MOBILITY_WEIGHT:MOBILITY_WEIGHT + 3]),
+        "mop_up_weights": tuple(weights[MOP_UP_WEIGHT:MOP_UP_WEIGHT + 2]),
+    }
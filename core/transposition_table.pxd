@@ -1,5 +1,33 @@
 from cython cimport int, long
-from core_utils cimport Move
+
+# Amount of entries in a bucket, five 12 byte entries fill a 64 byte cache line.
+cdef enum:
+    BUCKET_SIZE = 5
+    GENERATION_CYCLE = 32
+
+cdef packed struct Entry_data:
+    float score
+    # The best packed move: origin | target << 6 | promotion << 12 | castle << 15
+    unsigned short best
+    signed char depth
+    # bits 0-1 are the node type + 1 (0 marks an empty slot), bit 2 is the perspective, bits 3-7 are the generation
+    unsigned char flags
+
+cdef union Entry_word:
+    Entry_data fields
+    unsigned long long word
+
+cdef packed struct Packed_entry:
+    # The upper 32 bits of the zobrist key xor the folded data word, the lower bits are implied by the bucket index.
+    # A torn write by another process therefore fails the key check instead of returning corrupted data.
+    unsigned int key_check
+    Entry_word data
+
+cdef packed struct Bucket:
+    # The first entries are depth-preferred and the last one is always replaced
+    Packed_entry[BUCKET_SIZE] entries
+    # Pads the bucket to the 64 bytes of a cache line
+    unsigned char[4] padding
 
 cdef class Entry:
     """
@@ -10,16 +38,35 @@ cdef class Entry:
     cdef public int depth
     # 0 is exact value, 1 is lowerbound, 2 is upperbound
     cdef public int node_type
-    cdef public Move best
+    # The best packed move, 0 if there is none
+    cdef public unsigned int best
     # Used for perspective
     cdef public bint is_white
 
+cdef unsigned int fold_word(unsigned long long word)
+
 cdef class Transposition_table:
     """
     This class represents the transposition table
     """
-    cdef list table
-    cdef int num_entries
+    cdef void* memory
+    cdef unsigned char[::1] buffer
+    cdef Bucket* table
+    cdef unsigned long long num_buckets
+    cdef public unsigned long size_in_MB
+    cdef public unsigned char generation
+    cdef readonly unsigned long long probes
+    cdef readonly unsigned long long hits
 
+    cdef void allocate(self) except *
+    cdef void attach(self, object buffer) except *
+    cdef Bucket* probe(self, unsigned long long key)
+    cdef int relative_age(self, Packed_entry* entry)
     cpdef Entry get_entry(self, unsigned long long node_zobrist_key)
-    cpdef void store_entry(self, unsigned long long key, float score, int depth, int node_type, Move best, bint is_white)
+    cpdef void store_entry(self, unsigned long long key, float score, int depth, int node_type, unsigned int best,
+                           bint is_white)
+    cpdef void new_search(self)
+    cpdef int hashfull(self)
+    cpdef void reset_stats(self)
+    cpdef void clear(self)
+    cpdef void resize(self, unsigned long size_in_MB) except *
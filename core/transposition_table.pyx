@@ -1,8 +1,7 @@
 from cython cimport int, long
-from core_utils cimport Move
-from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
-cdef extern from "string.h":
-    void memset(void* dest, int c, size_t n)
+from libc.stdlib cimport calloc, free
+from libc.string cimport memset
+
 
 cdef class Entry:
     """
@@ -18,39 +17,227 @@ cdef class Entry:
         self.is_white = False
 
 
+cdef unsigned int fold_word(unsigned long long word):
+    """ Folds a 64 bit entry data word into 32 bits for the key check.
+
+    :param word: The data word
+    :return: The xor of the two halves of the word
+    """
+    return <unsigned int>(word ^ (word >> 32))
+
+
 cdef class Transposition_table:
     """
-    This class represents the transposition table
+    This class represents the transposition table, the entries are packed in cache line sized buckets
+    of one contiguous C array. The array is allocated on first use, or placed on a given buffer
+    such as shared memory so several processes can use the same table without locks.
     """
 
-    def __cinit__(self, size_in_MB: int):
-        self.num_entries = size_in_MB // sizeof(Entry)
-        self.table = []
-        for i in range(self.num_entries):
-            self.table.append(Entry(0,0,0,-1,None))
-    
+    def __cinit__(self, size_in_MB: int, buffer=None):
+        """ Initialize an empty table of a certain size, the memory itself is allocated lazily.
+
+        :param size_in_MB: The size of the table in megabytes
+        :param buffer: Optional writable buffer to hold the entries instead of private memory
+        """
+        self.memory = NULL
+        self.table = NULL
+        self.generation = 0
+        self.resize(size_in_MB)
+        if buffer is not None:
+            self.attach(buffer)
+
+    def __dealloc__(self):
+        free(self.memory)
+
+    cdef void allocate(self) except *:
+        """
+        This method allocates the table's buckets aligned to a cache line, all of the entries are zeroed and therefore empty.
+        """
+        self.memory = calloc(self.num_buckets * sizeof(Bucket) + 63, 1)
+        if self.memory == NULL:
+            raise MemoryError()
+        self.table = <Bucket*>((<size_t>self.memory + 63) & ~(<size_t>63))
+
+    cdef void attach(self, object buffer) except *:
+        """ Place the table on an external buffer, the entries already in it are kept.
+
+        :param buffer: A writable buffer, its size determines the amount of buckets
+        """
+        cdef size_t offset
+
+        self.buffer = buffer
+        offset = (64 - (<size_t>&self.buffer[0] & 63)) & 63
+        if self.buffer.shape[0] < offset + sizeof(Bucket):
+            raise ValueError("The buffer must hold at least one bucket")
+
+        self.num_buckets = (self.buffer.shape[0] - offset) // sizeof(Bucket)
+        self.table = <Bucket*>&self.buffer[offset]
+
+    cdef Bucket* probe(self, unsigned long long key):
+        """ Returns the bucket a key is mapped to.
+
+        :param key: The zobrist key of the position
+        :return: Pointer to the bucket of the key
+        """
+        return self.table + (key % self.num_buckets)
+
+    cdef int relative_age(self, Packed_entry* entry):
+        """ Returns how many searches passed since an entry was stored.
+
+        :param entry: The entry
+        :return: The amount of searches since the entry was stored
+        """
+        return (self.generation - (entry.data.fields.flags >> 3)) & (GENERATION_CYCLE - 1)
 
     cpdef Entry get_entry(self, unsigned long long node_zobrist_key):
-        cdef int index
+        """ Returns the stored entry of a position
+
+        :param node_zobrist_key: The zobrist key of the position
+        :return: The entry if the position is stored in the table, None otherwise
+        """
+        cdef Packed_entry* slot
+        cdef Entry_word data
         cdef Entry entry
+        cdef unsigned int key_check
+        cdef int i
 
-        index = node_zobrist_key % self.num_entries
-        entry = self.table[index]
-        
-        if entry.zobrist_key != node_zobrist_key:
+        self.probes += 1
+        if self.table == NULL:
             return None
-        
-        return entry
 
+        slot = self.probe(node_zobrist_key).entries
+        key_check = <unsigned int>(node_zobrist_key >> 32)
+        for i in range(BUCKET_SIZE):
+            # Copy the data before validating it, so it can't change between the check and the use.
+            data = slot.data
+            if data.fields.flags & 3 != 0 and slot.key_check ^ fold_word(data.word) == key_check:
+                entry = Entry(node_zobrist_key, data.fields.score, data.fields.depth, (data.fields.flags & 3) - 1,
+                              data.fields.best)
+                entry.is_white = (data.fields.flags & 4) != 0
+                self.hits += 1
+                return entry
+            slot += 1
+
+        return None
+
+    cpdef void store_entry(self, unsigned long long key, float score, int depth, int node_type, unsigned int best,
+                           bint is_white):
+        """ Store the result of a search in the bucket of the position.
+        A stored entry of the same position is kept only if it is deeper and from the current search,
+        otherwise the shallowest and oldest depth-preferred entry is replaced if the new one is at least as valuable,
+        and if not the always-replace entry of the bucket is.
+
+        :param key: The zobrist key of the position
+        :param score: The score of the position
+        :param depth: The depth the position was searched to
+        :param node_type: 0 for exact value, 1 for lowerbound and 2 for upperbound
+        :param best: The best packed move found, 0 if there is none
+        :param is_white: The color of the player to move
+        """
+        cdef Packed_entry* entries
+        cdef Packed_entry* slot
+        cdef Packed_entry* replace
+        cdef Entry_word data
+        cdef unsigned int key_check
+        cdef int i, value, replace_value
+
+        if self.table == NULL:
+            self.allocate()
+
+        entries = self.probe(key).entries
+        key_check = <unsigned int>(key >> 32)
+        depth = max(-128, min(127, depth))
+        replace = NULL
+        replace_value = 0
+
+        for i in range(BUCKET_SIZE):
+            slot = entries + i
+            data = slot.data
+            if data.fields.flags & 3 != 0 and slot.key_check ^ fold_word(data.word) == key_check:
+                if depth < data.fields.depth and node_type != 0 and self.relative_age(slot) == 0:
+                    if data.fields.best == 0 and best != 0:
+                        data.fields.best = best
+                        slot.key_check = key_check ^ fold_word(data.word)
+                        slot.data = data
+                    return
+                replace = slot
+                replace_value = -1000
+                break
+
+            if i == BUCKET_SIZE - 1:
+                break
+
+            # Empty entries are worth the least, then old and shallow ones.
+            value = -1000 if data.fields.flags & 3 == 0 else data.fields.depth - 8 * self.relative_age(slot)
+            if replace == NULL or value < replace_value:
+                replace = slot
+                replace_value = value
+
+        if replace_value > depth:
+            replace = entries + BUCKET_SIZE - 1
+
+        data.fields.score = score
+        data.fields.depth = <signed char>depth
+        data.fields.best = best
+        data.fields.flags = (node_type + 1) | (4 if is_white else 0) | (self.generation << 3)
+        replace.key_check = key_check ^ fold_word(data.word)
+        replace.data = data
+
+    cpdef void new_search(self):
+        """
+        This method marks the start of a new search, entries from previous searches are aged by it.
+        """
+        self.generation = (self.generation + 1) % GENERATION_CYCLE
+
+    cpdef int hashfull(self):
+        """ Estimates how full the table is by sampling the first thousand entries.
+
+        :return: The permille of the sampled entries which were stored during the current search
+        """
+        cdef unsigned long long buckets, i
+        cdef int j, count
+
+        if self.table == NULL:
+            return 0
+
+        buckets = min(self.num_buckets, 1000 // BUCKET_SIZE)
+        count = 0
+        for i in range(buckets):
+            for j in range(BUCKET_SIZE):
+                if self.table[i].entries[j].data.fields.flags & 3 != 0 and self.relative_age(&self.table[i].entries[j]) == 0:
+                    count += 1
+        return (count * 1000) // (buckets * BUCKET_SIZE)
+
+    cpdef void reset_stats(self):
+        """
+        This method resets the probe and hit counters.
+        """
+        self.probes = 0
+        self.hits = 0
+
+    cpdef void clear(self):
+        """
+        This method empties the table and resets the generation.
+        """
+        if self.table != NULL:
+            memset(self.table, 0, self.num_buckets * sizeof(Bucket))
+        self.generation = 0
+
+    cpdef void resize(self, unsigned long size_in_MB) except *:
+        """ Change the size of the table, all of the stored entries are discarded.
+        A table which was placed on an external buffer is detached from it.
+
+        :param size_in_MB: The new size of the table in megabytes
+        """
+        cdef unsigned long long num_buckets
 
-    cpdef void store_entry(self, unsigned long long key, float score, int depth, int node_type, Move best, bint is_white):
-        cdef int index
+        num_buckets = (<unsigned long long>size_in_MB * 1024 * 1024) // sizeof(Bucket)
+        if num_buckets == 0:
+            raise ValueError("The transposition table must hold at least one bucket")
 
-        index = key % self.num_entries
-        self.table[index].zobrist_key = key
-        self.table[index].score = score
-        self.table[index].depth = depth
-        self.table[index].node_type = node_type
-        self.table[index].best = best
-        self.table[index].is_white = is_white
-        
\ No newline at end of file
+        free(self.memory)
+        self.memory = NULL
+        self.buffer = None
+        self.table = NULL
+        self.num_buckets = num_buckets
+        self.size_in_MB = size_in_MB
@@ -393,7 +393,7 @@ class GUI:
         :param board: The current position which we check
         :return: If the position in board was seen 3 times already
         """
-        return board.repetition_table.get_entry(board.zobrist_key) >= 3
+        return board.repetition_table.get_entry(board.zobrist_key, board.count) >= 3
 
     def make_move(self, board: Board, user_input: Move):
         """
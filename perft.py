@@ -0,0 +1,106 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import core
+from core import Board
+from core.position import Perft_table, divide as divide_moves, perft
+from UCI import convert_move_to_uci
+
+start_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# The perft table of a worker process, it is kept between the root moves the process counts.
+worker_table = None
+
+
+def count_root_move(fen: str, move: int, depth: int, hash_size: int) -> int:
+    """ This is the entry point of a worker process, it counts the leaves after one root move.
+
+    :param fen: The root position
+    :param move: The packed root move
+    :param depth: The depth of the tree from the root
+    :param hash_size: The size of the worker's perft table in megabytes, 0 to count without a table
+    :return: The amount of leaves which start with the move
+    """
+    global worker_table
+    if hash_size > 0 and (worker_table is None or worker_table.size_in_MB != hash_size):
+        worker_table = Perft_table(hash_size)
+
+    board = Board(fen)
+    core.core_utils.make_packed_move(board, move)
+    return perft(board, depth - 1, worker_table if hash_size > 0 else None)
+
+
+def divide(board: Board, depth: int, workers: Optional[int] = None, hash_size: int = 16) -> Dict[int, int]:
+    """ This method counts the leaves of the move tree separately for every root move,
+    the root moves are split over a process pool.
+
+    :param board: The root position, it isn't changed
+    :param depth: The depth of the tree, at least 1
+    :param workers: The amount of processes, the amount of cores if None
+    :param hash_size: The size of the perft table of every process in megabytes, 0 to count without a table
+    :return: A dictionary from every legal packed move to the amount of leaves after it
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or depth <= 2:
+        return divide_moves(board, depth, Perft_table(hash_size) if hash_size > 0 else None)
+
+    # Every process of the pool counts with a table of its own.
+
+    moves = core.position.legal_moves(board)
+    fen = board.export_to_fen()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        counts = executor.map(count_root_move, [fen] * len(moves), moves, [depth] * len(moves),
+                              [hash_size] * len(moves))
+        return dict(zip(moves, counts))
+
+
+def run_perft(board: Board, depth: int, workers: Optional[int] = None, hash_size: int = 16) -> int:
+    """ This method counts the leaves of the move tree of a position.
+
+    :param board: The root position, it isn't changed
+    :param depth: The depth of the tree
+    :param workers: The amount of processes, the amount of cores if None
+    :param hash_size: The size of the perft table of every process in megabytes, 0 to count without a table
+    :return: The amount of positions at that depth
+    """
+    if depth <= 0:
+        return 1
+    return sum(divide(board, depth, workers, hash_size).values())
+
+
+def main(argv=None) -> None:
+    """ The command line entry point, it prints the count of every root move when asked to and the total count.
+
+    :param argv: The command line arguments, the ones of the process if None
+    """
+    parser = argparse.ArgumentParser(description="Count the leaves of the move tree of a position")
+    parser.add_argument("depth", type=int, help="The depth of the tree")
+    parser.add_argument("--fen", default=start_fen, help="The root position, the initial position by default")
+    parser.add_argument("--workers", type=int, default=None, help="The amount of processes, all the cores by default")
+    parser.add_argument("--hash", type=int, default=16, help="The perft table size of every process in megabytes")
+    parser.add_argument("--divide", action="store_true", help="Print the count of every root move")
+    args = parser.parse_args(argv)
+
+    board = Board(args.fen)
+    start = time.time()
+    if args.depth <= 0:
+        counts = {}
+        total = 1
+    else:
+        counts = divide(board, args.depth, args.workers, args.hash)
+        total = sum(counts.values())
+    elapsed = time.time() - start
+
+    if args.divide:
+        for move, count in sorted(counts.items(), key=lambda item: convert_move_to_uci(core.decode_move(item[0]))):
+            print(f"{convert_move_to_uci(core.decode_move(move))}: {count}")
+        print()
+    print(f"Nodes: {total}")
+    print(f"Time: {elapsed:.3f}s ({total / max(elapsed, 1e-9):.0f} nodes/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import pytest
 
+import perft
 import search_utils
 from core import Board
+from core.position import Perft_table, perft as core_perft
 
 test_cases = [
     ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [1, 20, 400, 8902, 197281], 4),
@@ -19,3 +21,28 @@ def test_search_utils_count_nodes(fen, expected, depth):
     for i in range(depth + 1):
         val = search_utils.count_nodes(board, i)
         assert val == expected[i]
+
+
+deep_cases = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 5, 4865609),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 4, 4085603),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 6, 11030083),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1 ", 5, 15833292),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8 ", 4, 2103487),
+    ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10 ", 4, 3894594)
+]
+
+
+@pytest.mark.parametrize("fen, depth, expected", deep_cases)
+def test_perft_engine(fen, depth, expected):
+    board = Board(fen)
+    assert perft.run_perft(board, depth, workers=1) == expected
+    assert core_perft(board, depth, Perft_table(4)) == expected
+
+
+def test_perft_divide_with_processes():
+    board = Board(deep_cases[1][0])
+    counts = perft.divide(board, 3, workers=2, hash_size=1)
+    assert len(counts) == 48
+    assert sum(counts.values()) == 97862
+    assert counts == perft.divide(board, 3, workers=1, hash_size=0)
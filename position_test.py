@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+import core
+import evaluation_utils
+from core import Board
+from core.position import perft, parallel_perft, legal_moves, pesto_evaluate, parallel_evaluate, pack_boards, batch_evaluate
+from perft_test import test_cases
+
+
+@pytest.mark.parametrize("fen, expected, depth", test_cases)
+def test_position_perft(fen, expected, depth):
+    board = Board(fen)
+    for i in range(depth + 1):
+        assert perft(board, i) == expected[i]
+    assert parallel_perft(board, depth, threads=2) == expected[depth]
+    assert board.export_to_fen() == Board(fen).export_to_fen()
+
+
+def reference_evaluation(board):
+    mg_score, eg_score, phase = 0, 0, 0
+    for is_white, sign, offset in ((True, 1, 0), (False, -1, 1)):
+        for piece, cells in enumerate(board.get_pieces_dict(is_white)):
+            for cell in cells:
+                mg_score += sign * evaluation_utils.mg_table[piece * 2 + offset][cell]
+                eg_score += sign * evaluation_utils.eg_table[piece * 2 + offset][cell]
+                phase += evaluation_utils.phase_indicator[piece]
+    if not board.is_white:
+        mg_score, eg_score = -mg_score, -eg_score
+    phase = min(phase, 24)
+    return (mg_score * phase + eg_score * (24 - phase)) / 24
+
+
+def test_position_moves_and_evaluation():
+    random.seed(5)
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    buffer = core.Move_buffer()
+    boards = []
+    for _ in range(40):
+        core.core_utils.generate_moves(board, buffer)
+        moves = legal_moves(board)
+        assert sorted(moves) == sorted(buffer.get_moves())
+        if not moves:
+            break
+        core.core_utils.make_packed_move(board, random.choice(moves))
+        assert pesto_evaluate(board) == pytest.approx(reference_evaluation(board))
+        boards.append(board.copy())
+
+    assert parallel_evaluate(boards, threads=3) == [pesto_evaluate(board) for board in boards]
+
+    evaluation_utils.evaluation_table.clear()
+    expected = [evaluation_utils.evaluate(board) for board in boards]
+    assert list(evaluation_utils.evaluate_fens([board.export_to_fen() for board in boards])) == pytest.approx(expected)
+    assert list(batch_evaluate(*pack_boards(boards), threads=2)) == pytest.approx(expected)
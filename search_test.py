@@ -0,0 +1,189 @@
+import time
+
+import pytest
+
+import core
+import evaluation_utils
+import search_utils
+from core import Board
+from core.move_ordering import static_exchange_evaluation, capture_value
+
+
+def legal_moves(board):
+    moves = []
+    pieces = board.get_pieces_dict(board.is_white)
+    for piece in range(6):
+        for cell in pieces[piece]:
+            moves += core.core_utils.get_all_legal_moves(board, cell, piece, board.is_white)
+    return [(move.cell, move.target, move.promotion) for move in moves]
+
+
+def test_search_move_parallel_returns_legal_move():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    fen = board.export_to_fen()
+    move = search_utils.search_move_parallel(board, time_limit=0.5, min_depth=1, workers=2, table_size=1)
+    assert (move.cell, move.target, move.promotion) in legal_moves(board)
+    assert board.export_to_fen() == fen
+    assert search_utils.shared_table.get_entry(board.zobrist_key) is not None
+
+    # The helpers stop with the calling process instead of being waited for.
+    start = time.time()
+    search_utils.search_move_parallel(board, min_depth=1, workers=3, table_size=1,
+                                      limits=search_utils.Search_limits(movetime=0.3))
+    assert time.time() - start < 0.6
+    assert board.export_to_fen() == fen
+    search_utils.release_shared_table()
+
+
+def test_move_ordering():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    ordering = core.Move_ordering()
+    buffer = core.Move_buffer()
+    core.core_utils.generate_moves(board, buffer)
+    moves = buffer.get_moves()
+    quiets = [move for move in moves if ordering.is_quiet(board, move)]
+    table_move, killer = quiets[-1], quiets[-2]
+
+    ordering.store_cutoff(board, killer, 3, 4, 0)
+    ordering.sort_moves(board, buffer, table_move, 3)
+    ordered = buffer.get_moves()
+    exchanges = [static_exchange_evaluation(board, move) for move in moves if not ordering.is_quiet(board, move)]
+    captures = sum(exchange >= 0 for exchange in exchanges)
+    losing = sorted((exchange for exchange in exchanges if exchange < 0), reverse=True)
+    assert losing
+    assert sorted(ordered) == sorted(moves)
+    assert ordered[0] == table_move
+    assert all(static_exchange_evaluation(board, move) >= 0 for move in ordered[1:captures + 1])
+    assert ordered[captures + 1] == killer
+    # The captures which lose material come after the killers, the smallest loss first.
+    assert [static_exchange_evaluation(board, move) for move in
+            ordered[captures + 2:captures + 2 + len(losing)]] == losing
+    # The most valuable victims are captured first.
+    victims = [evaluation_utils.middle_game_value[board.get_cell_type((move >> 6) & 63)] for move in
+               ordered[1:captures + 1]]
+    assert victims == sorted(victims, reverse=True)
+
+    search_utils.move_ordering.clear()
+    search_utils.search_table.clear()
+    search_utils.search_position(board, 2, float("-inf"), float("inf"))
+    assert search_utils.move_ordering.cutoffs > 0
+    assert 0 < search_utils.move_ordering.first_move_cutoff_rate() <= 1
+
+
+def cell(name):
+    return (int(name[1]) - 1) * 8 + ord(name[0]) - ord("a")
+
+
+@pytest.mark.parametrize("fen, origin, target, exchange, captured", [
+    ("4k3/8/8/3p4/8/8/8/3QK3 w - - 0 1", "d1", "d5", 100, 100),
+    ("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1", "d1", "d5", -800, 100),
+    ("4k3/8/2p5/3p4/4P3/8/8/4K3 w - - 0 1", "e4", "d5", 0, 100),
+    # The rook behind the first one joins the exchange.
+    ("3rk3/8/8/3p4/8/8/3R4/3RK3 w - - 0 1", "d2", "d5", 100, 100),
+    ("3rk3/3r4/8/3p4/8/8/3R4/3RK3 w - - 0 1", "d2", "d5", -400, 100),
+    # The king can't recapture a defended piece.
+    ("8/8/2k5/3p4/4K3/8/8/3R4 w - - 0 1", "d1", "d5", 100, 100),
+    # A quiet move to an attacked cell loses the piece.
+    ("4k3/8/8/3p4/8/4K3/3R4/8 b - - 0 1", "d5", "d4", -100, 0),
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5", "d6", 100, 100),
+])
+def test_static_exchange_evaluation(fen, origin, target, exchange, captured):
+    board = Board(fen)
+    move = cell(origin) | cell(target) << 6 | 6 << 12
+    assert static_exchange_evaluation(board, move) == exchange
+    assert capture_value(board, move) == captured
+
+
+def test_null_move_and_search_toggles(monkeypatch):
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    fen, key = board.export_to_fen(), board.zobrist_key
+    core.core_utils.make_null_move(board)
+    assert not board.is_white and board.zobrist_key == Board(board.export_to_fen()).zobrist_key
+    core.core_utils.undo_null_move(board)
+    assert board.export_to_fen() == fen and board.zobrist_key == key
+    assert not core.core_utils.has_non_pawn_material(Board("8/8/8/8/8/8/P7/K6k w - - 0 1"), True)
+
+    # After 1. Nf3 Nf6 2. Ng1 Ng8, passing twice around Nf6 reaches the position after 2. Ng1, which isn't a repetition.
+    game = Board("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    for cell, target in ((6, 21), (62, 45), (21, 6), (45, 62)):
+        core.core_utils.make_move(game, core.Move(cell, target))
+    history = len(game.repetition_table)
+    core.core_utils.make_null_move(game)
+    core.core_utils.make_move(game, core.Move(62, 45))
+    core.core_utils.make_null_move(game)
+    assert game.repetition_table.get_entry(game.zobrist_key) == 1
+    assert game.repetition_table.get_entry(game.zobrist_key, game.count) == 0
+    core.core_utils.undo_null_move(game)
+    core.core_utils.undo_move(game, core.Move(62, 45))
+    core.core_utils.undo_null_move(game)
+    assert len(game.repetition_table) == history and game.count == 5
+
+    scores = []
+    for enabled in (True, False):
+        monkeypatch.setattr(search_utils, "use_pvs", enabled)
+        monkeypatch.setattr(search_utils, "use_null_move", enabled)
+        monkeypatch.setattr(search_utils, "use_late_move_reductions", enabled)
+        search_utils.search_table.clear()
+        search_utils.move_ordering.clear()
+        scores.append(search_utils.search_position(board, 3, float("-inf"), float("inf")))
+        assert board.export_to_fen() == fen
+    assert all(abs(score) < 10000 for score in scores)
+
+
+def test_search_limits():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    fen = board.export_to_fen()
+    search_utils.search_table.clear()
+
+    move, _, depth = search_utils.iterative_deepening(board, search_utils.Search_limits(depth=2))
+    assert depth == 2 and move != 0
+
+    start = time.time()
+    move, _, depth = search_utils.iterative_deepening(board, search_utils.Search_limits(movetime=0.3), min_depth=1)
+    assert time.time() - start < 0.45
+    assert move != 0 and board.export_to_fen() == fen
+
+    search_utils.search_table.clear()
+    search_utils.iterative_deepening(board, search_utils.Search_limits(nodes=3000))
+    assert search_utils.search_nodes < 3000 + search_utils.check_interval
+    assert board.export_to_fen() == fen
+
+    # The limits are removed at the end, so later searches aren't stopped.
+    assert not search_utils.search_aborted
+    assert search_utils.search_position(board, 2, float("-inf"), float("inf")) != 0
+    assert search_utils.Search_limits(time_left=60, increment=1, moves_to_go=20).time_budget() == pytest.approx(3.8)
+
+
+@pytest.mark.parametrize("limits", [search_utils.Search_limits(depth=3), search_utils.Search_limits(nodes=100000),
+                                    search_utils.Search_limits(movetime=3)])
+def test_search_stops_on_mate(limits):
+    # Ra8 mates, the infinite value is exact so the search ends after the iteration which finds it.
+    board = Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    search_utils.search_table.clear()
+    start = time.time()
+    move, value, depth = search_utils.iterative_deepening(board, limits)
+    assert time.time() - start < 1
+    assert move == cell("a1") | cell("a8") << 6
+    assert value == float("inf") and depth >= 1
+    assert search_utils.search_stats is not None and search_utils.search_stats.depth == depth
+
+
+def test_search_stats():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    iterations = []
+    move, stats = search_utils.search_move_with_stats(board, min_depth=1, limits=search_utils.Search_limits(depth=3),
+                                                      callback=iterations.append)
+    assert [iteration.depth for iteration in iterations] == [1, 2, 3]
+    assert stats is iterations[-1]
+    assert core.decode_move(stats.best_move) == move
+    assert iterations[0].branching_factor is None
+    assert all(iteration.branching_factor > 0 for iteration in iterations[1:])
+    assert all(first.nodes < second.nodes for first, second in zip(iterations, iterations[1:]))
+    assert 0 < stats.qnodes < stats.nodes and stats.nps > 0 and stats.elapsed > 0
+    assert 0 < stats.table_hits <= stats.table_probes
+    assert 0 < stats.first_move_cutoffs <= stats.cutoffs
+    assert str(stats).startswith("depth 3 ")
+
+    # A search which completes no iteration has no statistics.
+    board = Board("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3")
+    assert search_utils.search_move_with_stats(board, limits=search_utils.Search_limits(depth=2))[1] is None
@@ -1,10 +1,231 @@
+import atexit
+import math
+import multiprocessing
+import os
+import queue
 import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
 import core
 from core import Board
-from core import Transposition_table
+from core import Transposition_table, Repetition_table
+from core import Move_ordering
+from core.move_ordering import static_exchange_evaluation, capture_value
 import evaluation_utils
+from UCI import convert_move_to_uci
+
+search_table = Transposition_table(64)
+# The killer moves, the history and the cutoff counters of the search.
+move_ordering = Move_ordering()
+# The search techniques can be turned off to compare the node counts and the time to reach a depth.
+use_pvs = True
+use_null_move = True
+use_late_move_reductions = True
+# The depth the null move search is reduced by.
+null_move_reduction = 2
+# Quiet moves are reduced from this depth and from this place in the move order.
+reduction_min_depth = 3
+reduction_min_index = 3
+# The quiescence search skips the captures which lose material by the static exchange evaluation, and the captures
+# which can't raise alpha even with this margin over the captured material.
+use_see_pruning = True
+use_delta_pruning = True
+delta_margin = 200
+# The half width of the aspiration windows of the iterations after the first.
+aspiration_window = 50
+# The state of the running search, the limits are checked every check_interval nodes.
+check_interval = 1024
+search_nodes = 0
+search_qnodes = 0
+search_table_cutoffs = 0
+search_start = 0.0
+search_deadline = None
+search_node_limit = None
+search_aborted = False
+# An event which stops the search of a helper process of the parallel search when it is set, and the time in seconds
+# the helpers are given to send their results after it.
+search_stop_event = None
+helper_stop_timeout = 0.5
+# The statistics of the last iteration the last search completed, None if it completed none.
+search_stats = None
+# The moves a clock is split over when the moves until the next time control aren't known,
+# and the time in seconds which is kept on the clock.
+default_moves_to_go = 30
+clock_margin = 0.05
+shared_table = None
+shared_table_memory = None
+# One move buffer for every ply so generating moves deeper in the tree doesn't overwrite the moves being searched.
+move_buffers = []
+
+
+class Search_limits:
+    """
+    This class holds the limits of a search, the search stops at the first limit it reaches
+    """
+
+    def __init__(self, movetime: Optional[float] = None, depth: Optional[int] = None, nodes: Optional[int] = None,
+                 time_left: Optional[float] = None, increment: float = 0, moves_to_go: Optional[int] = None):
+        """ Initialize the limits, a limit which is None doesn't stop the search.
+
+        :param movetime: The time of the search in seconds
+        :param depth: The deepest iteration
+        :param nodes: The amount of nodes
+        :param time_left: The time left on the clock of the player to move in seconds
+        :param increment: The time added to the clock after every move in seconds
+        :param moves_to_go: The amount of moves until the next time control, used with the clock
+        """
+        self.movetime = movetime
+        self.depth = depth
+        self.nodes = nodes
+        self.time_left = time_left
+        self.increment = increment
+        self.moves_to_go = moves_to_go
+
+    def time_budget(self) -> Optional[float]:
+        """
+        :return: The time the search may take in seconds, None if it isn't limited by time
+        """
+        if self.movetime is not None:
+            return self.movetime
+        if self.time_left is None:
+            return None
+        # The clock is split over the moves left, but a move never takes the time which keeps the clock from running out.
+        budget = self.time_left / (self.moves_to_go or default_moves_to_go) + self.increment * 0.8
+        return max(min(budget, self.time_left - clock_margin), 0.01)
+
+    def should_stop(self, elapsed: float) -> bool:
+        """ Returns whether a new iteration shouldn't start, with a clock one which started after half of the budget
+        would rarely end in time.
+
+        :param elapsed: The time since the search started in seconds
+        :return: Whether to stop the search
+        """
+        budget = self.time_budget()
+        if budget is None:
+            return False
+        return elapsed >= (budget if self.movetime is not None else budget / 2)
+
+
+class Search_stats:
+    """
+    This class holds the statistics of a search up to the end of one of its iterations
+    """
+
+    def __init__(self, depth: int, score: float, best_move: int, elapsed: float, nodes: int, qnodes: int,
+                 table_probes: int, table_hits: int, table_cutoffs: int, cutoffs: int, first_move_cutoffs: int,
+                 branching_factor: Optional[float]):
+        """ Initialize the statistics, the counters are totals since the search started.
+
+        :param depth: The depth of the iteration
+        :param score: The value of the best move
+        :param best_move: The best packed move
+        :param elapsed: The time since the search started in seconds
+        :param nodes: The amount of nodes, including the quiescence nodes
+        :param qnodes: The amount of quiescence nodes
+        :param table_probes: The amount of transposition table lookups
+        :param table_hits: The amount of lookups which found the position
+        :param table_cutoffs: The amount of nodes which returned the value of their table entry
+        :param cutoffs: The amount of beta cutoffs
+        :param first_move_cutoffs: The amount of beta cutoffs caused by the first searched move
+        :param branching_factor: The nodes of the iteration divided by the nodes of the previous one, None for the
+        first iteration
+        """
+        self.depth = depth
+        self.score = score
+        self.best_move = best_move
+        self.elapsed = elapsed
+        self.nodes = nodes
+        self.qnodes = qnodes
+        self.table_probes = table_probes
+        self.table_hits = table_hits
+        self.table_cutoffs = table_cutoffs
+        self.cutoffs = cutoffs
+        self.first_move_cutoffs = first_move_cutoffs
+        self.branching_factor = branching_factor
+
+    @property
+    def nps(self) -> float:
+        """
+        :return: The nodes searched per second
+        """
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """
+        :return: The part of the beta cutoffs which the first searched move caused, 0 if there were none
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs != 0 else 0.0
+
+    @property
+    def table_hit_rate(self) -> float:
+        """
+        :return: The part of the transposition table lookups which found the position, 0 if there were none
+        """
+        return self.table_hits / self.table_probes if self.table_probes != 0 else 0.0
+
+    def __str__(self) -> str:
+        move = convert_move_to_uci(core.decode_move(self.best_move)) if self.best_move != 0 else "none"
+        branching = f"{self.branching_factor:.2f}" if self.branching_factor is not None else "-"
+        return f"depth {self.depth} score {self.score:.1f} move {move} nodes {self.nodes} qnodes {self.qnodes} " \
+               f"nps {self.nps:.0f} time {self.elapsed:.3f} table hits {self.table_hits}/{self.table_probes} " \
+               f"cutoffs {self.table_cutoffs} first move cutoffs {self.first_move_cutoff_rate:.1%} " \
+               f"branching {branching}"
+
+
+def start_search(limits: Search_limits) -> None:
+    """ This method sets the limits which the nodes of the search check and resets the search statistics.
+
+    :param limits: The limits of the search
+    """
+    global search_nodes, search_qnodes, search_table_cutoffs, search_start, search_deadline, search_node_limit, \
+        search_aborted
+    search_nodes = 0
+    search_qnodes = 0
+    search_table_cutoffs = 0
+    search_table.reset_stats()
+    move_ordering.reset_stats()
+    search_start = time.time()
+    budget = limits.time_budget()
+    search_deadline = None if budget is None else search_start + budget
+    search_node_limit = limits.nodes
+    search_aborted = False
+
+
+def stop_search() -> None:
+    """
+    This method removes the limits of the search, so searches without limits can run.
+    """
+    global search_deadline, search_node_limit, search_aborted
+    search_deadline = None
+    search_node_limit = None
+    search_aborted = False
 
-search_table = Transposition_table(0x8000000)
+
+def count_node() -> bool:
+    """ This method counts a node of the search and checks the limits every check_interval nodes.
+
+    :return: Whether the search was stopped by a limit, the nodes then return at once and their moves are undone
+    """
+    global search_nodes, search_aborted
+    search_nodes += 1
+    if search_nodes % check_interval == 0 and not search_aborted:
+        search_aborted = (search_deadline is not None and time.time() >= search_deadline) or \
+                         (search_node_limit is not None and search_nodes >= search_node_limit) or \
+                         (search_stop_event is not None and search_stop_event.is_set())
+    return search_aborted
+
+
+def get_move_buffer(ply: int) -> core.Move_buffer:
+    """ Returns the move buffer of a certain ply, the buffers are allocated on first use.
+
+    :param ply: The distance from the root of the search
+    :return: The move buffer of the ply
+    """
+    while len(move_buffers) <= ply:
+        move_buffers.append(core.Move_buffer())
+    return move_buffers[ply]
 
 
 def count_nodes(gboard: Board, depth: int) -> int:
@@ -18,43 +239,49 @@ def count_nodes(gboard: Board, depth: int) -> int:
         return 1
     sum_options = 0
 
-    piece_dict = gboard.get_pieces_dict(gboard.is_white)
-    moves = []
-    for piece in gboard.pieces_dict.values():
-        for cell in piece_dict[piece]:
-            moves += core.core_utils.get_all_legal_moves(gboard, cell, piece, gboard.is_white)
-
-    for move in moves:
-        core.core_utils.make_move(gboard, move, True)
+    buffer = get_move_buffer(depth)
+    core.core_utils.generate_moves(gboard, buffer)
+    # The leaves are the legal moves themselves, so they aren't made.
+    if depth == 1:
+        return buffer.count
+    for move in buffer.get_moves():
+        core.core_utils.make_packed_move(gboard, move)
         sum_options += count_nodes(gboard, depth - 1)
-        core.core_utils.undo_move(gboard, move)
+        core.core_utils.undo_packed_move(gboard, move)
     return sum_options
 
 
-def quiescence_search(board: Board, depth_limit: int, alpha: float, beta: float) -> float:
-    
-    if core.core_utils.check_stalemate(board) or board.repetition_table.get_entry(board.zobrist_key) >= 3:
+def quiescence_search(board: Board, depth_limit: int, alpha: float, beta: float, root_distance=0) -> float:
+    global search_qnodes
+    if count_node():
+        return 0
+    search_qnodes += 1
+    if core.core_utils.check_stalemate(board) or board.repetition_table.get_entry(board.zobrist_key, board.count) >= 3:
         return 0
 
-    position_eval = evaluation_utils.evaluate(board)
+    static_eval = evaluation_utils.evaluate(board)
 
     if depth_limit == 0:
-        return position_eval
-    if position_eval >= beta:
+        return static_eval
+    if static_eval >= beta:
         return beta
-    if position_eval > alpha:
-        alpha = position_eval
-
-    piece_dict = board.get_pieces_dict(board.is_white)
-    moves = []
-    for piece in board.pieces_dict.values():
-        for cell in piece_dict[piece]:
-            moves += core.core_utils.get_all_legal_captures(board, cell, piece, board.is_white)
-
-    for move in moves:
-        core.core_utils.make_move(board, move, True)
-        position_eval = -quiescence_search(board, depth_limit - 1, -beta, -alpha)
-        core.core_utils.undo_move(board, move)
+    if static_eval > alpha:
+        alpha = static_eval
+
+    delta_pruning = use_delta_pruning and not board.position_in_check
+    buffer = get_move_buffer(root_distance)
+    core.core_utils.generate_moves(board, buffer, core.Generation_mode.CAPTURES)
+    move_ordering.sort_moves(board, buffer, 0, root_distance)
+    for move in buffer.get_moves():
+        if delta_pruning and static_eval + capture_value(board, move) + delta_margin <= alpha:
+            continue
+        if use_see_pruning and static_exchange_evaluation(board, move) < 0:
+            continue
+        core.core_utils.make_packed_move(board, move)
+        position_eval = -quiescence_search(board, depth_limit - 1, -beta, -alpha, root_distance + 1)
+        core.core_utils.undo_packed_move(board, move)
+        if search_aborted:
+            return 0
         if position_eval >= beta:
             return beta
         if position_eval > alpha:
@@ -63,27 +290,50 @@ def quiescence_search(board: Board, depth_limit: int, alpha: float, beta: float)
     return alpha
 
 
-def search_position(board: Board, depth: int, alpha: float, beta: float, root_distance=0) -> float:
-    """ This method uses alpha beta pruning to estimate how well is the position looking to a certain depth.
+def late_move_reduction(depth: int, index: int, quiet: bool, in_check: bool, gives_check: bool) -> int:
+    """ This method returns how much shallower a move is searched first, the moves ordered late are rarely the best.
+
+    :param depth: The depth of the node
+    :param index: The place of the move in the order
+    :param quiet: Whether the move is neither a capture nor a promotion
+    :param in_check: Whether the player to move is in check
+    :param gives_check: Whether the move checks the enemy king
+    :return: The reduction of the depth
+    """
+    if not use_late_move_reductions or not quiet or in_check or gives_check:
+        return 0
+    if depth < reduction_min_depth or index < reduction_min_index:
+        return 0
+    return 1 if index < 2 * reduction_min_index + 2 else 2
+
+
+def search_position(board: Board, depth: int, alpha: float, beta: float, root_distance=0, allow_null=True) -> float:
+    """ This method uses principal variation search, alpha beta pruning in which every move after the first is
+    searched with a zero window and searched again only if it raises alpha, to estimate how well is the position
+    looking to a certain depth. Null move pruning and late move reductions cut the tree further.
 
     :param board: The position
     :param depth: The depth to which we look
     :param alpha: The alpha value
     :param beta: The beta value
     :param root_distance: The depth we already reached
+    :param allow_null: Whether a null move may be tried, it is False right after one
     :return: The estimate of the position
     """
-    global search_table
+    global search_table, search_table_cutoffs
+    if count_node():
+        return 0
     entry = search_table.get_entry(board.zobrist_key)
     valid = (entry is not None) and (entry.is_white == board.is_white)
     alpha_origin = alpha
 
-    if core.core_utils.check_stalemate(board) or board.repetition_table.get_entry(board.zobrist_key) >= 3:
+    if core.core_utils.check_stalemate(board) or board.repetition_table.get_entry(board.zobrist_key, board.count) >= 3:
         return 0
 
     if valid and entry.zobrist_key == board.zobrist_key and entry.depth >= depth:
         score = entry.score
         if entry.node_type == 0:
+            search_table_cutoffs += 1
             return score
         if entry.node_type == 1:
             alpha = max(score, alpha)
@@ -91,32 +341,58 @@ def search_position(board: Board, depth: int, alpha: float, beta: float, root_di
             beta = min(beta, score)
 
         if alpha >= beta:
+            search_table_cutoffs += 1
             return beta
 
     if depth <= 0:
-        return quiescence_search(board, 4, alpha, beta)
+        return quiescence_search(board, 4, alpha, beta, root_distance)
+
+    in_check = board.position_in_check
+    # If passing the turn still fails high the position is good enough to cut, unless passing is the best move,
+    # which happens when the player has only pawns.
+    if use_null_move and allow_null and not in_check and depth > null_move_reduction and not math.isinf(beta) and \
+            core.core_utils.has_non_pawn_material(board, board.is_white) and evaluation_utils.evaluate(board) >= beta:
+        core.core_utils.make_null_move(board)
+        score = -search_position(board, depth - 1 - null_move_reduction, -beta, -beta + 1, root_distance + 1, False)
+        core.core_utils.undo_null_move(board)
+        if search_aborted:
+            return 0
+        if score >= beta:
+            return beta
 
-    piece_dict = board.get_pieces_dict(board.is_white)
-    moves = []
-    for piece in board.pieces_dict.values():
-        for cell in piece_dict[piece]:
-            moves += core.core_utils.get_all_legal_moves(board, cell, piece, board.is_white)
+    buffer = get_move_buffer(root_distance)
+    core.core_utils.generate_moves(board, buffer)
 
-    if not moves:
+    if buffer.count == 0:
         if board.position_in_check:
             return float('-inf') + root_distance
         return 0
 
-    moves.sort(key=lambda m: evaluation_utils.move_prediction(board, m), reverse=True)
+    # The best move of an earlier search of the position is tried first.
+    move_ordering.sort_moves(board, buffer, entry.best if valid else 0, root_distance)
+    moves = buffer.get_moves()
 
-    best_move = None
-    for move in moves:
-        core.core_utils.make_move(board, move, True)
+    best_move = 0
+    for index, move in enumerate(moves):
+        quiet = move_ordering.is_quiet(board, move)
+        core.core_utils.make_packed_move(board, move)
         extra = 1 if board.position_in_check else 0
-        score = -search_position(board, depth - 1 + extra, -beta, -alpha, root_distance + 1)
-        core.core_utils.undo_move(board, move)
+        if index == 0 or math.isinf(alpha):
+            score = -search_position(board, depth - 1 + extra, -beta, -alpha, root_distance + 1)
+        else:
+            reduction = late_move_reduction(depth, index, quiet, in_check, extra == 1)
+            lower = -alpha - 1 if use_pvs else -beta
+            score = -search_position(board, depth - 1 + extra - reduction, lower, -alpha, root_distance + 1)
+            if reduction > 0 and score > alpha:
+                score = -search_position(board, depth - 1 + extra, lower, -alpha, root_distance + 1)
+            if use_pvs and alpha < score < beta:
+                score = -search_position(board, depth - 1 + extra, -beta, -alpha, root_distance + 1)
+        core.core_utils.undo_packed_move(board, move)
+        if search_aborted:
+            return 0
 
         if score >= beta:
+            move_ordering.store_cutoff(board, move, root_distance, depth, index)
             search_table.store_entry(board.zobrist_key, beta, depth, 1, move, board.is_white)
             return beta
 
@@ -130,53 +406,292 @@ def search_position(board: Board, depth: int, alpha: float, beta: float, root_di
     return alpha
 
 
-def search_move(board: Board, time_limit=4, min_depth=3) -> core.Move:
+def search_root(board: Board, moves: list, depth: int, alpha: float, beta: float) -> Tuple[int, float, dict]:
+    """ This method searches the root moves to a certain depth inside a window.
+
+    :param board: The position in which we search
+    :param moves: The packed root moves in the order they are searched
+    :param depth: The depth of the search
+    :param alpha: The lower bound of the window
+    :param beta: The upper bound of the window
+    :return: The best packed move, its value and the value of every searched move, the value is alpha or less if
+    no move raised alpha and beta or more if a move failed high
+    """
+    best_move, best_val = moves[0], float("-inf")
+    moves_values = {}
+    for move in moves:
+        core.core_utils.make_packed_move(board, move)
+        val = -search_position(board, depth - 1, -beta, -max(alpha, best_val))
+        core.core_utils.undo_packed_move(board, move)
+        if search_aborted:
+            break
+
+        moves_values[move] = val
+        if val > best_val:
+            best_move, best_val = move, val
+        if best_val >= beta:
+            break
+    return best_move, best_val, moves_values
+
+
+def iteration_stats(depth: int, score: float, best_move: int, branching_factor: Optional[float]) -> Search_stats:
+    """
+    :param depth: The depth of the iteration
+    :param score: The value of the best move
+    :param best_move: The best packed move
+    :param branching_factor: The nodes of the iteration divided by the nodes of the previous one
+    :return: The statistics of the running search at the end of an iteration
+    """
+    return Search_stats(depth, score, best_move, time.time() - search_start, search_nodes, search_qnodes,
+                        search_table.probes, search_table.hits, search_table_cutoffs, move_ordering.cutoffs,
+                        move_ordering.first_move_cutoffs, branching_factor)
+
+
+def iterative_deepening(board: Board, limits: Search_limits, min_depth: int = 1,
+                        callback: Optional[Callable[[Search_stats], None]] = None) -> Tuple[int, float, int]:
+    """ This method searches the root moves with increasing depth until a limit is reached.
+    Every iteration after the first searches inside an aspiration window around the value of the previous one,
+    and the window is opened when the value falls outside of it.
+    The statistics of every completed iteration are kept in search_stats and passed to the callback.
+
+    :param board: The position in which we search
+    :param limits: The limits of the search
+    :param min_depth: The depth of the first iteration
+    :param callback: Called with the statistics of every iteration which was searched to the end
+    :return: The best packed move (0 if there is none), its value and the last depth that was searched to the end,
+    an iteration which was stopped by a limit doesn't count.
+    """
+    global search_table, search_stats
+    best_val = float("-inf")
+    search_stats = None
+
+    # The root moves are kept until the search ends, so they get a buffer of their own.
+    buffer = core.Move_buffer()
+    core.core_utils.generate_moves(board, buffer)
+    if buffer.count == 0:
+        return 0, best_val, 0
+
+    entry = search_table.get_entry(board.zobrist_key)
+    move_ordering.sort_moves(board, buffer, entry.best if entry is not None and entry.is_white == board.is_white else 0)
+    moves = buffer.get_moves()
+    best_move = moves[0]
+    completed_depth = 0
+    depth = max(min_depth, 1)
+    alpha, beta = float("-inf"), float("inf")
+
+    start_search(limits)
+    iteration_start, previous_nodes = 0, 0
+    try:
+        while limits.depth is None or depth <= limits.depth:
+            move, val, moves_values = search_root(board, moves, depth, alpha, beta)
+            if search_aborted:
+                break
+
+            # The value is only a bound when it falls outside of the window, the side it fell out of is opened.
+            # A side which is already open can't be passed, so the value is exact, e.g. a mate.
+            if (val <= alpha and not math.isinf(alpha)) or (val >= beta and not math.isinf(beta)):
+                alpha = float("-inf") if val <= alpha else alpha
+                beta = float("inf") if val >= beta else beta
+                continue
+
+            best_move, best_val, completed_depth = move, val, depth
+            search_table.store_entry(board.zobrist_key, best_val, depth, 0, best_move, board.is_white)
+            # The nodes of an iteration include the searches whose value fell outside of the window.
+            nodes = search_nodes - iteration_start
+            branching_factor = nodes / previous_nodes if previous_nodes != 0 else None
+            search_stats = iteration_stats(depth, best_val, best_move, branching_factor)
+            iteration_start, previous_nodes = search_nodes, nodes
+            if callback is not None:
+                callback(search_stats)
+            if math.isinf(best_val) or limits.should_stop(time.time() - search_start):
+                break
+
+            moves.sort(key=lambda m: moves_values.get(m, float("-inf")), reverse=True)
+            alpha, beta = best_val - aspiration_window, best_val + aspiration_window
+            depth += 1
+    finally:
+        stop_search()
+
+    return best_move, best_val, completed_depth
+
+
+def search_move(board: Board, time_limit=4, min_depth=3, limits: Optional[Search_limits] = None,
+                callback: Optional[Callable[[Search_stats], None]] = None) -> core.Move:
     """ This method returns the best move by searching to a certain depth
 
     :param board: The position in which we search
-    :param time_limit: The time allocated for the search in the position
+    :param time_limit: The time allocated for the search in the position, used if no limits are given
     :param min_depth: The minimal depth of the search
+    :param limits: The limits of the search
+    :param callback: Called with the statistics of every iteration which was searched to the end
     :return: The move which according to the evaluate metric is the best.
     """
-    moves_values = {}
-    start_time = time.time()
-    best_val = float("-inf")
+    return search_move_with_stats(board, time_limit, min_depth, limits, callback)[0]
+
+
+def search_move_with_stats(board: Board, time_limit=4, min_depth=3, limits: Optional[Search_limits] = None,
+                           callback: Optional[Callable[[Search_stats], None]] = None) \
+        -> Tuple[core.Move, Optional[Search_stats]]:
+    """ This method returns the best move by searching to a certain depth, with the statistics of the search.
+
+    :param board: The position in which we search
+    :param time_limit: The time allocated for the search in the position, used if no limits are given
+    :param min_depth: The minimal depth of the search
+    :param limits: The limits of the search
+    :param callback: Called with the statistics of every iteration which was searched to the end
+    :return: The move which according to the evaluate metric is the best and the statistics of the last completed
+    iteration, None if no iteration was completed
+    """
     global search_table
+    search_table.new_search()
+    move_ordering.new_search()
+    limits = limits or Search_limits(movetime=time_limit)
+    best_move = iterative_deepening(board, limits, min_depth, callback)[0]
+    return core.decode_move(best_move), search_stats
 
-    piece_dict = board.get_pieces_dict(board.is_white)
-    moves = []
 
-    for piece in board.pieces_dict.values():
-        for cell in piece_dict[piece]:
-            moves += core.core_utils.get_all_legal_moves(board, cell, piece, board.is_white)
+def get_shared_table(size_in_MB: int) -> Transposition_table:
+    """ This method returns a transposition table in shared memory, it is created on first use and then reused.
 
-    if not moves:
-        return None
+    :param size_in_MB: The size of the table
+    :return: The shared transposition table
+    """
+    global shared_table, shared_table_memory
+    if shared_table is None or shared_table.size_in_MB != size_in_MB:
+        release_shared_table()
+        shared_table_memory = shared_memory.SharedMemory(create=True, size=size_in_MB * 1024 * 1024)
+        shared_table = Transposition_table(size_in_MB, shared_table_memory.buf)
+    return shared_table
 
-    moves.sort(key=lambda m: evaluation_utils.move_prediction(board, m), reverse=True)
-    best_move = moves[0]
-    depth = min_depth
 
-    while (time.time() - start_time) < time_limit:
-        for move in moves:
-            core.core_utils.make_move(board, move, True)
-            val = -search_position(board, depth - 1, float("-inf"), -best_val)
-            core.core_utils.undo_move(board, move)
+def release_shared_table() -> None:
+    """
+    This method frees the shared memory of the shared transposition table.
+    """
+    global shared_table, shared_table_memory
+    # The table holds the memory's buffer, so it has to be detached before the memory is closed.
+    if shared_table is not None:
+        shared_table.resize(shared_table.size_in_MB)
+        shared_table = None
+    if shared_table_memory is not None:
+        shared_table_memory.close()
+        shared_table_memory.unlink()
+        shared_table_memory = None
+
+
+def parallel_search_worker(fen: str, count: int, keys: list, memory_name: str, size_in_MB: int, generation: int,
+                           limits: Search_limits, min_depth: int, results, stop) -> None:
+    """ This is the entry point of a helper process in the parallel search.
+
+    :param fen: The position in which we search
+    :param count: The moves count of the position
+    :param keys: The zobrist keys of the positions of the game, so the helper sees the repetitions
+    :param memory_name: The name of the shared memory of the transposition table
+    :param size_in_MB: The size of the shared transposition table
+    :param generation: The generation of the current search in the shared table
+    :param limits: The limits of the search
+    :param min_depth: The depth of the first iteration
+    :param results: Queue to which the depth, the value and the best packed move of every completed iteration are put,
+    and None when the helper is done
+    :param stop: Event which is set when the calling process stops searching
+    """
+    global search_table, search_stop_event
+    memory = shared_memory.SharedMemory(name=memory_name)
+    search_table = Transposition_table(size_in_MB, memory.buf)
+    search_table.generation = generation
+    search_stop_event = stop
 
-            moves_values[move] = val
-            if val > best_val:
-                best_move = move
-                best_val = val
+    board = Board(fen)
+    board.count = count
+    board.repetition_table = Repetition_table(len(keys))
+    for key in keys:
+        board.repetition_table.push(key)
 
-            if best_val == float("inf"):
-                return best_move
+    iterative_deepening(board, limits, min_depth,
+                        lambda stats: results.put((stats.depth, stats.score, stats.best_move)))
+    results.put(None)
 
-            if time.time() - start_time >= time_limit:
-                search_table.store_entry(board.zobrist_key, best_val, depth, 1, move, board.is_white)
-                return best_move
+    search_table = None
+    memory.close()
 
-        moves.sort(key=lambda m: moves_values[m], reverse=True)
-        depth += 1
 
-    search_table.store_entry(board.zobrist_key, best_val, depth, 0, best_move, board.is_white)
-    return best_move
+def search_move_parallel(board: Board, time_limit=4, min_depth=3, workers=None, table_size=64,
+                         limits: Optional[Search_limits] = None,
+                         callback: Optional[Callable[[Search_stats], None]] = None) -> core.Move:
+    """ This method searches the position with several processes that share one transposition table (lazy SMP).
+    The processes search the same root with staggered depths and the deepest result is chosen.
+
+    :param board: The position in which we search
+    :param time_limit: The time allocated for the search in the position, used if no limits are given
+    :param min_depth: The minimal depth of the search
+    :param workers: The amount of processes, including the calling one. Defaults to the amount of cores
+    :param table_size: The size of the shared transposition table in megabytes
+    :param limits: The limits of the search, every process counts its own nodes
+    :param callback: Called with the statistics of every iteration the calling process searched to the end
+    :return: The move which according to the evaluate metric is the best.
+    """
+    global search_table
+    workers = workers or os.cpu_count() or 1
+    table = get_shared_table(table_size)
+    table.new_search()
+    move_ordering.new_search()
+    limits = limits or Search_limits(movetime=time_limit)
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    stop = context.Event()
+    fen = board.export_to_fen()
+    keys = board.repetition_table.get_keys()
+    processes = []
+    for i in range(1, workers):
+        process = context.Process(target=parallel_search_worker, daemon=True,
+                                  args=(fen, board.count, keys, shared_table_memory.name, table_size,
+                                        table.generation, limits, min_depth + (i % 2), results, stop))
+        process.start()
+        processes.append(process)
+
+    # The calling process is the first worker.
+    private_table = search_table
+    search_table = table
+    try:
+        best_move, best_val, best_depth = iterative_deepening(board, limits, min_depth, callback)
+    finally:
+        search_table = private_table
+
+    # The helpers stop with the calling process, each puts None after its last completed iteration. The results are
+    # read before the helpers are joined, a helper which didn't stop in time is terminated.
+    stop.set()
+    deadline = time.time() + helper_stop_timeout
+    finished = 0
+    while finished < len(processes):
+        try:
+            result = results.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            break
+        if result is None:
+            finished += 1
+            continue
+
+        depth, val, move = result
+        if move != 0 and (depth, val) > (best_depth, best_val):
+            best_depth, best_val, best_move = depth, val, move
+
+    for process in processes:
+        process.join(timeout=max(0.0, deadline - time.time()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    # The results a terminated helper sent before it was stopped.
+    while True:
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            break
+        if result is not None and result[2] != 0 and (result[0], result[1]) > (best_depth, best_val):
+            best_depth, best_val, best_move = result
+
+    return core.decode_move(best_move)
+
+
+atexit.register(release_shared_table)
@@ -0,0 +1,216 @@
+import argparse
+import math
+import os
+import time
+from array import array
+from typing import Callable, Iterator, Optional, Tuple
+
+import evaluation_tables
+# The feature cache takes the game phase from the PeSTO tables, which evaluation_utils sets.
+import evaluation_utils
+from core.texel_utils import Feature_set, write_feature_cache, loss_and_gradient, pack_weights, unpack_weights
+
+# The results of a game from the side of white, as they appear in the labelled positions.
+result_tokens = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+def parse_result(token: str) -> Optional[float]:
+    """ This function reads the result of a labelled position.
+
+    :param token: The result as in pgn ("1-0", "0-1" or "1/2-1/2") or as a number between 0 and 1, it can be quoted
+    :return: The result from the side of white, None if the token isn't a result
+    """
+    token = token.strip("\"'[]();,")
+    if token in result_tokens:
+        return result_tokens[token]
+    try:
+        result = float(token)
+    except ValueError:
+        return None
+    return result if 0 <= result <= 1 else None
+
+
+def read_positions(path: str) -> Iterator[Tuple[str, float]]:
+    """ This function streams labelled positions from a file, one position per line.
+    A line holds a fen, at least its placement, player to move, castling and en-passant fields, and the result of
+    the game after it, e.g. the "c9" operation of an epd or a number.
+
+    :param path: The path of the file
+    :return: An iterator of (fen, result) pairs, lines without a result are skipped
+    """
+    with open(path) as positions:
+        for line in positions:
+            fields = line.split()
+            if len(fields) < 5:
+                continue
+            result = None
+            for token in reversed(fields[4:]):
+                result = parse_result(token)
+                if result is not None:
+                    break
+            if result is not None:
+                yield " ".join(fields[:4]), result
+
+
+def load_features(data_path: str, cache_path: Optional[str] = None) -> Feature_set:
+    """ This function maps the feature cache of a file of labelled positions, the cache is built first if it is
+    missing or older than the file.
+
+    :param data_path: The path of the labelled positions
+    :param cache_path: The path of the cache, the data path with a ".features" suffix if None
+    :return: The features of the positions
+    """
+    cache_path = cache_path or data_path + ".features"
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(data_path):
+        write_feature_cache(cache_path, read_positions(data_path))
+    return Feature_set(cache_path)
+
+
+def initial_weights(tables=evaluation_tables) -> array:
+    """
+    :param tables: A module of evaluation weights
+    :return: The weights vector of the module
+    """
+    return pack_weights(tables.middle_game_value, tables.endgame_value, tables.mg_pesto_table, tables.eg_pesto_table,
+                        tables.mobility_weights, tables.mop_up_weights)
+
+
+def fit_scaling(features: Feature_set, weights, threads: Optional[int] = None, low: float = 0.1,
+                high: float = 3.0, iterations: int = 30) -> float:
+    """ This function finds the scaling of the sigmoid which predicts the results best with fixed weights,
+    through a golden section search.
+
+    :param features: The positions
+    :param weights: The weights vector
+    :param threads: The amount of threads, the amount of cores if None
+    :param low: The lowest scaling which is considered
+    :param high: The highest scaling which is considered
+    :param iterations: The amount of steps of the search
+    :return: The scaling with the lowest error
+    """
+    ratio = (math.sqrt(5) - 1) / 2
+
+    def loss(scaling: float) -> float:
+        return loss_and_gradient(features, weights, scaling, threads, False)[0]
+
+    first, second = high - ratio * (high - low), low + ratio * (high - low)
+    first_loss, second_loss = loss(first), loss(second)
+    for _ in range(iterations):
+        if first_loss < second_loss:
+            high, second, second_loss = second, first, first_loss
+            first = high - ratio * (high - low)
+            first_loss = loss(first)
+        else:
+            low, first, first_loss = first, second, second_loss
+            second = low + ratio * (high - low)
+            second_loss = loss(second)
+    return (low + high) / 2
+
+
+def tune(features: Feature_set, weights, scaling: float, epochs: int = 200, learning_rate: float = 1.0,
+         threads: Optional[int] = None, callback: Optional[Callable[[int, float], None]] = None) -> float:
+    """ This function tunes the weights with the Adam gradient descent over all the positions.
+
+    :param features: The positions
+    :param weights: The weights vector, it is updated in place
+    :param scaling: The scaling of the sigmoid
+    :param epochs: The amount of gradient steps
+    :param learning_rate: The size of the steps in centipawns
+    :param threads: The amount of threads, the amount of cores if None
+    :param callback: Called with the epoch and the error before its step
+    :return: The error after the tuning
+    """
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    momentum = [0.0] * len(weights)
+    velocity = [0.0] * len(weights)
+    for epoch in range(1, epochs + 1):
+        loss, gradient = loss_and_gradient(features, weights, scaling, threads)
+        if callback is not None:
+            callback(epoch, loss)
+        for i, value in enumerate(gradient):
+            momentum[i] = beta1 * momentum[i] + (1 - beta1) * value
+            velocity[i] = beta2 * velocity[i] + (1 - beta2) * value * value
+            corrected_momentum = momentum[i] / (1 - beta1 ** epoch)
+            corrected_velocity = velocity[i] / (1 - beta2 ** epoch)
+            weights[i] -= learning_rate * corrected_momentum / (math.sqrt(corrected_velocity) + epsilon)
+    return loss_and_gradient(features, weights, scaling, threads, False)[0]
+
+
+def format_table(name: str, values) -> str:
+    """
+    :param name: The name of the table
+    :param values: The 64 values of the table
+    :return: The table as python source, a rank per line
+    """
+    rows = [", ".join(str(round(value)) for value in values[row * 8:row * 8 + 8]) for row in range(8)]
+    return f"{name} = (\n" + "".join(f"    {row},\n" for row in rows) + ")\n"
+
+
+def export_tables(weights, path: str, tables=evaluation_tables) -> None:
+    """ This function writes a module of evaluation weights in the format of evaluation_tables.
+
+    :param weights: The weights vector
+    :param path: The path of the module
+    :param tables: The module the weights which aren't tuned are taken from
+    """
+    values = unpack_weights(weights)
+    names = ("pawn", "queen", "bishop", "knight", "rook", "king")
+    lines = [
+        "# The weights of the evaluation, tuned by texel.py.\n",
+        f"middle_game_value = {tuple(round(value) for value in values['middle_game_value'])}\n",
+        f"endgame_value = {tuple(round(value) for value in values['endgame_value'])}\n",
+    ]
+    for piece, name in enumerate(names):
+        lines.append("\n" + format_table(f"mg_{name}_table", values["mg_pesto_table"][piece]))
+        lines.append("\n" + format_table(f"eg_{name}_table", values["eg_pesto_table"][piece]))
+    for phase in ("mg", "eg"):
+        lines.append(f"\n{phase}_pesto_table = (\n" + "".join(f"    {phase}_{name}_table,\n" for name in names) + ")\n")
+    lines += [
+        f"\nphase_indicator = {tuple(tables.phase_indicator)}\n",
+        "\n# The weights of the cells attacked by the knights, bishops and rooks.\n",
+        f"mobility_weights = {tuple(round(value, 2) for value in values['mobility_weights'])}\n",
+        "# The weights of the enemy king's distance from the center and of the distance between the kings in the mop up.\n",
+        f"mop_up_weights = {tuple(round(value, 2) for value in values['mop_up_weights'])}\n",
+        "# The part of the attackers' value which counts in the king safety, by the amount of attackers.\n",
+        f"attacker_weight = {tuple(tables.attacker_weight)}\n",
+    ]
+    with open(path, "w") as output:
+        output.write("".join(lines))
+
+
+def main(argv=None) -> None:
+    """ The command line entry point, it tunes the evaluation over a file of labelled positions and exports the
+    tuned weights as a module.
+
+    :param argv: The command line arguments, the ones of the process if None
+    """
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights with the texel method")
+    parser.add_argument("positions", help="A file of fen strings followed by the result of their game")
+    parser.add_argument("--cache", default=None, help="The feature cache, the positions path + .features by default")
+    parser.add_argument("--output", default="tuned_tables.py", help="The module to write the tuned weights to")
+    parser.add_argument("--epochs", type=int, default=200, help="The amount of gradient steps")
+    parser.add_argument("--learning-rate", type=float, default=1.0, help="The size of the steps in centipawns")
+    parser.add_argument("--scaling", type=float, default=None, help="The scaling of the sigmoid, fitted if not given")
+    parser.add_argument("--threads", type=int, default=None, help="The amount of threads, all the cores by default")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    features = load_features(args.positions, args.cache)
+    print(f"Loaded {len(features)} positions in {time.time() - start:.1f}s")
+
+    weights = initial_weights()
+    scaling = args.scaling if args.scaling is not None else fit_scaling(features, weights, args.threads)
+    print(f"Scaling: {scaling:.4f}")
+
+    def report(epoch: int, loss: float) -> None:
+        if epoch == 1 or epoch % 10 == 0:
+            print(f"Epoch {epoch}: error {loss:.6f} ({time.time() - start:.1f}s)")
+
+    loss = tune(features, weights, scaling, args.epochs, args.learning_rate, args.threads, report)
+    print(f"Final error: {loss:.6f}")
+    export_tables(weights, args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import importlib.util
+import random
+
+import pytest
+
+import core
+import evaluation_utils
+import texel
+from core import Board
+from core.texel_utils import loss_and_gradient
+
+
+def write_positions(path, count):
+    random.seed(11)
+    fens = []
+    with open(path, "w") as positions:
+        for _ in range(count):
+            board = Board()
+            for _ in range(random.randint(2, 60)):
+                moves = core.position.legal_moves(board)
+                if not moves:
+                    break
+                core.core_utils.make_packed_move(board, random.choice(moves))
+            fens.append(board.export_to_fen())
+            positions.write(f'{fens[-1]} c9 "{random.choice(["1-0", "0-1", "1/2-1/2"])}";\n')
+    return fens
+
+
+def test_parse_positions(tmp_path):
+    path = tmp_path / "positions.epd"
+    path.write_text("8/8/8/8/8/8/8/K6k w - - 0 1 [0.5]\n"
+                    "8/8/8/8/8/8/8/K6k b - - c9 \"1-0\";\n"
+                    "not a position\n")
+    assert list(texel.read_positions(str(path))) == [("8/8/8/8/8/8/8/K6k w - -", 0.5),
+                                                     ("8/8/8/8/8/8/8/K6k b - -", 1.0)]
+    assert texel.parse_result("0-1") == 0 and texel.parse_result("2") is None
+
+
+def test_features_match_evaluate(tmp_path):
+    fens = write_positions(tmp_path / "positions.epd", 50)
+    features = texel.load_features(str(tmp_path / "positions.epd"))
+    weights = texel.initial_weights()
+    assert len(features) == len(fens)
+
+    for index, fen in enumerate(fens):
+        board = Board(fen)
+        evaluation_utils.evaluation_table.clear()
+        expected = evaluation_utils.evaluate(board) * (1 if board.is_white else -1)
+        assert features.evaluate(weights, index) == pytest.approx(expected)
+
+
+def test_tuning_gradient_and_export(tmp_path):
+    write_positions(tmp_path / "positions.epd", 200)
+    features = texel.load_features(str(tmp_path / "positions.epd"), str(tmp_path / "cache.features"))
+    weights = texel.initial_weights()
+
+    loss, gradient = loss_and_gradient(features, weights, 1.0, threads=3)
+    for index in (0, 12 + 3 * 64 + 27, 396 + 6 * 64 - 5, 781, 784):
+        moved = weights[:]
+        moved[index] += 1e-3
+        assert (loss_and_gradient(features, moved, 1.0)[0] - loss) / 1e-3 == pytest.approx(gradient[index], abs=1e-8)
+
+    assert texel.tune(features, weights, 1.0, epochs=10, threads=2) < loss
+
+    texel.export_tables(weights, str(tmp_path / "tuned_tables.py"))
+    spec = importlib.util.spec_from_file_location("tuned_tables", str(tmp_path / "tuned_tables.py"))
+    tables = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tables)
+    exported = texel.initial_weights(tables)
+    assert list(exported[:780]) == [round(value) for value in weights[:780]]
+    assert tables.phase_indicator == evaluation_utils.phase_indicator
@@ -0,0 +1,123 @@
+import evaluation_utils
+from core import Board, Evaluation_table, Transposition_table, Move, PieceType, decode_move
+
+
+def test_transposition_table_store_and_get():
+    table = Transposition_table(1)
+    key = 0x123456789ABCDEF0
+    assert table.get_entry(key) is None
+
+    move = Move(12, 28)
+    table.store_entry(key, 1.5, 4, 1, move.encode(), True)
+    entry = table.get_entry(key)
+    assert entry.zobrist_key == key
+    assert entry.score == 1.5
+    assert entry.depth == 4
+    assert entry.node_type == 1
+    assert entry.is_white
+    assert decode_move(entry.best) == move
+
+    # A different position should never be mistaken for the stored one.
+    assert table.get_entry(key ^ (1 << 40)) is None
+    assert (table.probes, table.hits) == (3, 1)
+
+    table.reset_stats()
+    assert (table.probes, table.hits) == (0, 0)
+
+
+def test_transposition_table_packed_moves():
+    table = Transposition_table(1)
+    promotion = Move(52, 60)
+    promotion.set_promotion(PieceType.KNIGHT)
+    table.store_entry(1 << 33, 0, 1, 0, promotion.encode(), False)
+    best = decode_move(table.get_entry(1 << 33).best)
+    assert best.promotion == PieceType.KNIGHT and not best.castle
+
+    castle = Move(4, 2)
+    castle.set_castle(False)
+    table.store_entry(1 << 34, 0, 1, 0, castle.encode(), False)
+    best = decode_move(table.get_entry(1 << 34).best)
+    assert best.castle and not best.is_king_side
+
+    table.store_entry(1 << 35, float('-inf'), 2, 2, 0, False)
+    entry = table.get_entry(1 << 35)
+    assert entry.best == 0 and entry.score == float('-inf')
+
+
+def test_transposition_table_depth_preferred_replacement():
+    table = Transposition_table(1)
+    key = 7 << 32
+
+    # A shallow result of the same search must not evict a deeper one.
+    table.store_entry(key, 3, 6, 1, 0, True)
+    table.store_entry(key, 1, 2, 2, 0, True)
+    assert table.get_entry(key).depth == 6
+
+    # Once the entry is from a previous search it is replaced.
+    table.new_search()
+    table.store_entry(key, 1, 2, 2, 0, True)
+    assert table.get_entry(key).depth == 2
+
+
+def test_transposition_table_bucket_keeps_deep_entries():
+    table = Transposition_table(1)
+    num_buckets = (1024 * 1024) // 64
+    keys = [(i << 32) + (i * num_buckets) for i in range(1, 5)]
+    for key in keys:
+        table.store_entry(key, 0, 10, 0, 0, True)
+
+    # The bucket is full of deep entries, so shallow ones go to the always-replace slot.
+    for i in range(5, 8):
+        table.store_entry((i << 32) + (i * num_buckets), 0, 1, 0, 0, True)
+
+    assert all(table.get_entry(key) is not None for key in keys)
+    assert table.get_entry((7 << 32) + (7 * num_buckets)) is not None
+    assert table.get_entry((6 << 32) + (6 * num_buckets)) is None
+
+
+def test_transposition_table_hashfull_clear_and_resize():
+    table = Transposition_table(1)
+    assert table.hashfull() == 0
+    for i in range(1000):
+        table.store_entry(i, 0, 1, 0, 0, True)
+    assert table.hashfull() > 0
+
+    table.new_search()
+    assert table.hashfull() == 0
+
+    table.clear()
+    assert table.get_entry(5) is None
+
+    table.store_entry(5, 0, 1, 0, 0, True)
+    table.resize(2)
+    assert table.size_in_MB == 2
+    assert table.get_entry(5) is None
+
+
+def test_evaluation_table_hits_and_replacement():
+    table = Evaluation_table(1)
+    assert table.get_score(7) is None
+    table.store_score(7, 1.5)
+    assert table.get_score(7) == 1.5
+    assert (table.hits, table.misses) == (1, 1)
+
+    # The slot of a key is always replaced by the last position stored in it.
+    num_entries = 1024 * 1024 // 16
+    table.store_score(7 + num_entries, -2.0)
+    assert table.get_score(7) is None
+    assert table.get_score(7 + num_entries) == -2.0
+
+    table.clear()
+    assert table.get_score(7 + num_entries) is None
+    table.reset_stats()
+    assert (table.hits, table.misses) == (0, 0)
+
+
+def test_evaluate_uses_evaluation_table():
+    board = Board()
+    evaluation_utils.evaluation_table.clear()
+    evaluation_utils.evaluation_table.reset_stats()
+    score = evaluation_utils.evaluate(board)
+    assert evaluation_utils.evaluate(board) == score
+    assert evaluation_utils.evaluation_table.hits == 1
+    assert evaluation_utils.evaluation_table.misses == 1